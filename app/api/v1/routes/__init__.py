@@ -1 +1 @@
-from . import auth, subjects, questions, exams, results
+from . import auth, subjects, questions, exams, results, profiles
@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel, EmailStr
-from sqlalchemy.orm import Session
-from app.core.deps import get_db
-from app.core.security import hash_password, verify_password, create_access_token
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.deps import get_async_db, require_admin
+from app.core.security import hash_pool, hash_password_async, verify_password_async, create_access_token
 from app.db.models.user import User, UserRole
 
 router = APIRouter()
@@ -24,19 +25,19 @@ class TokenOut(BaseModel):
     id: int
 
 @router.post("/signup", response_model=TokenOut)
-def signup(data: SignupIn, db: Session = Depends(get_db)):
-    exists = db.query(User).filter(User.email == data.email).first()
+async def signup(data: SignupIn, db: AsyncSession = Depends(get_async_db)):
+    exists = await db.scalar(select(User).where(User.email == data.email))
     if exists:
         raise HTTPException(status_code=400, detail="Email already registered")
     user = User(
         name=data.name,
         email=data.email,
-        password_hash=hash_password(data.password),
+        password_hash=await hash_password_async(data.password),
         role=UserRole.student,
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     token = create_access_token({"sub": str(user.id), "role": user.role.value})
     return {
         "access_token": token,
@@ -46,9 +47,9 @@ def signup(data: SignupIn, db: Session = Depends(get_db)):
     }
 
 @router.post("/login", response_model=TokenOut)
-def login(data: LoginIn, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == data.email).first()
-    if not user or not verify_password(data.password, str(user.password_hash)):
+async def login(data: LoginIn, db: AsyncSession = Depends(get_async_db)):
+    user = await db.scalar(select(User).where(User.email == data.email))
+    if not user or not await verify_password_async(data.password, str(user.password_hash)):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect email or password")
     token = create_access_token({"sub": str(user.id), "role": user.role.value})
     return {
@@ -57,3 +58,8 @@ def login(data: LoginIn, db: Session = Depends(get_db)):
         "name": user.name,
         "id": user.id
     }
+
+@router.get("/hash-stats", dependencies=[Depends(require_admin)])
+def hash_stats():
+    """Queue wait vs. bcrypt time, for tuning the work factor"""
+    return {"pending": hash_pool.pending, **hash_pool.stats.snapshot()}
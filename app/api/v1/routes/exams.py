@@ -1,12 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from pydantic import BaseModel, Field
 from typing import List, Optional
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from app.core.deps import get_db, require_student, get_current_user
-from app.db.models.question import Question
+from app.core.bundles import BundleError, build_bundle, check_bundle, parse_bundle_id, verify_answer_set
+from app.core.config import settings
+from app.core.deps import get_db, require_admin, require_student, get_current_user
+from app.core.principals import Principal
+from app.core.exam_cache import load_paper
+from app.core.exam_sessions import autosave_buffer
+from app.core.grading import grade_submission
+from app.core.responses import json_response
+from app.core.submission_queue import SubmissionTimeout, SubmissionUnavailable, store_results, submission_writer
 from app.db.models.result import Result
 from app.db.models.subject import Subject
-from app.db.models.user import User
+from app.db.models.user import User, UserRole
 
 router = APIRouter()
 
@@ -14,6 +22,7 @@ class StartExamResponse(BaseModel):
     subject_id: int
     questions: list[dict]
     time_remaining: int
+    answers: dict[int, Optional[str]] = {}  # autosaved so far, as shown to the student
 
 class AnswerIn(BaseModel):
     question_id: int
@@ -23,6 +32,10 @@ class SubmitIn(BaseModel):
     subject_id: int
     answers: List[AnswerIn]
 
+class AutosaveOut(BaseModel):
+    saved: int
+    time_remaining: int
+
 class ResultOut(BaseModel):
     id: int
     score: int
@@ -31,82 +44,282 @@ class ResultOut(BaseModel):
     grade: str | None
     status: str
 
-def grade_from_percentage(p: float) -> tuple[str, str]:
-    if p >= 70: return ("A", "PASS")
-    if p >= 60: return ("B", "PASS")
-    if p >= 50: return ("C", "PASS")
-    if p >= 45: return ("D", "PASS")
-    if p >= 40: return ("E", "PASS")
-    return ("F", "FAIL")
+class BundleRecordIn(BaseModel):
+    student_id: int
+    answers: dict[str, Optional[str]]  # question id -> option as shown, exactly as signed
+    signature: str
+
+class BundleUploadIn(BaseModel):
+    bundle_id: str
+    records: List[BundleRecordIn] = Field(max_length=settings.BUNDLE_MAX_RECORDS)
+
+class BundleRecordOut(BaseModel):
+    index: int
+    student_id: int
+    status: str  # "stored" | "duplicate" | "rejected"
+    result: Optional[ResultOut] = None
+    error: Optional[str] = None
+
+class BundleUploadOut(BaseModel):
+    bundle_id: str
+    stored: int
+    duplicates: int
+    rejected: int
+    records: list[BundleRecordOut]
+
+def stored_result(db: Session, student_id: int, subject_id: int):
+    """The student's result for a subject, if any; served by the unique (student_id, subject_id) index"""
+    return (
+        db.query(Result.id, Result.score, Result.total, Result.percentage, Result.grade, Result.status, Result.idempotency_key)
+        .filter(Result.student_id == student_id, Result.subject_id == subject_id)
+        .first()
+    )
+
+def replay(row, idempotency_key: Optional[str]) -> ResultOut:
+    """Answer a retried submission with the stored result; without the same key it is a second attempt"""
+    if idempotency_key is None or row.idempotency_key != idempotency_key:
+        raise HTTPException(status_code=400, detail="You have already completed this exam")
+    return ResultOut(
+        id=row.id,
+        score=row.score,
+        total=row.total,
+        percentage=row.percentage,
+        grade=row.grade,
+        status=row.status,
+    )
 
 @router.post("/start/{subject_id}", response_model=StartExamResponse, dependencies=[Depends(require_student)])
-def start_exam(subject_id: int, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+def start_exam(subject_id: int, db: Session = Depends(get_db), user: Principal = Depends(get_current_user)):
     # Prevent retake if result already exists for this student and subject
     existing = db.query(Result).filter(Result.student_id == user.id, Result.subject_id == subject_id).first()
     if existing:
         raise HTTPException(status_code=400, detail="You have already completed this exam")
-    # Get all questions for this subject
-    questions = db.query(Question).filter(Question.subject_id == subject_id).all()
-    if not questions:
+    # Paper is shared by every student of the subject, so serve it from the cache
+    paper = load_paper(db, subject_id)
+    if paper is None:
         raise HTTPException(status_code=404, detail="No questions found for this subject")
-    
-    # Get subject duration directly to avoid relationship/lazy loading issues
-    subject = db.get(Subject, subject_id)
-    if not subject:
-        raise HTTPException(status_code=404, detail="Subject not found")
-    
-    # Convert questions to dict without correct answers
-    questions_data = [{
-        "id": q.id,
-        "question_text": q.question_text,
-        "options": {
-            "A": q.option_a,
-            "B": q.option_b,
-            "C": q.option_c,
-            "D": q.option_d,
-        }
-    } for q in questions]
-
-    return {
+
+    # Starting again (e.g. after a browser crash) resumes the same session and clock
+    session = autosave_buffer.open(db, user.id, subject_id, paper.duration, paper.selected_ids(user.id))
+    if session.submitted:
+        raise HTTPException(status_code=400, detail="You have already completed this exam")
+    if session.is_late():
+        raise HTTPException(status_code=400, detail="Exam time is over")
+
+    # the paper's question dicts are already student-safe; skip re-validating them
+    return json_response({
         "subject_id": subject_id,
-        "questions": questions_data,
-        "time_remaining": subject.duration * 60  # Convert minutes to seconds
-    }
+        # the set served first, even if questions were added or removed since
+        "questions": paper.for_student(user.id, session.question_ids),
+        "time_remaining": session.seconds_left(),
+        "answers": autosave_buffer.answers(db, session.id),
+    })
+
+@router.post("/autosave", response_model=AutosaveOut, dependencies=[Depends(require_student)])
+def autosave(payload: SubmitIn, db: Session = Depends(get_db), user: Principal = Depends(get_current_user)):
+    """Record partial answers; they are buffered and written to the DB in periodic batches"""
+    session = autosave_buffer.lookup(db, user.id, payload.subject_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="No exam in progress for this subject")
+    if session.submitted or session.is_late():
+        raise HTTPException(status_code=400, detail="Exam time is over")
+    autosave_buffer.add(session.id, {a.question_id: a.selected_option for a in payload.answers})
+    return AutosaveOut(saved=len(payload.answers), time_remaining=session.seconds_left())
 
 @router.post("/submit", response_model=ResultOut, dependencies=[Depends(require_student)])
-def submit_exam(payload: SubmitIn, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
-    # Get questions from database and load all attributes
-    questions = (
-        db.query(Question)
-        .filter(Question.subject_id == payload.subject_id)
-        .all()
-    )
-    if not questions:
+def submit_exam(
+    payload: SubmitIn,
+    idempotency_key: Optional[str] = Header(None, max_length=64),
+    db: Session = Depends(get_db),
+    user: Principal = Depends(get_current_user),
+):
+    """Grade and store the student's answers.
+
+    Send an Idempotency-Key header to make retries safe: a repeat with the
+    same key returns the stored result without grading or writing again.
+    Send every question served, with null for unanswered ones: a partial
+    answer set is completed from autosaves, which can take one autosave
+    interval to reach the database from another worker.
+    """
+    existing = stored_result(db, user.id, payload.subject_id)
+    if existing is not None:
+        return replay(existing, idempotency_key)
+
+    # Grade against the cached answer key instead of reloading the question bank
+    paper = load_paper(db, payload.subject_id)
+    if paper is None:
         raise HTTPException(status_code=404, detail="No questions for this subject")
 
+    # the session carries the deadline; without one there is nothing to hold the time limit to
+    session = autosave_buffer.lookup(db, user.id, payload.subject_id)
+    if session is None:
+        raise HTTPException(status_code=400, detail="Start the exam before submitting")
+
     submitted_answers = {a.question_id: a.selected_option for a in payload.answers}
+    result_id = None
+    try:
+        if not session.submitted:
+            served = session.question_ids or paper.selected_ids(user.id)
+            complete = not session.is_late() and submitted_answers.keys() >= {
+                question_id for question_id in served if question_id in paper.answer_key
+            }
+            if not complete:
+                autosave_buffer.settle(db)
+            # Grade from the session; answers sent after the deadline are ignored
+            answers = autosave_buffer.answers(db, session.id)
+            if not session.is_late():
+                answers.update(submitted_answers)
+            values = grade_submission(db, paper, user.id, answers, session.question_ids)
+            values["idempotency_key"] = idempotency_key
+            result_id = autosave_buffer.submit(db, session, values)
+    except IntegrityError:
+        # a concurrent submission for the same student and subject got there first
+        db.rollback()
+    except SubmissionUnavailable as exc:
+        # nothing stored yet, or the writer may still store it; either way a
+        # retry with the same Idempotency-Key grades again or replays it
+        raise HTTPException(
+            status_code=503,
+            detail=(
+                "Submission is taking longer than usual, try again shortly" if isinstance(exc, SubmissionTimeout)
+                else "Submission could not be saved, try again shortly"
+            ),
+            headers={"Retry-After": str(settings.ADMISSION_RETRY_AFTER_SECONDS)},
+        )
+    if result_id is None:
+        existing = stored_result(db, user.id, payload.subject_id)
+        if existing is None:
+            # the other submission is still being written
+            raise HTTPException(status_code=409, detail="This exam is already being submitted", headers={"Retry-After": "1"})
+        return replay(existing, idempotency_key)
+    return ResultOut(
+        id=result_id,
+        score=values["score"],
+        total=values["total"],
+        percentage=values["percentage"],
+        grade=values["grade"],
+        status=values["status"],
+    )
 
-    total = len(questions)
-    score = 0
-
-    for question in questions:
-        selected = submitted_answers.get(question.id)  # None if unanswered
-        if selected and selected == question.correct_option:
-            score += 1
-    
-    percentage = (score / total * 100) if total else 0.0
-    grade, status = grade_from_percentage(percentage)
-    # store result
-    res = Result(
-        student_id=user.id,
-        subject_id=payload.subject_id,
-        score=score,
-        total=total,
-        percentage=percentage,
-        grade=grade,
-        status=status,
+@router.get("/bundle/{subject_id}", dependencies=[Depends(require_admin)])
+def download_bundle(subject_id: int, student_id: list[int] = Query(None), db: Session = Depends(get_db)):
+    """Signed, gzipped exam bundle for a centre without connectivity.
+
+    Sampled or shuffled papers need the centre's roster (repeat student_id) so
+    each student's questions and option order can be included. The bundle
+    key comes back in X-Bundle-Key; the proctor machine signs each student's
+    answer set with it before upload.
+    """
+    paper = load_paper(db, subject_id)
+    if paper is None:
+        raise HTTPException(status_code=404, detail="No questions found for this subject")
+    if paper.personalised and not student_id:
+        raise HTTPException(status_code=400, detail="This paper is personalised; pass the roster as student_id")
+    subject_name = db.query(Subject.name).filter(Subject.id == subject_id).scalar()
+    body, bundle_id, key = build_bundle(paper, subject_name, sorted(set(student_id or ())))
+    return Response(
+        content=body,
+        media_type="application/gzip",
+        headers={
+            "Content-Disposition": f'attachment; filename="exam-bundle-{bundle_id}.json.gz"',
+            "X-Bundle-Id": bundle_id,
+            "X-Bundle-Key": key,
+        },
     )
-    db.add(res)
+
+@router.post("/bundle-upload", response_model=BundleUploadOut, dependencies=[Depends(require_admin)])
+def upload_bundle_answers(payload: BundleUploadIn, db: Session = Depends(get_db)):
+    """Grade and store the answer sets collected offline from one bundle.
+
+    Every record is verified, graded and stored in a single transaction and
+    reported on individually. Uploading the same bundle again is safe:
+    records already stored from it come back as duplicates.
+    """
+    try:
+        subject_id = parse_bundle_id(payload.bundle_id).subject_id
+        paper = load_paper(db, subject_id)
+        if paper is None:
+            raise BundleError("Questions or sampling changed since this bundle was issued")
+        check_bundle(payload.bundle_id, paper)
+    except BundleError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    idempotency_key = f"bundle:{payload.bundle_id}"
+    student_ids = {record.student_id for record in payload.records}
+    students = {
+        row.id for row in db.query(User.id)
+        .filter(User.id.in_(student_ids), User.role == UserRole.student)
+    }
+    existing = {
+        row.student_id: row for row in db.query(
+            Result.student_id, Result.id, Result.score, Result.total, Result.percentage,
+            Result.grade, Result.status, Result.idempotency_key,
+        ).filter(Result.subject_id == subject_id, Result.student_id.in_(student_ids))
+    }
+
+    outcomes: list[BundleRecordOut] = []
+    pending: list[tuple[BundleRecordOut, dict]] = []
+    seen: set[int] = set()
+    for index, record in enumerate(payload.records):
+        outcome = BundleRecordOut(index=index, student_id=record.student_id, status="rejected")
+        outcomes.append(outcome)
+        if not verify_answer_set(payload.bundle_id, record.student_id, record.answers, record.signature):
+            outcome.error = "Invalid signature"
+        elif record.student_id not in students:
+            outcome.error = "Unknown student"
+        elif record.student_id in seen:
+            outcome.error = "Student appears more than once in this upload"
+        elif record.student_id in existing:
+            row = existing[record.student_id]
+            if row.idempotency_key == idempotency_key:
+                outcome.status = "duplicate"
+                outcome.result = replay(row, idempotency_key)
+                seen.add(record.student_id)
+            else:
+                outcome.error = "Student has already completed this exam"
+        else:
+            try:
+                answers = {int(question_id): option for question_id, option in record.answers.items()}
+            except ValueError:
+                outcome.error = "Answers must be keyed by question id"
+            else:
+                values = grade_submission(db, paper, record.student_id, answers)
+                values["idempotency_key"] = idempotency_key
+                pending.append((outcome, values))
+                seen.add(record.student_id)
+
+    # grading added each selection's response layout; commit them first so a
+    # duplicate rolling back the batch can't take them along
     db.commit()
-    db.refresh(res)  # Refresh to get the ID
-    return ResultOut(id=res.id, score=score, total=total, percentage=percentage, grade=grade, status=status)
+    ids = store_results(db, [values for _, values in pending]) if pending else []
+    for (outcome, values), result_id in zip(pending, ids):
+        if result_id is None:
+            # a submission for this student landed while the upload was being graded
+            outcome.error = "Student has already completed this exam"
+            continue
+        outcome.status = "stored"
+        outcome.result = ResultOut(
+            id=result_id,
+            score=values["score"],
+            total=values["total"],
+            percentage=values["percentage"],
+            grade=values["grade"],
+            status=values["status"],
+        )
+
+    return BundleUploadOut(
+        bundle_id=payload.bundle_id,
+        stored=sum(outcome.status == "stored" for outcome in outcomes),
+        duplicates=sum(outcome.status == "duplicate" for outcome in outcomes),
+        rejected=sum(outcome.status == "rejected" for outcome in outcomes),
+        records=outcomes,
+    )
+
+@router.get("/autosave-stats", dependencies=[Depends(require_admin)])
+def autosave_stats():
+    """Buffered autosaves, batch flushes and deadline auto-submits"""
+    return autosave_buffer.stats()
+
+@router.get("/submission-queue", dependencies=[Depends(require_admin)])
+def submission_queue_stats():
+    """Write-behind queue depth and flush latency"""
+    return {"enabled": settings.SUBMISSION_WRITE_BEHIND, **submission_writer.stats()}
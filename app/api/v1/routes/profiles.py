@@ -0,0 +1,33 @@
+import re
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+from pydantic import BaseModel
+from app.core.deps import require_admin
+from app.core.profiling import profile_dir
+
+router = APIRouter()
+
+PROFILE_NAME = re.compile(r"^[A-Za-z0-9_.-]+\.collapsed$")
+
+class ProfileOut(BaseModel):
+    name: str
+    size: int
+    created_at: datetime
+
+@router.get("/", response_model=list[ProfileOut], dependencies=[Depends(require_admin)])
+def list_profiles():
+    """Saved request profiles, newest first"""
+    files = sorted(profile_dir().glob("*.collapsed"), reverse=True)
+    return [
+        ProfileOut(name=f.name, size=f.stat().st_size, created_at=datetime.utcfromtimestamp(f.stat().st_mtime))
+        for f in files
+    ]
+
+@router.get("/{name}", dependencies=[Depends(require_admin)])
+def download_profile(name: str):
+    """Collapsed stacks, one `frame;frame;frame count` line per stack"""
+    path = profile_dir() / name
+    if not PROFILE_NAME.match(name) or not path.is_file():
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=name)
@@ -1,12 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
+import codecs
+import csv
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.core.deps import get_db, require_admin
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.deps import get_async_db, get_db, get_read_db, require_admin
+from app.core.exam_cache import paper_cache
+from app.core.http_cache import conditional, make_etag
+from app.core.near_duplicates import duplicate_pairs, find_similar, record_added
+from app.core.question_search import SearchError, search_question_ids
+from app.core.responses import json_response
 from app.db.models.question import Question
 from app.db.models.subject import Subject
 
 router = APIRouter()
 
+def bump_questions_version(subject_id: int):
+    """Statement marking a subject's question set as changed; run it in the same transaction"""
+    # keep updatedAt: it versions the subject itself, not its questions
+    return (
+        update(Subject)
+        .where(Subject.id == subject_id)
+        .values(questionsVersion=Subject.questionsVersion + 1, updatedAt=Subject.updatedAt)
+    )
+
 from enum import Enum
 from typing import Literal
 
@@ -37,6 +58,23 @@ class QuestionOut(BaseModel):
     class Config:
         from_attributes = True
 
+class SimilarQuestionOut(BaseModel):
+    id: int
+    similarity: float
+
+class QuestionCreatedOut(QuestionOut):
+    possible_duplicates: list[SimilarQuestionOut] = []
+
+class DuplicatePairOut(BaseModel):
+    question_id: int
+    duplicate_of: int  # the earlier question
+    similarity: float
+
+class DuplicatesOut(BaseModel):
+    subject_id: int
+    threshold: float
+    pairs: list[DuplicatePairOut]
+
 # @router.post("/{subject_id}", response_model=QuestionOut, dependencies=[Depends(require_admin)])
 # def add_question(subject_id: int, data: QuestionIn, db: Session = Depends(get_db)):
 #     if not db.get(Subject, subject_id):
@@ -52,8 +90,9 @@ class QuestionOut(BaseModel):
 #     db.refresh(q)
 #     return q
 
-@router.post("/{subject_id}", response_model=QuestionOut, dependencies=[Depends(require_admin)])
+@router.post("/{subject_id}", response_model=QuestionCreatedOut, dependencies=[Depends(require_admin)])
 def add_question(subject_id: int, data: QuestionIn, db: Session = Depends(get_db)):
+    """Add a question; likely duplicates already in the subject are listed but don't block it"""
     subject = db.get(Subject, subject_id)
     if not subject:
         raise HTTPException(status_code=404, detail="Subject not found")
@@ -66,17 +105,152 @@ def add_question(subject_id: int, data: QuestionIn, db: Session = Depends(get_db
     # Convert correct_option to string value
     question_data = data.dict()
     question_data['correct_option'] = question_data['correct_option'].value
-    
+    version = subject.questionsVersion
+    similar = find_similar(db, subject_id, version, question_data)
+
     q = Question(subject_id=subject_id, **question_data)
     db.add(q)
+    new_version = db.execute(bump_questions_version(subject_id).returning(Subject.questionsVersion)).scalar_one()
     db.commit()
+    paper_cache.invalidate(subject_id)
+    record_added(subject_id, new_version, q.id, question_data)
     db.refresh(q)
-    return q
+    return QuestionCreatedOut(
+        **QuestionOut.model_validate(q).model_dump(),
+        possible_duplicates=[SimilarQuestionOut(id=question_id, similarity=score) for question_id, score in similar],
+    )
+
+
+class ImportRowError(BaseModel):
+    row: int
+    errors: list[str]
+
+class ImportOut(BaseModel):
+    inserted: int
+    errors: list[ImportRowError]
 
+IMPORT_BATCH_SIZE = 500
+
+def read_import_rows(source, kind: str):
+    """Yield (row_number, raw_row) from a CSV or JSON source without buffering it whole"""
+    if kind == "csv":
+        if isinstance(source, bytes):
+            source = source.decode("utf-8-sig").splitlines()
+        else:
+            source = codecs.getreader("utf-8-sig")(source)
+        # row 1 is the header
+        yield from enumerate(csv.DictReader(source), start=2)
+    else:
+        rows = json.loads(source) if isinstance(source, bytes) else json.load(source)
+        if not isinstance(rows, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array of questions")
+        yield from enumerate(rows, start=1)
+
+def validate_import_rows(source, kind: str, subject_id: int, capacity: int | None):
+    valid: list[dict] = []
+    errors: list[ImportRowError] = []
+    try:
+        for row_number, raw in read_import_rows(source, kind):
+            try:
+                data = QuestionIn.model_validate(raw)
+            except ValidationError as exc:
+                errors.append(ImportRowError(row=row_number, errors=[
+                    f"{'.'.join(str(part) for part in err['loc']) or 'row'}: {err['msg']}" for err in exc.errors()
+                ]))
+                continue
+            if capacity is not None and len(valid) >= capacity:
+                errors.append(ImportRowError(row=row_number, errors=["Maximum number of questions reached for this subject"]))
+                continue
+            question_data = data.model_dump()
+            question_data['correct_option'] = question_data['correct_option'].value
+            valid.append({"subject_id": subject_id, **question_data})
+    except (ValueError, csv.Error) as exc:
+        # json.JSONDecodeError and UnicodeDecodeError are ValueErrors
+        raise HTTPException(status_code=400, detail=f"Could not parse import file: {exc}")
+    return valid, errors
+
+@router.post("/{subject_id}/import", response_model=ImportOut, dependencies=[Depends(require_admin)])
+async def import_questions(subject_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Bulk-load questions from a JSON array, a CSV body or a multipart file upload.
+
+    CSV columns match QuestionIn. Invalid rows are reported and skipped; the
+    valid ones are inserted in a single transaction.
+    """
+    subject = await db.get(Subject, subject_id)
+    if not subject:
+        raise HTTPException(status_code=404, detail="Subject not found")
+
+    capacity = None
+    if subject.totalQuestions is not None:
+        question_count = await db.scalar(select(func.count()).select_from(Question).where(Question.subject_id == subject_id))
+        capacity = max(subject.totalQuestions - question_count, 0)
+
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Expected a 'file' field")
+        kind = "json" if (upload.filename or "").lower().endswith(".json") else "csv"
+        source = upload.file
+    else:
+        kind = "csv" if "csv" in content_type else "json"
+        source = await request.body()
+
+    valid, errors = await run_in_threadpool(validate_import_rows, source, kind, subject_id, capacity)
+
+    for start in range(0, len(valid), IMPORT_BATCH_SIZE):
+        await db.execute(insert(Question), valid[start:start + IMPORT_BATCH_SIZE])
+    if valid:
+        await db.execute(bump_questions_version(subject_id))
+    await db.commit()
+    if valid:
+        paper_cache.invalidate(subject_id)
+    return ImportOut(inserted=len(valid), errors=errors)
+
+# declared before /{subject_id} so "search" isn't taken for a subject id
+@router.get("/search", response_model=list[QuestionOut], dependencies=[Depends(require_admin)])
+def search_questions(
+    q: str = Query(..., min_length=1, max_length=200),
+    subject_id: int | None = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_read_db),
+):
+    """Questions whose text or options contain every word of `q`, the last as a prefix; best match first"""
+    try:
+        ids = search_question_ids(db, q, subject_id, limit)
+    except SearchError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if not ids:
+        return json_response([])
+    rank = {question_id: position for position, question_id in enumerate(ids)}
+    rows = db.query(*(getattr(Question, field) for field in QuestionOut.model_fields)).filter(Question.id.in_(ids))
+    return json_response(sorted((row._asdict() for row in rows), key=lambda row: rank[row["id"]]))
+
+@router.get("/{subject_id}/duplicates", response_model=DuplicatesOut, dependencies=[Depends(require_admin)])
+def find_duplicates(subject_id: int, db: Session = Depends(get_read_db)):
+    """Pairs of likely duplicate questions across a subject, most similar first"""
+    if db.get(Subject, subject_id) is None:
+        raise HTTPException(status_code=404, detail="Subject not found")
+    return DuplicatesOut(
+        subject_id=subject_id,
+        threshold=settings.DUPLICATE_THRESHOLD,
+        pairs=[
+            DuplicatePairOut(question_id=question_id, duplicate_of=other_id, similarity=score)
+            for question_id, other_id, score in duplicate_pairs(db, subject_id)
+        ],
+    )
 
 @router.get("/{subject_id}", response_model=list[QuestionOut])
-def list_questions(subject_id: int, db: Session = Depends(get_db)):
-    return db.query(Question).filter(Question.subject_id == subject_id).all()
+def list_questions(subject_id: int, request: Request, response: Response, db: Session = Depends(get_read_db)):
+    version = db.query(Subject.questionsVersion).filter(Subject.id == subject_id).scalar()
+    if version is not None:
+        not_modified = conditional(request, response, make_etag("questions", subject_id, version))
+        if not_modified is not None:
+            return not_modified
+    # plain rows, no ORM identity map or response re-validation; columns match QuestionOut
+    rows = db.query(*(getattr(Question, field) for field in QuestionOut.model_fields)).filter(Question.subject_id == subject_id)
+    return json_response([row._asdict() for row in rows], response)
 
 @router.put("/{question_id}", response_model=QuestionOut, dependencies=[Depends(require_admin)])
 def update_question(question_id: int, data: QuestionIn, db: Session = Depends(get_db)):
@@ -92,7 +266,9 @@ def update_question(question_id: int, data: QuestionIn, db: Session = Depends(ge
     for key, value in question_data.items():
         setattr(q, key, value)
     
+    db.execute(bump_questions_version(q.subject_id))
     db.commit()
+    paper_cache.invalidate(q.subject_id)
     db.refresh(q)
     return q
 
@@ -102,6 +278,9 @@ def delete_question(question_id: int, db: Session = Depends(get_db)):
     if not q:
         raise HTTPException(status_code=404, detail="Question not found")
     
+    subject_id = q.subject_id
     db.delete(q)
+    db.execute(bump_questions_version(subject_id))
     db.commit()
+    paper_cache.invalidate(subject_id)
     return {"message": "Question deleted successfully"}
@@ -1,14 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload
-from typing import List
-from app.core.deps import get_db, require_student, get_current_user
+import base64
+import csv
+import io
+import json
+import math
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from app.core import numeric
+from app.core.deps import get_db, get_read_db, require_admin, require_student, get_current_user
+from app.core.principals import Principal
+from app.core.rank_index import rank_index
+from app.core.responses import json_response
+from app.core.subject_stats import summarize
+from app.db.session import ReadSessionLocal
+from app.db.models.question import Question
+from app.db.models.response_layout import ResponseLayout
 from app.db.models.result import Result
 from app.db.models.subject import Subject
+from app.db.models.subject_stats import SubjectStats
 from app.db.models.user import User
 from pydantic import BaseModel
 
 router = APIRouter()
 
+MAX_PAGE_SIZE = 1000
+EXPORT_BATCH_SIZE = 1000
+
 class ResultOut(BaseModel):
     id: int
     student_id: int
@@ -22,69 +42,322 @@ class ResultOut(BaseModel):
     status: str
     created_at: str
 
-@router.get("/me", response_model=List[ResultOut], dependencies=[Depends(require_student)])
-def get_my_results(db: Session = Depends(get_db), user: User = Depends(get_current_user)):
-    """Get all results for the current student"""
-    results = db.query(Result).filter(Result.student_id == user.id).all()
-    
-    return [
-        ResultOut(
-            id=result.id,
-            student_id=result.student_id,
-            student_name=user.name,
-            subject_id=result.subject_id,
-            subject_name=db.query(Subject).filter(Subject.id == result.subject_id).first().name,
-            score=result.score,
-            total=result.total,
-            percentage=result.percentage,
-            grade=result.grade,
-            status=result.status,
-            created_at=result.created_at.isoformat()
+class SubjectStatsOut(BaseModel):
+    subject_id: int
+    attempts: int
+    mean: float | None
+    stdev: float | None
+    pass_rate: float | None
+    passed: int
+    failed: int
+    distribution: dict[str, int]
+
+class RankOut(BaseModel):
+    subject_id: int
+    percentage: float
+    rank: int
+    out_of: int
+    percentile: float | None
+
+class RegradeOut(BaseModel):
+    subject_id: int
+    question_id: int | None
+    dry_run: bool
+    considered: int
+    skipped: int
+    changed: int
+    grade_changes: dict[str, int]
+    status_changes: dict[str, int]
+
+class ItemStats(BaseModel):
+    question_id: int
+    correct_option: str
+    presented: int
+    difficulty: float | None
+    discrimination: float | None
+    frequencies: dict[str, int]
+
+class ItemAnalysisOut(BaseModel):
+    subject_id: int
+    submissions: int
+    complete_submissions: int
+    cronbach_alpha: float | None
+    items: list[ItemStats]
+
+def encode_cursor(created_at: datetime, result_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{result_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        created_at, result_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(result_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def result_rows_query(db: Session):
+    """Results joined with student and subject names in a single select"""
+    return (
+        db.query(
+            Result.id,
+            Result.student_id,
+            User.name.label("student_name"),
+            Result.subject_id,
+            Subject.name.label("subject_name"),
+            Result.score,
+            Result.total,
+            Result.percentage,
+            Result.grade,
+            Result.status,
+            Result.created_at,
         )
-        for result in results
+        .join(User, User.id == Result.student_id)
+        .outerjoin(Subject, Subject.id == Result.subject_id)
+    )
+
+def filter_results(
+    query,
+    subject_id: Optional[int] = None,
+    status: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+):
+    if subject_id is not None:
+        query = query.filter(Result.subject_id == subject_id)
+    if status is not None:
+        query = query.filter(Result.status == status.upper())
+    if date_from is not None:
+        query = query.filter(Result.created_at >= date_from)
+    if date_to is not None:
+        query = query.filter(Result.created_at < date_to)
+    return query
+
+def row_to_dict(row) -> dict:
+    """A result_rows_query row shaped exactly like ResultOut"""
+    return {
+        "id": row.id,
+        "student_id": row.student_id,
+        "student_name": row.student_name,
+        "subject_id": row.subject_id,
+        "subject_name": row.subject_name or "Unknown Subject",
+        "score": row.score,
+        "total": row.total,
+        "percentage": row.percentage,
+        "grade": row.grade,
+        "status": row.status,
+        "created_at": row.created_at.isoformat(),
+    }
+
+def row_to_out(row) -> ResultOut:
+    return ResultOut(**row_to_dict(row))
+
+def paginate(query, response: Response, limit: int, cursor: Optional[str]) -> List[dict]:
+    """Keyset pagination on (created_at, id), newest first.
+
+    Returns ResultOut-shaped dicts for json_response. The cursor for the
+    following page is returned in the X-Next-Cursor header.
+    """
+    if cursor:
+        created_at, result_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            Result.created_at < created_at,
+            and_(Result.created_at == created_at, Result.id < result_id),
+        ))
+    rows = query.order_by(Result.created_at.desc(), Result.id.desc()).limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return [row_to_dict(row) for row in rows]
+
+def export_rows(export_format: str, subject_id, date_from, date_to):
+    """Stream matching results from a server-side cursor, one batch at a time"""
+    fields = list(ResultOut.model_fields)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush() -> str:
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return chunk
+
+    if export_format == "csv":
+        writer.writerow(fields)
+        yield flush()
+
+    # The request-scoped session may already be closed while the body streams
+    db = ReadSessionLocal()
+    try:
+        query = filter_results(result_rows_query(db), subject_id, None, date_from, date_to)
+        query = query.order_by(Result.created_at, Result.id).yield_per(EXPORT_BATCH_SIZE)
+        for count, row in enumerate(query, start=1):
+            values = [
+                row.id, row.student_id, row.student_name, row.subject_id,
+                row.subject_name or "Unknown Subject", row.score, row.total,
+                row.percentage, row.grade, row.status, row.created_at.isoformat(),
+            ]
+            if export_format == "csv":
+                writer.writerow(values)
+            else:
+                buffer.write(json.dumps(dict(zip(fields, values))) + "\n")
+            # the first row goes out on its own so the download starts right away
+            if count == 1 or count % EXPORT_BATCH_SIZE == 0:
+                yield flush()
+        yield flush()
+    finally:
+        db.close()
+
+@router.get("/export", dependencies=[Depends(require_admin)])
+def export_results(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    subject_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+):
+    """Stream all results as CSV or NDJSON (admin only)"""
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    filename = f"results.{format}"
+    return StreamingResponse(
+        export_rows(format, subject_id, date_from, date_to),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+def finite_or_none(value) -> float | None:
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+@router.get("/item-analysis/{subject_id}", response_model=ItemAnalysisOut, dependencies=[Depends(require_admin)])
+def item_analysis(subject_id: int, db: Session = Depends(get_read_db)):
+    """Difficulty, discrimination, distractors and reliability for a subject (admin only)"""
+    analysis = numeric.load("app.core.item_analysis")
+
+    if not db.get(Subject, subject_id):
+        raise HTTPException(status_code=404, detail="Subject not found")
+    layouts = {
+        row.id: analysis.unpack_ids(row.question_ids)
+        for row in db.query(ResponseLayout.id, ResponseLayout.question_ids).filter(ResponseLayout.subject_id == subject_id)
+    }
+    results = (
+        db.query(Result.layout_id, Result.responses)
+        .filter(Result.subject_id == subject_id, Result.responses.isnot(None))
+        .all()
+    )
+    answer_key = dict(
+        db.query(Question.id, Question.correct_option).filter(Question.subject_id == subject_id).all()
+    )
+
+    # only analyse questions that are still in the bank, against their current key
+    question_ids, rows, columns, codes, key = analysis.keyed_entries(layouts, results, answer_key)
+    stats = analysis.analyse(len(results), len(question_ids), rows, columns, codes, key)
+
+    items = [
+        ItemStats(
+            question_id=int(qid),
+            correct_option=answer_key[int(qid)],
+            presented=int(stats["n_presented"][i]),
+            difficulty=finite_or_none(stats["difficulty"][i]),
+            discrimination=finite_or_none(stats["discrimination"][i]),
+            frequencies={option: int(counts[i]) for option, counts in stats["frequencies"].items()},
+        )
+        for i, qid in enumerate(question_ids)
     ]
+    return ItemAnalysisOut(
+        subject_id=subject_id,
+        submissions=len(results),
+        complete_submissions=stats["n_complete"],
+        cronbach_alpha=stats["alpha"],
+        items=items,
+    )
+
+@router.get("/stats", response_model=List[SubjectStatsOut], dependencies=[Depends(require_admin)])
+def get_all_stats(db: Session = Depends(get_read_db)):
+    """Per-subject mean, stdev, pass rate and grade distribution (admin only)"""
+    return [summarize(stats.subject_id, stats) for stats in db.query(SubjectStats).all()]
+
+@router.get("/stats/{subject_id}", response_model=SubjectStatsOut, dependencies=[Depends(require_admin)])
+def get_subject_stats(subject_id: int, db: Session = Depends(get_read_db)):
+    """Mean, stdev, pass rate and grade distribution for one subject (admin only)"""
+    if not db.get(Subject, subject_id):
+        raise HTTPException(status_code=404, detail="Subject not found")
+    return summarize(subject_id, db.get(SubjectStats, subject_id))
+
+@router.get("/rank/{subject_id}/me", response_model=RankOut, dependencies=[Depends(require_student)])
+def get_my_rank(subject_id: int, db: Session = Depends(get_read_db), user: Principal = Depends(get_current_user)):
+    """Where the current student stands among everyone who sat the subject"""
+    percentage = (
+        db.query(Result.percentage)
+        .filter(Result.student_id == user.id, Result.subject_id == subject_id)
+        .order_by(Result.id.desc())
+        .limit(1)
+        .scalar()
+    )
+    if percentage is None:
+        raise HTTPException(status_code=404, detail="Result not found")
+    return RankOut(subject_id=subject_id, percentage=percentage, **rank_index.rank(db, subject_id, percentage))
+
+@router.get("/rank/{subject_id}/top", response_model=List[ResultOut], dependencies=[Depends(require_admin)])
+def get_top_results(subject_id: int, n: int = Query(10, ge=1, le=MAX_PAGE_SIZE), db: Session = Depends(get_read_db)):
+    """Top-N results for a subject, read off the (subject_id, percentage) index (admin only)"""
+    rows = (
+        result_rows_query(db)
+        .filter(Result.subject_id == subject_id)
+        .order_by(Result.percentage.desc(), Result.created_at, Result.id)
+        .limit(n)
+        .all()
+    )
+    return [row_to_out(row) for row in rows]
+
+@router.post("/regrade/{subject_id}", response_model=RegradeOut, dependencies=[Depends(require_admin)])
+def regrade(subject_id: int, question_id: Optional[int] = None, dry_run: bool = True, db: Session = Depends(get_db)):
+    """Regrade a subject's results against the current answer key (admin only).
+
+    Defaults to a dry run that only reports how many results would change.
+    """
+    if not db.get(Subject, subject_id):
+        raise HTTPException(status_code=404, detail="Subject not found")
+    if question_id is not None:
+        question = db.get(Question, question_id)
+        if not question or question.subject_id != subject_id:
+            raise HTTPException(status_code=404, detail="Question not found")
+    return numeric.load("app.core.regrade").regrade_subject(db, subject_id, question_id, dry_run)
+
+@router.get("/me", response_model=List[ResultOut], dependencies=[Depends(require_student)])
+def get_my_results(
+    response: Response,
+    subject_id: Optional[int] = None,
+    status: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+    user: Principal = Depends(get_current_user),
+):
+    """Get all results for the current student"""
+    query = result_rows_query(db).filter(Result.student_id == user.id)
+    query = filter_results(query, subject_id, status, date_from, date_to)
+    return json_response(paginate(query, response, limit, cursor), response)
 
 @router.get("/{result_id}", response_model=ResultOut, dependencies=[Depends(require_student)])
-def get_result(result_id: int, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+def get_result(result_id: int, db: Session = Depends(get_read_db), user: Principal = Depends(get_current_user)):
     """Get a specific result by ID"""
-    result = db.query(Result).filter(Result.id == result_id, Result.student_id == user.id).first()
-    if not result:
+    row = result_rows_query(db).filter(Result.id == result_id, Result.student_id == user.id).first()
+    if not row:
         raise HTTPException(status_code=404, detail="Result not found")
-    
-    subject = db.query(Subject).filter(Subject.id == result.subject_id).first()
-    
-    return ResultOut(
-        id=result.id,
-        student_id=result.student_id,
-        student_name=user.name,
-        subject_id=result.subject_id,
-        subject_name=subject.name if subject else "Unknown Subject",
-        score=result.score,
-        total=result.total,
-        percentage=result.percentage,
-        grade=result.grade,
-        status=result.status,
-        created_at=result.created_at.isoformat()
-    )
+    return row_to_out(row)
 
-@router.get("/", response_model=List[ResultOut])
-def get_all_results(db: Session = Depends(get_db)):
+@router.get("/", response_model=List[ResultOut], dependencies=[Depends(require_admin)])
+def get_all_results(
+    response: Response,
+    subject_id: Optional[int] = None,
+    status: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+):
     """Get all results (admin only)"""
-    results = db.query(Result).all()
-    
-    return [
-        ResultOut(
-            id=result.id,
-            student_id=result.student_id,
-            student_name=db.query(User).filter(User.id == result.student_id).first().name,
-            subject_id=result.subject_id,
-            subject_name=db.query(Subject).filter(Subject.id == result.subject_id).first().name,
-            score=result.score,
-            total=result.total,
-            percentage=result.percentage,
-            grade=result.grade,
-            status=result.status,
-            created_at=result.created_at.isoformat()
-        )
-        for result in results
-    ]
+    query = filter_results(result_rows_query(db), subject_id, status, date_from, date_to)
+    return json_response(paginate(query, response, limit, cursor), response)
@@ -1,8 +1,11 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.deps import get_db
+from app.core.deps import get_async_db, get_async_read_db
+from app.core.exam_cache import paper_cache
+from app.core.http_cache import conditional, make_etag
 from app.core.security import require_admin
 from app.db.models.subject import Subject
 from app.api.v1.schemas.subject import SubjectIn, SubjectOut
@@ -10,20 +13,33 @@ from app.api.v1.schemas.subject import SubjectIn, SubjectOut
 router = APIRouter(prefix="")
 
 @router.get("/", response_model=List[SubjectOut])
-async def get_subjects(db: Session = Depends(get_db)):
-    subjects = db.query(Subject).all()
+async def get_subjects(request: Request, response: Response, db: AsyncSession = Depends(get_async_read_db)):
+    # any create, update or delete changes one of these; no Last-Modified since
+    # a delete doesn't move max(updatedAt)
+    count, last_updated, id_sum = (await db.execute(
+        select(func.count(Subject.id), func.max(Subject.updatedAt), func.sum(Subject.id))
+    )).one()
+    not_modified = conditional(request, response, make_etag("subjects", count, last_updated, id_sum))
+    if not_modified is not None:
+        return not_modified
+    subjects = (await db.scalars(select(Subject))).all()
     return subjects
 
 @router.get("/{subject_id}", response_model=SubjectOut)
-async def get_subject(subject_id: int, db: Session = Depends(get_db)):
-    subject = db.query(Subject).filter(Subject.id == subject_id).first()
+async def get_subject(subject_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_read_db)):
+    updated_at = await db.scalar(select(Subject.updatedAt).where(Subject.id == subject_id))
+    if updated_at is not None:
+        not_modified = conditional(request, response, make_etag("subject", subject_id, updated_at), updated_at)
+        if not_modified is not None:
+            return not_modified
+    subject = await db.get(Subject, subject_id)
     if not subject:
         raise HTTPException(status_code=404, detail="Subject not found")
     return subject
 
 @router.post("/", response_model=SubjectOut, dependencies=[Depends(require_admin)])
-async def create_subject(data: SubjectIn, db: Session = Depends(get_db)):
-    exists = db.query(Subject).filter(Subject.name == data.name).first()
+async def create_subject(data: SubjectIn, db: AsyncSession = Depends(get_async_db)):
+    exists = await db.scalar(select(Subject).where(Subject.name == data.name))
     if exists:
         raise HTTPException(status_code=400, detail="Subject already exists")
     s = Subject(
@@ -31,36 +47,40 @@ async def create_subject(data: SubjectIn, db: Session = Depends(get_db)):
         description=data.description,
         duration=data.duration,
         totalQuestions=data.totalQuestions,
-        passingScore=data.passingScore
+        passingScore=data.passingScore,
+        questionsPerExam=data.questionsPerExam,
+        shuffle=data.shuffle,
     )
     db.add(s)
-    db.commit()
-    db.refresh(s)
+    await db.commit()
+    await db.refresh(s)
     return s
 
 @router.put("/{subject_id}", response_model=SubjectOut, dependencies=[Depends(require_admin)])
-async def update_subject(subject_id: int, data: SubjectIn, db: Session = Depends(get_db)):
-    subject = db.query(Subject).filter(Subject.id == subject_id).first()
+async def update_subject(subject_id: int, data: SubjectIn, db: AsyncSession = Depends(get_async_db)):
+    subject = await db.get(Subject, subject_id)
     if not subject:
         raise HTTPException(status_code=404, detail="Subject not found")
     
-    name_exists = db.query(Subject).filter(Subject.name == data.name, Subject.id != subject_id).first()
+    name_exists = await db.scalar(select(Subject).where(Subject.name == data.name, Subject.id != subject_id))
     if name_exists:
         raise HTTPException(status_code=400, detail="Subject with this name already exists")
     
     for key, value in data.model_dump().items():
         setattr(subject, key, value)
     
-    db.commit()
-    db.refresh(subject)
+    await db.commit()
+    paper_cache.invalidate(subject_id)
+    await db.refresh(subject)
     return subject
 
 @router.delete("/{subject_id}", dependencies=[Depends(require_admin)])
-def delete_subject(subject_id: int, db: Session = Depends(get_db)):
-    subject = db.query(Subject).filter(Subject.id == subject_id).first()
+async def delete_subject(subject_id: int, db: AsyncSession = Depends(get_async_db)):
+    subject = await db.get(Subject, subject_id)
     if not subject:
         raise HTTPException(status_code=404, detail="Subject not found")
     
-    db.delete(subject)
-    db.commit()
+    await db.delete(subject)
+    await db.commit()
+    paper_cache.invalidate(subject_id)
     return {"message": "Subject deleted successfully"}
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 
 class SubjectBase(BaseModel):
@@ -7,6 +7,8 @@ class SubjectBase(BaseModel):
     duration: int
     totalQuestions: int
     passingScore: float
+    questionsPerExam: int | None = Field(None, ge=1)
+    shuffle: bool = False
 
 class SubjectIn(SubjectBase):
     pass
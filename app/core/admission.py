@@ -0,0 +1,191 @@
+"""Priority-aware admission control.
+
+Every request is classified by method and path (ADMISSION_RULES, first match
+wins) into one of the classes below, highest priority first:
+
+    exam     start, autosave, submit and login: queued briefly, never shed early
+    catalog  subject/question reads and a student's own results
+    admin    listings, exports, analytics: the first to go under pressure
+
+A request is admitted only while its class, its route (ADMISSION_ROUTE_LIMITS)
+and the worker as a whole have room. Lower classes stop being admitted once
+total in-flight requests pass their ADMISSION_SHED_AT fraction of
+ADMISSION_MAX_IN_FLIGHT, which leaves the remaining headroom to exam
+traffic. Authenticated users also get a token bucket per class
+(ADMISSION_RATES). Shed requests get a fast 503, rate-limited ones a 429,
+both with Retry-After. All state is per worker process.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from fnmatch import fnmatchcase
+
+from fastapi.responses import JSONResponse
+from jose import JWTError
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.deps import decode_token
+
+CLASSES = ("exam", "catalog", "admin")
+EXEMPT = "exempt"
+MAX_TRACKED_BUCKETS = 100_000
+
+admission_in_flight = metrics.Gauge("admission_in_flight", "Admitted requests in flight by priority class", ("class",))
+admission_rejected = metrics.Counter(
+    "admission_rejected_total", "Requests turned away by admission control", ("class", "reason")
+)
+admission_wait = metrics.Histogram("admission_queue_wait_seconds", "Time exam-class requests waited for a slot")
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Spend one token; returns 0 when allowed, else seconds until one is available"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+def classify(method: str, path: str) -> str:
+    for rule_method, pattern, priority in settings.ADMISSION_RULES:
+        if rule_method in ("*", method) and fnmatchcase(path, pattern):
+            return priority
+    return settings.ADMISSION_DEFAULT_CLASS
+
+
+def _user_key(scope) -> str | None:
+    """Token subject of an authenticated request; None for anonymous or invalid tokens"""
+    for name, value in scope.get("headers", ()):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer" or not token:
+                return None
+            try:
+                return str(decode_token(token).get("sub"))
+            except JWTError:
+                # get_current_user rejects it properly later
+                return None
+    return None
+
+
+class AdmissionMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self.in_flight = 0
+        self.class_in_flight = {priority: 0 for priority in CLASSES}
+        self.route_in_flight: dict[str, int] = {}
+        self._exam_waiters: asyncio.Condition | None = None
+        self._buckets: "OrderedDict[tuple[str, str], TokenBucket]" = OrderedDict()
+
+    def _reject(self, status_code: int, priority: str, reason: str, detail: str, retry_after: float):
+        admission_rejected.inc(priority, reason)
+        headers = {"Retry-After": str(max(1, round(retry_after)))}
+        return JSONResponse({"detail": detail}, status_code=status_code, headers=headers)
+
+    def _rate_limited(self, scope, priority: str) -> float:
+        rate = settings.ADMISSION_RATES.get(priority)
+        user = _user_key(scope) if rate else None
+        if user is None:
+            # anonymous traffic (login, signup) shares NAT addresses in exam halls; only concurrency-limited
+            return 0.0
+        key = (user, priority)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(*rate)
+            if len(self._buckets) > MAX_TRACKED_BUCKETS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.take()
+
+    def _route_limit(self, path: str) -> tuple[str, int] | None:
+        for pattern, limit in settings.ADMISSION_ROUTE_LIMITS.items():
+            if fnmatchcase(path, pattern):
+                return pattern, limit
+        return None
+
+    def _has_room(self, priority: str) -> bool:
+        capacity = settings.ADMISSION_MAX_IN_FLIGHT
+        return (
+            self.class_in_flight[priority] < settings.ADMISSION_CLASS_LIMITS.get(priority, capacity)
+            and self.in_flight < capacity * settings.ADMISSION_SHED_AT.get(priority, 1.0)
+        )
+
+    async def _wait_for_room(self) -> bool:
+        """Exam traffic queues for up to ADMISSION_QUEUE_TIMEOUT_SECONDS instead of failing outright"""
+        if self._exam_waiters is None:
+            self._exam_waiters = asyncio.Condition()
+        started = time.perf_counter()
+        try:
+            async with self._exam_waiters:
+                await asyncio.wait_for(
+                    self._exam_waiters.wait_for(lambda: self._has_room("exam")),
+                    settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+                )
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            admission_wait.observe(time.perf_counter() - started)
+
+    async def _release(self, priority: str, route: str | None) -> None:
+        self.in_flight -= 1
+        self.class_in_flight[priority] -= 1
+        admission_in_flight.dec(priority)
+        if route is not None:
+            self.route_in_flight[route] -= 1
+        if self._exam_waiters is not None:
+            async with self._exam_waiters:
+                self._exam_waiters.notify()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.ADMISSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        priority = classify(scope["method"], scope["path"])
+        if priority not in CLASSES:
+            await self.app(scope, receive, send)
+            return
+
+        retry_after = self._rate_limited(scope, priority)
+        if retry_after:
+            response = self._reject(429, priority, "rate_limit", "Too many requests", retry_after)
+            await response(scope, receive, send)
+            return
+
+        route_limit = self._route_limit(scope["path"])
+        if route_limit is not None and self.route_in_flight.get(route_limit[0], 0) >= route_limit[1]:
+            response = self._reject(503, priority, "route_limit", "This endpoint is busy, try again shortly",
+                                    settings.ADMISSION_RETRY_AFTER_SECONDS)
+            await response(scope, receive, send)
+            return
+
+        if not self._has_room(priority) and (priority != "exam" or not await self._wait_for_room()):
+            response = self._reject(503, priority, "overload", "Server is busy, try again shortly",
+                                    settings.ADMISSION_RETRY_AFTER_SECONDS)
+            await response(scope, receive, send)
+            return
+
+        # nothing awaits between the checks above and these increments, so no other request interleaves
+        route = route_limit[0] if route_limit is not None else None
+        self.in_flight += 1
+        self.class_in_flight[priority] += 1
+        admission_in_flight.inc(priority)
+        if route is not None:
+            self.route_in_flight[route] = self.route_in_flight.get(route, 0) + 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            await self._release(priority, route)
@@ -0,0 +1,122 @@
+"""Signed offline exam bundles and the answer sets that come back from them.
+
+A bundle is gzipped JSON: the student-safe paper plus, for sampled or
+shuffled papers, each rostered student's questions and option order. It is
+signed with a per-bundle key, HMAC(SECRET_KEY, bundle_id), handed to the
+proctor machine alongside the file. The proctor signs every student's
+answer set with the same key, so the server can verify uploads without
+storing anything per bundle:
+
+    signature = hmac_sha256(bundle_key, canonical({"bundle_id", "student_id", "answers"}))
+
+The bundle id carries the subject, a fingerprint of the paper layout and
+the upload deadline.
+"""
+import gzip
+import hashlib
+import hmac
+import json
+import secrets
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from app.core.config import settings
+from app.core.exam_cache import ExamPaper
+from app.core.sampling import exam_seed, option_order
+
+BUNDLE_FORMAT = 1
+
+
+class BundleError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class BundleId:
+    subject_id: int
+    fingerprint: str
+    expires_at: datetime
+    raw: str
+
+
+def canonical(value) -> bytes:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def bundle_key(bundle_id: str) -> str:
+    return hmac.new(settings.SECRET_KEY.encode(), f"bundle:{bundle_id}".encode(), hashlib.sha256).hexdigest()
+
+
+def sign(key: str, value) -> str:
+    return hmac.new(key.encode(), canonical(value), hashlib.sha256).hexdigest()
+
+
+def paper_fingerprint(paper: ExamPaper) -> str:
+    """Changes whenever the questions a student would be served could change"""
+    layout = f"{','.join(map(str, paper.question_ids))}|{paper.questions_per_exam}|{paper.shuffle}"
+    return hashlib.sha1(layout.encode()).hexdigest()[:12]
+
+
+def new_bundle_id(paper: ExamPaper, expires_at: datetime) -> str:
+    """`expires_at` must be timezone-aware; the id carries it as a Unix timestamp"""
+    return f"{paper.subject_id}.{paper_fingerprint(paper)}.{int(expires_at.timestamp())}.{secrets.token_hex(4)}"
+
+
+def parse_bundle_id(raw: str) -> BundleId:
+    try:
+        subject_id, fingerprint, expires, _nonce = raw.split(".")
+        return BundleId(int(subject_id), fingerprint, datetime.fromtimestamp(int(expires), timezone.utc), raw)
+    except ValueError:
+        raise BundleError("Malformed bundle id")
+
+
+def build_bundle(paper: ExamPaper, subject_name: str, student_ids: list[int]) -> tuple[bytes, str, str]:
+    """Returns (gzipped bundle, bundle id, bundle key)"""
+    issued_at = datetime.now(timezone.utc).replace(microsecond=0)
+    expires_at = issued_at + timedelta(hours=settings.BUNDLE_TTL_HOURS)
+    bundle_id = new_bundle_id(paper, expires_at)
+
+    assignments = {}
+    if paper.personalised:
+        for student_id in student_ids:
+            seed = exam_seed(student_id, paper.subject_id)
+            selected = paper.selected_ids(student_id)
+            assignment = {"question_ids": selected}
+            if paper.shuffle:
+                # canonical option shown under each displayed letter A..D
+                assignment["options"] = {str(qid): "".join(option_order(seed, qid)) for qid in selected}
+            assignments[str(student_id)] = assignment
+
+    payload = {
+        "format": BUNDLE_FORMAT,
+        "bundle_id": bundle_id,
+        "subject_id": paper.subject_id,
+        "subject_name": subject_name,
+        "duration": paper.duration,
+        "questions_per_exam": paper.questions_per_exam,
+        "shuffle": paper.shuffle,
+        "issued_at": issued_at.isoformat(),
+        "upload_by": expires_at.isoformat(),
+        "questions": list(paper.questions),
+        "assignments": assignments,
+    }
+    key = bundle_key(bundle_id)
+    body = canonical({"bundle": payload, "signature": sign(key, payload)})
+    return gzip.compress(body, compresslevel=9), bundle_id, key
+
+
+def check_bundle(raw: str, paper: ExamPaper) -> BundleId:
+    """Validate an uploaded bundle id against the subject's current paper"""
+    bundle = parse_bundle_id(raw)
+    if bundle.subject_id != paper.subject_id:
+        raise BundleError("Bundle belongs to another subject")
+    if datetime.now(timezone.utc) > bundle.expires_at:
+        raise BundleError("Bundle upload window has closed")
+    if bundle.fingerprint != paper_fingerprint(paper):
+        raise BundleError("Questions or sampling changed since this bundle was issued")
+    return bundle
+
+
+def verify_answer_set(bundle_id: str, student_id: int, answers: dict, signature: str) -> bool:
+    expected = sign(bundle_key(bundle_id), {"bundle_id": bundle_id, "student_id": student_id, "answers": answers})
+    return hmac.compare_digest(expected, signature)
@@ -8,6 +8,117 @@ class Settings(BaseSettings):
     ADMIN_EMAIL: str
     ADMIN_PASSWORD: str
     FRONTEND_URL: str
+    # defaults to DATABASE_URL mapped onto its asyncio driver
+    ASYNC_DATABASE_URL: str | None = None
+    # optional replica for GET listings and analytics; writes always use DATABASE_URL
+    READ_REPLICA_URL: str | None = None
+
+    # connection pool, applied to every engine
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+
+    # bcrypt runs on its own pool; logins beyond BCRYPT_MAX_PENDING get a fast 503
+    BCRYPT_POOL_SIZE: int = 4
+    BCRYPT_MAX_PENDING: int = 64
+    BCRYPT_RETRY_AFTER_SECONDS: int = 2
+
+    # authenticated users are cached briefly instead of loaded on every request
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 30
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    TOKEN_CACHE_SIZE: int = 10000
+
+    # admission control (app.core.admission); limits are per worker process
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_MAX_IN_FLIGHT: int = 64
+    ADMISSION_CLASS_LIMITS: dict[str, int] = {"exam": 64, "catalog": 32, "admin": 8}
+    # share of ADMISSION_MAX_IN_FLIGHT above which a class is no longer admitted
+    ADMISSION_SHED_AT: dict[str, float] = {"exam": 1.0, "catalog": 0.75, "admin": 0.5}
+    # (method or *, path glob, class); first match wins, class "exempt" bypasses admission
+    ADMISSION_RULES: list[tuple[str, str, str]] = [
+        ("*", "/metrics", "exempt"),
+        ("*", "/api/v1/exams/autosave-stats", "admin"),
+        ("*", "/api/v1/exams/submission-queue", "admin"),
+        ("*", "/api/v1/exams/bundle*", "admin"),
+        ("*", "/api/v1/exams/*", "exam"),
+        ("POST", "/api/v1/auth/login", "exam"),
+        ("POST", "/api/v1/auth/signup", "catalog"),
+        ("GET", "/api/v1/results/me", "catalog"),
+        ("GET", "/api/v1/results/rank/*/me", "catalog"),
+        ("GET", "/api/v1/results/", "admin"),
+        ("GET", "/api/v1/results/export", "admin"),
+        ("GET", "/api/v1/results/item-analysis/*", "admin"),
+        ("GET", "/api/v1/results/stats*", "admin"),
+        ("GET", "/api/v1/results/rank/*/top", "admin"),
+        # a student's own result, /results/{result_id}
+        ("GET", "/api/v1/results/*", "catalog"),
+        ("*", "/api/v1/results/*", "admin"),
+        ("*", "/api/v1/profiles/*", "admin"),
+        ("*", "/api/v1/auth/hash-stats", "admin"),
+        ("GET", "/api/v1/questions/search", "admin"),
+        ("GET", "/api/v1/questions/*/duplicates", "admin"),
+        ("POST", "/api/v1/*", "admin"),
+        ("PUT", "/api/v1/*", "admin"),
+        ("DELETE", "/api/v1/*", "admin"),
+    ]
+    ADMISSION_DEFAULT_CLASS: str = "catalog"
+    # path glob -> max concurrent requests, for endpoints that are expensive per call
+    ADMISSION_ROUTE_LIMITS: dict[str, int] = {
+        "/api/v1/results/export": 2,
+        "/api/v1/results/item-analysis/*": 2,
+        "/api/v1/results/regrade/*": 1,
+        "/api/v1/questions/*/import": 2,
+        "/api/v1/questions/*/duplicates": 2,
+        "/api/v1/exams/bundle-upload": 2,
+    }
+    # per authenticated user and class: (tokens per second, burst)
+    ADMISSION_RATES: dict[str, tuple[float, float]] = {"exam": (5, 30), "catalog": (10, 50), "admin": (20, 100)}
+    # how long exam-class requests wait for a slot before a 503
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 2.0
+    ADMISSION_RETRY_AFTER_SECONDS: int = 1
+
+    # run migrations and seeding on startup; for single-process development only
+    AUTO_MIGRATE: bool = False
+
+    # sent with subject and question catalogs; clients revalidate with ETags
+    CATALOG_CACHE_CONTROL: str = "private, no-cache"
+
+    # max number of subjects whose exam paper is kept in memory
+    EXAM_PAPER_CACHE_SIZE: int = 128
+    # response layout ids remembered per worker
+    RESPONSE_LAYOUT_CACHE_SIZE: int = 4096
+    # max subjects with an in-memory search or near-duplicate index
+    QUESTION_INDEX_CACHE_SIZE: int = 64
+    # Jaccard similarity of question shingles from which two questions are flagged as likely duplicates
+    DUPLICATE_THRESHOLD: float = 0.8
+
+    # write-behind mode: graded submissions are group-committed by a background writer
+    SUBMISSION_WRITE_BEHIND: bool = False
+    SUBMISSION_MAX_BATCH: int = 200
+    SUBMISSION_MAX_DELAY_MS: int = 50
+    # how long a request waits for the writer before answering 503 with Retry-After
+    SUBMISSION_RESULT_TIMEOUT_SECONDS: float = 10.0
+
+    # offline exam bundles: how long answers can be uploaded after download, and records per upload
+    BUNDLE_TTL_HOURS: int = 168
+    BUNDLE_MAX_RECORDS: int = 5000
+
+    # autosaves are buffered in memory and written in one batch per interval
+    AUTOSAVE_FLUSH_SECONDS: float = 5.0
+    # late submits after deadline + grace are graded from saved answers only
+    EXAM_DEADLINE_GRACE_SECONDS: int = 30
+
+    # requests running more SQL statements than this are logged as likely N+1s
+    QUERY_COUNT_WARNING_THRESHOLD: int = 25
+
+    # admin-triggered request profiles (X-Profile: 1) are written here
+    PROFILE_DIR: str = "profiles"
+    PROFILE_SAMPLE_INTERVAL_MS: float = 5.0
+
+    # per-subject rank trees are rebuilt at least this often
+    RANK_INDEX_TTL_SECONDS: int = 60
 
     class Config:
         env_file = ".env"  # tell Pydantic to load values from .env
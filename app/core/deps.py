@@ -1,9 +1,11 @@
+import time
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from jose import JWTError, jwt
 from app.core.config import settings
-from app.db.session import SessionLocal
+from app.db.session import SessionLocal, AsyncSessionLocal, ReadSessionLocal, AsyncReadSessionLocal
+from app.core.principals import Principal, cache_principal, principal_cache, token_cache
 from app.db.models.user import User, UserRole
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
@@ -15,30 +17,58 @@ def get_db():
     finally:
         db.close()
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def get_read_db():
+    """Session on the read replica (the primary if none is configured); may lag behind writes"""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+def decode_token(token: str) -> dict:
+    """Verify a JWT, memoized per token until it expires"""
+    payload = token_cache.get(token)
+    if payload is None:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        if "exp" in payload:
+            token_cache.put(token, payload, payload["exp"] - time.time())
+    return payload
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        payload = decode_token(token)
         user_id: str | None = payload.get("sub")
         if user_id is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
+    principal = principal_cache.get(int(user_id))
+    if principal is not None:
+        return principal
     user = db.get(User, int(user_id))
     if user is None:
         raise credentials_exception
-    return user
+    return cache_principal(user)
 
-def require_admin(user: User = Depends(get_current_user)) -> User:
+def require_admin(user: Principal = Depends(get_current_user)) -> Principal:
     if user.role != UserRole.admin:
         raise HTTPException(status_code=403, detail="Admins only")
     return user
 
-def require_student(user: User = Depends(get_current_user)) -> User:
+def require_student(user: Principal = Depends(get_current_user)) -> Principal:
     if user.role != UserRole.student:
         raise HTTPException(status_code=403, detail="Students only")
     return user
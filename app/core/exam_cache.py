@@ -0,0 +1,176 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.sampling import OPTIONS, exam_seed, option_order, select_questions
+from app.db.models.question import Question
+from app.db.models.subject import Subject
+
+
+@dataclass(frozen=True)
+class ExamPaper:
+    subject_id: int
+    version: int
+    duration: int  # in minutes
+    questions: tuple  # student-safe question dicts, no correct answers
+    answer_key: dict  # question id -> correct option, server side only
+    question_ids: tuple  # sorted, the layout responses are packed against
+    by_id: dict  # question id -> question dict
+    questions_per_exam: int | None = None
+    shuffle: bool = False
+    # the subject row it was built from; any other worker's edit moves one of them
+    questions_version: int = 0
+    updated_at: datetime | None = None
+
+    @property
+    def personalised(self) -> bool:
+        return self.shuffle or (
+            self.questions_per_exam is not None and self.questions_per_exam < len(self.question_ids)
+        )
+
+    def selected_ids(self, student_id: int) -> list[int]:
+        """Question ids served to a student, in the order they are shown"""
+        if not self.personalised:
+            return list(self.question_ids)
+        seed = exam_seed(student_id, self.subject_id)
+        return select_questions(self.question_ids, self.questions_per_exam, self.shuffle, seed)
+
+    def for_student(self, student_id: int, question_ids: list[int] | None = None) -> list[dict]:
+        """Student-safe questions as served; `question_ids` replays an earlier selection"""
+        if question_ids is None and not self.personalised:
+            return list(self.questions)
+        seed = exam_seed(student_id, self.subject_id)
+        if question_ids is None:
+            question_ids = select_questions(self.question_ids, self.questions_per_exam, self.shuffle, seed)
+        questions = []
+        for question_id in question_ids:
+            question = self.by_id.get(question_id)
+            if question is None:
+                # deleted since it was served
+                continue
+            if self.shuffle:
+                order = option_order(seed, question_id)
+                question = {
+                    **question,
+                    "options": {shown: question["options"][canonical] for shown, canonical in zip(OPTIONS, order)},
+                }
+            questions.append(question)
+        return questions
+
+
+class ExamPaperCache:
+    """Per-subject LRU cache of the student-safe exam paper.
+
+    Every invalidation bumps the subject's version, so a paper that was being
+    loaded while an admin edited the subject is never stored. That only
+    covers edits made on this worker; load_paper also checks each hit against
+    the subject row.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._papers: "OrderedDict[int, ExamPaper]" = OrderedDict()
+        self._versions: dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def version(self, subject_id: int) -> int:
+        with self._lock:
+            return self._versions.get(subject_id, 0)
+
+    def get(self, subject_id: int) -> ExamPaper | None:
+        with self._lock:
+            paper = self._papers.get(subject_id)
+            if paper is not None:
+                self._papers.move_to_end(subject_id)
+            return paper
+
+    def put(self, paper: ExamPaper) -> bool:
+        with self._lock:
+            if self._versions.get(paper.subject_id, 0) != paper.version:
+                return False
+            self._papers[paper.subject_id] = paper
+            self._papers.move_to_end(paper.subject_id)
+            while len(self._papers) > self.max_size:
+                self._papers.popitem(last=False)
+            return True
+
+    def invalidate(self, subject_id: int) -> None:
+        with self._lock:
+            self._versions[subject_id] = self._versions.get(subject_id, 0) + 1
+            self._papers.pop(subject_id, None)
+
+
+paper_cache = ExamPaperCache(settings.EXAM_PAPER_CACHE_SIZE)
+
+
+def load_paper(db: Session, subject_id: int) -> ExamPaper | None:
+    """Return the cached paper for a subject, loading it on a miss.
+
+    Returns None when the subject does not exist or has no questions. A hit
+    costs one primary key lookup: question edits bump the subject's
+    questionsVersion and subject edits move its updatedAt, so a paper cached
+    before an edit made on another worker is reloaded rather than served.
+    """
+    version = paper_cache.version(subject_id)
+    stamp = db.query(Subject.questionsVersion, Subject.updatedAt).filter(Subject.id == subject_id).first()
+    if stamp is None:
+        paper_cache.invalidate(subject_id)
+        return None
+    paper = paper_cache.get(subject_id)
+    if paper is not None and (paper.questions_version, paper.updated_at) == tuple(stamp):
+        return paper
+
+    subject = db.get(Subject, subject_id)
+    if not subject:
+        return None
+    rows = (
+        db.query(
+            Question.id,
+            Question.question_text,
+            Question.option_a,
+            Question.option_b,
+            Question.option_c,
+            Question.option_d,
+            Question.correct_option,
+        )
+        .filter(Question.subject_id == subject_id)
+        .order_by(Question.id)
+        .all()
+    )
+    if not rows:
+        return None
+
+    # Convert questions to dict without correct answers
+    questions = tuple({
+        "id": row.id,
+        "question_text": row.question_text,
+        "options": {
+            "A": row.option_a,
+            "B": row.option_b,
+            "C": row.option_c,
+            "D": row.option_d,
+        }
+    } for row in rows)
+
+    answer_key = {row.id: row.correct_option for row in rows}
+
+    paper = ExamPaper(
+        subject_id=subject_id,
+        version=version,
+        duration=subject.duration,
+        questions=questions,
+        answer_key=answer_key,
+        question_ids=tuple(answer_key),
+        by_id={question["id"]: question for question in questions},
+        questions_per_exam=subject.questionsPerExam,
+        shuffle=bool(subject.shuffle),
+        # from the first read: if it moved since, the next hit just reloads
+        questions_version=stamp.questionsVersion,
+        updated_at=stamp.updatedAt,
+    )
+    paper_cache.put(paper)
+    return paper
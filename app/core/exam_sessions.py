@@ -0,0 +1,278 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.exam_cache import load_paper
+from app.core.grading import grade_submission
+from app.core.submission_queue import SubmissionUnavailable, store_result
+from app.db.models.exam_session import ExamSession
+from app.db.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+SWEEP_BATCH_SIZE = 100
+
+
+@dataclass
+class SessionInfo:
+    id: int
+    deadline: datetime
+    submitted: bool = False
+    question_ids: list[int] | None = None  # served at start; None for sessions from before they were recorded
+
+    def seconds_left(self) -> int:
+        return max(int((self.deadline - datetime.utcnow()).total_seconds()), 0)
+
+    def is_late(self) -> bool:
+        return datetime.utcnow() > self.deadline + timedelta(seconds=settings.EXAM_DEADLINE_GRACE_SECONDS)
+
+
+class AutosaveBuffer:
+    """Coalesces autosaves in memory and writes them in one transaction per interval.
+
+    The same background thread also auto-submits sessions whose deadline has
+    passed.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._sessions: dict[tuple[int, int], SessionInfo] = {}
+        self._pending: dict[int, dict[int, str | None]] = {}
+        # the batch being written by flush(); still read by answers() until it commits
+        self._flushing: dict[int, dict[int, str | None]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.flushes = 0
+        self.flushed_sessions = 0
+        self.last_flush_seconds = 0.0
+        self.auto_submitted = 0
+
+    # -- session directory -------------------------------------------------
+
+    def lookup(self, db: Session, student_id: int, subject_id: int) -> SessionInfo | None:
+        key = (student_id, subject_id)
+        with self._lock:
+            info = self._sessions.get(key)
+        if info is not None:
+            return info
+        row = (
+            db.query(ExamSession.id, ExamSession.deadline, ExamSession.submitted_at, ExamSession.question_ids)
+            .filter(ExamSession.student_id == student_id, ExamSession.subject_id == subject_id)
+            .first()
+        )
+        if row is None:
+            return None
+        info = SessionInfo(
+            id=row.id, deadline=row.deadline, submitted=row.submitted_at is not None, question_ids=row.question_ids
+        )
+        with self._lock:
+            self._sessions[key] = info
+        return info
+
+    def open(self, db: Session, student_id: int, subject_id: int, duration_minutes: int, question_ids: list[int]) -> SessionInfo:
+        """Return the student's session for a subject, starting the clock and recording the questions on first call"""
+        info = self.lookup(db, student_id, subject_id)
+        if info is not None:
+            return info
+        now = datetime.utcnow()
+        try:
+            db.add(ExamSession(
+                student_id=student_id,
+                subject_id=subject_id,
+                started_at=now,
+                deadline=now + timedelta(minutes=duration_minutes),
+                answers={},
+                question_ids=question_ids,
+            ))
+            db.commit()
+        except IntegrityError:
+            # a concurrent start won the race; use its session
+            db.rollback()
+        return self.lookup(db, student_id, subject_id)
+
+    def forget(self, student_id: int, subject_id: int) -> None:
+        with self._lock:
+            self._sessions.pop((student_id, subject_id), None)
+
+    # -- answers -----------------------------------------------------------
+
+    def add(self, session_id: int, answers: dict) -> None:
+        self.start()
+        with self._lock:
+            self._pending.setdefault(session_id, {}).update(answers)
+
+    def _buffered(self, session_id: int) -> dict:
+        with self._lock:
+            return {**self._flushing.get(session_id, {}), **self._pending.get(session_id, {})}
+
+    def answers(self, db: Session, session_id: int) -> dict:
+        """Saved answers for a session, including ones not yet flushed"""
+        # read the buffers on both sides of the query: a flush committing in
+        # between moves answers from them into the row without this read seeing either
+        before = self._buffered(session_id)
+        saved = db.query(ExamSession.answers).filter(ExamSession.id == session_id).scalar() or {}
+        answers = {int(question_id): option for question_id, option in saved.items()}
+        answers.update(before)
+        answers.update(self._buffered(session_id))
+        return answers
+
+    def settle(self, db: Session) -> None:
+        """Wait until autosaves buffered on any worker so far have reached the database"""
+        # not holding a pooled connection meanwhile
+        db.commit()
+        time.sleep(self.interval)
+
+    def discard(self, session_id: int) -> None:
+        with self._lock:
+            self._pending.pop(session_id, None)
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._flushing:
+                # one flush at a time; what is pending waits for the next
+                return
+            pending, self._pending = self._pending, {}
+            self._flushing = pending
+        if not pending:
+            return
+        started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(ExamSession.id, ExamSession.answers)
+                .filter(ExamSession.id.in_(pending), ExamSession.submitted_at.is_(None))
+                .with_for_update()
+                .all()
+            )
+            updates = []
+            for row in rows:
+                merged = dict(row.answers or {})
+                merged.update({str(question_id): option for question_id, option in pending[row.id].items()})
+                updates.append({"id": row.id, "answers": merged})
+            if updates:
+                db.execute(update(ExamSession), updates)
+            db.commit()
+        except Exception:
+            db.rollback()
+            logger.exception("Failed to flush autosaves for %d sessions", len(pending))
+            # put them back so the next interval retries; newer answers win
+            with self._lock:
+                for session_id, answers in pending.items():
+                    self._pending[session_id] = {**answers, **self._pending.get(session_id, {})}
+                self._flushing = {}
+            return
+        finally:
+            db.close()
+        with self._lock:
+            self._flushing = {}
+        self.flushes += 1
+        self.flushed_sessions += len(updates)
+        self.last_flush_seconds = time.perf_counter() - started
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "pending_sessions": pending,
+            "flushes": self.flushes,
+            "flushed_sessions": self.flushed_sessions,
+            "last_flush_ms": self.last_flush_seconds * 1000,
+            "auto_submitted": self.auto_submitted,
+        }
+
+    # -- submission --------------------------------------------------------
+
+    def submit(self, db: Session, info: SessionInfo, values: dict) -> int | None:
+        """Claim the session and store its graded result together; None if it was already submitted"""
+        result_id = store_result(db, values, session_id=info.id)
+        if result_id is None:
+            return None
+        info.submitted = True
+        self.discard(info.id)
+        self.forget(values["student_id"], values["subject_id"])
+        return result_id
+
+    def close(self, db: Session, row) -> None:
+        """Mark an expired session submitted without storing a result"""
+        db.execute(update(ExamSession).where(ExamSession.id == row.id).values(submitted_at=datetime.utcnow()))
+        db.commit()
+        self.discard(row.id)
+        self.forget(row.student_id, row.subject_id)
+
+    def sweep_expired(self) -> None:
+        # answers are accepted until deadline + grace and may sit in another
+        # worker's buffer for one more interval; sweeping earlier would drop them
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.EXAM_DEADLINE_GRACE_SECONDS + self.interval)
+        db = SessionLocal()
+        try:
+            expired = (
+                db.query(
+                    ExamSession.id, ExamSession.student_id, ExamSession.subject_id, ExamSession.deadline,
+                    ExamSession.question_ids,
+                )
+                .filter(ExamSession.submitted_at.is_(None), ExamSession.deadline < cutoff)
+                .order_by(ExamSession.deadline)
+                .limit(SWEEP_BATCH_SIZE)
+                .all()
+            )
+            for row in expired:
+                paper = load_paper(db, row.subject_id)
+                if paper is None:
+                    # subject or all its questions deleted: nothing to grade, but
+                    # left open the row would hold a place in every later batch
+                    logger.warning("Closing exam session %d without a result: its paper no longer exists", row.id)
+                    self.close(db, row)
+                    continue
+                values = grade_submission(db, paper, row.student_id, self.answers(db, row.id), row.question_ids)
+                try:
+                    submitted = self.submit(db, SessionInfo(id=row.id, deadline=row.deadline), values)
+                except IntegrityError:
+                    # the student already has a result for the subject; just close the session
+                    db.rollback()
+                    self.close(db, row)
+                    continue
+                except SubmissionUnavailable:
+                    # still queued or rolled back; the session stays open until its row commits, so a later sweep retries
+                    logger.warning("Auto-submit of exam session %d not confirmed by the writer", row.id)
+                    continue
+                if submitted is not None:
+                    self.auto_submitted += 1
+        except Exception:
+            db.rollback()
+            logger.exception("Failed to auto-submit expired exam sessions")
+        finally:
+            db.close()
+
+    # -- background thread -------------------------------------------------
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="autosave-flusher", daemon=True)
+                self._thread.start()
+
+    def stop(self) -> None:
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        self._stop.set()
+        if thread is not None:
+            thread.join()
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.flush()
+            self.sweep_expired()
+
+
+autosave_buffer = AutosaveBuffer(settings.AUTOSAVE_FLUSH_SECONDS)
@@ -0,0 +1,55 @@
+from sqlalchemy.orm import Session
+
+from app.core import numeric
+from app.core.exam_cache import ExamPaper
+from app.core.sampling import exam_seed, to_canonical
+
+def grade_from_percentage(p: float) -> tuple[str, str]:
+    if p >= 70: return ("A", "PASS")
+    if p >= 60: return ("B", "PASS")
+    if p >= 50: return ("C", "PASS")
+    if p >= 45: return ("D", "PASS")
+    if p >= 40: return ("E", "PASS")
+    return ("F", "FAIL")
+
+def grade_submission(db: Session, paper: ExamPaper, student_id: int, answers: dict, served: list[int] | None = None) -> dict:
+    """Grade answers (question id -> option as shown) into the values of a Result row.
+
+    `served` is the question list recorded when the exam started; without it
+    the student's selection is re-sampled from the current paper.
+    """
+    item_analysis = numeric.load("app.core.item_analysis")
+
+    # Only the questions this student was served count, with shuffled options mapped back
+    if served is None:
+        presented = paper.selected_ids(student_id)
+    else:
+        # questions deleted since the exam started can't be scored
+        presented = [question_id for question_id in served if question_id in paper.answer_key]
+    if paper.shuffle:
+        seed = exam_seed(student_id, paper.subject_id)
+        answers = {question_id: to_canonical(seed, question_id, option) for question_id, option in answers.items()}
+
+    total = len(presented)
+    score = 0
+
+    for question_id in presented:
+        selected = answers.get(question_id)  # None if unanswered
+        if selected and selected == paper.answer_key[question_id]:
+            score += 1
+
+    percentage = (score / total * 100) if total else 0.0
+    # packed against only the questions served, so a result costs the same whatever the bank size
+    layout = sorted(presented)
+    grade, status = grade_from_percentage(percentage)
+    return dict(
+        student_id=student_id,
+        subject_id=paper.subject_id,
+        score=score,
+        total=total,
+        percentage=percentage,
+        grade=grade,
+        status=status,
+        layout_id=item_analysis.layout_id_for(db, paper.subject_id, layout),
+        responses=item_analysis.pack_responses(layout, answers),
+    )
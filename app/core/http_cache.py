@@ -0,0 +1,48 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response
+
+from app.core.config import settings
+
+
+def make_etag(*parts) -> str:
+    """Strong validator from the values that determine a representation"""
+    digest = hashlib.sha1(":".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest[:24]}"'
+
+
+def cache_headers(etag: str, last_modified: datetime | None = None) -> dict:
+    headers = {"ETag": etag, "Cache-Control": settings.CATALOG_CACHE_CONTROL}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+    return headers
+
+
+def is_fresh(request: Request, etag: str, last_modified: datetime | None = None) -> bool:
+    """True when the client's cached copy matches; If-None-Match wins over If-Modified-Since"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            # "-0000" parses to a naive datetime; RFC 5322 reads it as UTC
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= since
+    return False
+
+
+def conditional(request: Request, response: Response, etag: str, last_modified: datetime | None = None) -> Response | None:
+    """Set validators on `response`; return a 304 to send instead when the client is current"""
+    headers = cache_headers(etag, last_modified)
+    if is_fresh(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
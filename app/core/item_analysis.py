@@ -0,0 +1,186 @@
+"""Packed per-question responses and classical item analysis.
+
+Each result stores one 4-bit code per question of its ResponseLayout, the
+sorted ids of the questions served to that student, two codes per byte
+(high nibble first):
+
+    0 = not presented, 1 = unanswered, 2..5 = options A..D
+
+Results stored before layouts followed the selection were packed against
+the whole bank and mark the questions they weren't served as not presented.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models.response_layout import ResponseLayout
+
+OPTIONS = ("A", "B", "C", "D")
+NOT_PRESENTED = 0
+UNANSWERED = 1
+OPTION_CODES = {option: code for code, option in enumerate(OPTIONS, start=2)}
+
+
+def pack_ids(question_ids) -> bytes:
+    return np.asarray(question_ids, dtype="<i4").tobytes()
+
+
+def unpack_ids(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype="<i4")
+
+
+def pack_responses(question_ids, answers: dict) -> bytes:
+    """Pack a student's answers against a sorted layout of the question ids served to them"""
+    codes = np.zeros(len(question_ids) + len(question_ids) % 2, dtype=np.uint8)
+    codes[:len(question_ids)] = [OPTION_CODES.get(answers.get(int(question_id)), UNANSWERED) for question_id in question_ids]
+    return ((codes[0::2] << 4) | codes[1::2]).tobytes()
+
+
+def unpack_matrix(blobs: list[bytes], n_questions: int) -> np.ndarray:
+    """Unpack equally sized response blobs into an (n_results, n_questions) code matrix"""
+    n_bytes = (n_questions + 1) // 2
+    packed = np.frombuffer(b"".join(blobs), dtype=np.uint8).reshape(len(blobs), n_bytes)
+    codes = np.empty((len(blobs), n_bytes * 2), dtype=np.uint8)
+    codes[:, 0::2] = packed >> 4
+    codes[:, 1::2] = packed & 0x0F
+    return codes[:, :n_questions]
+
+
+# digest -> id, LRU: one layout per distinct selection, so personalised papers make roughly one per student
+_layout_ids: "OrderedDict[str, int]" = OrderedDict()
+_layout_lock = threading.Lock()
+
+
+def layout_id_for(db: Session, subject_id: int, question_ids) -> int:
+    """Get or create the ResponseLayout for an ordered list of question ids.
+
+    A new layout is inserted under a savepoint in the caller's transaction,
+    which store_result commits ahead of the result. Opening a second
+    connection here instead can deadlock a pool saturated by a burst of
+    submissions.
+    """
+    blob = pack_ids(question_ids)
+    digest = hashlib.sha1(blob).hexdigest()
+    with _layout_lock:
+        layout_id = _layout_ids.get(digest)
+        if layout_id is not None:
+            _layout_ids.move_to_end(digest)
+    if layout_id is not None:
+        return layout_id
+
+    layout_id = db.query(ResponseLayout.id).filter(ResponseLayout.digest == digest).scalar()
+    if layout_id is None:
+        try:
+            with db.begin_nested():
+                row = ResponseLayout(subject_id=subject_id, digest=digest, question_ids=blob)
+                db.add(row)
+            # not cached yet: on most drivers the caller may still roll it back.
+            # pysqlite commits a savepoint that opened the transaction when it is
+            # released, so there the row survives a rollback, which is harmless
+            return row.id
+        except IntegrityError:
+            layout_id = db.query(ResponseLayout.id).filter(ResponseLayout.digest == digest).scalar()
+    with _layout_lock:
+        _layout_ids[digest] = layout_id
+        _layout_ids.move_to_end(digest)
+        while len(_layout_ids) > settings.RESPONSE_LAYOUT_CACHE_SIZE:
+            _layout_ids.popitem(last=False)
+    return layout_id
+
+
+def response_entries(layouts: dict[int, np.ndarray], results: list[tuple[int, bytes]]):
+    """Unpack results packed against different layouts into parallel flat arrays.
+
+    Returns (rows, question_ids, codes) with one entry per question of each
+    result's layout, so memory follows the questions served rather than the
+    size of the bank. Results whose layout is missing contribute nothing.
+    """
+    # results with layouts of the same length unpack as one matrix
+    by_length: dict[int, list[int]] = {}
+    for index, (layout_id, _) in enumerate(results):
+        layout = layouts.get(layout_id)
+        if layout is not None and len(layout):
+            by_length.setdefault(len(layout), []).append(index)
+    rows, question_ids, codes = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.uint8)]
+    for length, indices in by_length.items():
+        rows.append(np.repeat(np.asarray(indices, dtype=np.int64), length))
+        question_ids.append(np.stack([layouts[results[i][0]] for i in indices]).astype(np.int64).ravel())
+        codes.append(unpack_matrix([results[i][1] for i in indices], length).ravel())
+    return np.concatenate(rows), np.concatenate(question_ids), np.concatenate(codes)
+
+
+def keyed_entries(layouts: dict[int, np.ndarray], results: list[tuple[int, bytes]], answer_key: dict):
+    """response_entries restricted to presented questions still in `answer_key`.
+
+    Returns (question_ids, rows, columns, codes, key): the distinct question
+    ids, and per entry its result row, column into question_ids, response
+    code and correct option code.
+    """
+    rows, ids, codes = response_entries(layouts, results)
+    # results packed against the whole bank mark unserved questions NOT_PRESENTED
+    keep = (codes != NOT_PRESENTED) & np.isin(ids, np.fromiter(answer_key, dtype=np.int64, count=len(answer_key)))
+    rows, ids, codes = rows[keep], ids[keep], codes[keep]
+    question_ids, columns = np.unique(ids, return_inverse=True)
+    item_key = np.array([OPTION_CODES.get(answer_key[int(qid)], 0) for qid in question_ids], dtype=np.uint8)
+    return question_ids, rows, columns, codes, item_key[columns]
+
+
+def analyse(n_results: int, n_items: int, rows: np.ndarray, columns: np.ndarray, codes: np.ndarray, key: np.ndarray) -> dict:
+    """Classical test theory statistics from keyed_entries.
+
+    Returns per-item difficulty (proportion correct), point-biserial
+    discrimination against the rest score, option/blank frequencies, and
+    Cronbach's alpha over the students who were presented every item.
+    """
+    correct = (codes == key).astype(np.float64)
+    n_presented = np.bincount(columns, minlength=n_items)
+    n_correct = np.bincount(columns, weights=correct, minlength=n_items)
+    totals = np.bincount(rows, weights=correct, minlength=n_results)[rows]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        difficulty = n_correct / n_presented
+
+        # point-biserial of each item against the rest score (total minus the
+        # item), from per-item sums over the students it was presented to
+        n = n_presented.astype(np.float64)
+        sum_total = np.bincount(columns, weights=totals, minlength=n_items)
+        sum_total_correct = np.bincount(columns, weights=totals * correct, minlength=n_items)
+        sum_total_sq = np.bincount(columns, weights=totals ** 2, minlength=n_items)
+        mean_x = n_correct / n
+        mean_rest = (sum_total - n_correct) / n
+        cov = (sum_total_correct - n_correct) / n - mean_x * mean_rest
+        var_x = mean_x * (1 - mean_x)
+        var_rest = (sum_total_sq - 2 * sum_total_correct + n_correct) / n - mean_rest ** 2
+        discrimination = cov / np.sqrt(var_x * var_rest)
+
+    frequencies = {
+        option: np.bincount(columns[codes == code], minlength=n_items) for option, code in OPTION_CODES.items()
+    }
+    frequencies["blank"] = np.bincount(columns[codes == UNANSWERED], minlength=n_items)
+
+    complete = np.bincount(rows, minlength=n_results) == n_items
+    n_complete = int(complete.sum())
+    alpha = None
+    if n_complete > 1 and n_items > 1:
+        entries = complete[rows]
+        position = np.cumsum(complete) - 1
+        items = np.zeros((n_complete, n_items))
+        items[position[rows[entries]], columns[entries]] = correct[entries]
+        item_var = items.var(axis=0, ddof=1).sum()
+        total_var = items.sum(axis=1).var(ddof=1)
+        if total_var > 0:
+            alpha = float(n_items / (n_items - 1) * (1 - item_var / total_var))
+
+    return {
+        "n_presented": n_presented,
+        "difficulty": difficulty,
+        "discrimination": discrimination,
+        "frequencies": frequencies,
+        "alpha": alpha,
+        "n_complete": n_complete,
+    }
@@ -0,0 +1,184 @@
+"""In-process metrics rendered in the Prometheus text exposition format.
+
+Each worker process keeps its own registry; scrape every worker (or run one
+worker per target) to aggregate.
+"""
+import bisect
+import contextvars
+import logging
+import threading
+import time
+from dataclasses import dataclass
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+INF_BUCKET = 'le="+Inf"'
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self._values: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            lines.extend(self._render_value(label_values, value))
+        return lines
+
+    def _render_value(self, label_values: tuple, value) -> list[str]:
+        return [f"{self.name}{_labels(self.label_names, label_values)} {_number(value)}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = buckets
+
+    def observe(self, value: float, *labels) -> None:
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * len(self.buckets), 0, 0.0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                state[0][index] += 1
+            state[1] += 1
+            state[2] += value
+
+    def _render_value(self, label_values: tuple, state) -> list[str]:
+        counts, count, total = state
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            le = _labels(self.label_names, label_values, f'le="{bound}"')
+            lines.append(f"{self.name}_bucket{le} {cumulative}")
+        lines.append(f"{self.name}_bucket{_labels(self.label_names, label_values, INF_BUCKET)} {count}")
+        lines.append(f"{self.name}_count{_labels(self.label_names, label_values)} {count}")
+        lines.append(f"{self.name}_sum{_labels(self.label_names, label_values)} {_number(total)}")
+        return lines
+
+
+registry: list[Metric] = []
+
+http_requests = Counter("http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+http_latency = Histogram("http_request_duration_seconds", "HTTP request latency", ("method", "route"))
+http_in_flight = Gauge("http_requests_in_flight", "HTTP requests currently being served")
+db_queries = Counter("db_queries_total", "SQL statements executed by route", ("route",))
+db_time = Counter("db_query_seconds_total", "Time spent executing SQL by route", ("route",))
+db_queries_per_request = Histogram(
+    "db_queries_per_request", "SQL statements per HTTP request", ("route",), buckets=COUNT_BUCKETS
+)
+db_pool_wait = Histogram("db_pool_checkout_wait_seconds", "Time waiting to check a connection out of the pool", ("engine",))
+bcrypt_wait = Histogram("bcrypt_queue_wait_seconds", "Time bcrypt jobs waited for a worker")
+bcrypt_time = Histogram("bcrypt_hash_seconds", "Time spent inside bcrypt")
+bcrypt_rejected = Counter("bcrypt_rejected_total", "bcrypt jobs rejected because the queue was full")
+submission_queue_depth = Gauge("submission_queue_depth", "Graded submissions waiting for the write-behind writer")
+submission_flush_time = Histogram("submission_flush_seconds", "Time the write-behind writer took to commit a batch")
+submission_batch_size = Histogram(
+    "submission_batch_size", "Submissions committed per write-behind batch", buckets=COUNT_BUCKETS
+)
+submission_failures = Counter("submission_failures_total", "Submissions the write-behind writer failed to store")
+
+
+def render() -> str:
+    lines: list[str] = []
+    for metric in registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    db_seconds: float = 0.0
+
+
+current_request: contextvars.ContextVar[RequestStats | None] = contextvars.ContextVar("current_request", default=None)
+
+
+def instrument_engine(engine: Engine, name: str) -> None:
+    """Count statements and DB time per request, and time pool checkouts"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_started"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        stats = current_request.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += time.perf_counter() - conn.info.pop("query_started", time.perf_counter())
+
+    _time_checkouts(engine.pool, name)
+
+    @event.listens_for(engine, "engine_disposed")
+    def _disposed(engine):
+        # dispose() swaps in pool.recreate(), a fresh pool without the timed connect
+        _time_checkouts(engine.pool, name)
+
+
+def _time_checkouts(pool: Pool, name: str) -> None:
+    # no pool event fires before a checkout starts waiting, so time the call itself
+    checkout = pool.connect
+
+    def timed_connect():
+        started = time.perf_counter()
+        try:
+            return checkout()
+        finally:
+            db_pool_wait.observe(time.perf_counter() - started, name)
+
+    pool.connect = timed_connect
@@ -0,0 +1,138 @@
+"""Near-duplicate questions within a subject, via shingling and MinHash/LSH.
+
+A question's shingles are the word trigrams of its text plus each option as
+a whole, so reordered options still match. MinHash signatures of
+MINHASH_PERMUTATIONS values are cut into LSH_BANDS bands; questions sharing
+any band land in the same bucket and become candidates, which are then
+confirmed by exact Jaccard similarity against DUPLICATE_THRESHOLD. With 16
+bands of 8 rows a pair at similarity 0.8 is a candidate ~94% of the time and
+one at 0.4 about 1%, so each lookup only touches a few buckets rather than
+the whole subject.
+"""
+import random
+import zlib
+from functools import lru_cache
+
+from sqlalchemy.orm import Session
+
+from app.core import numeric
+from app.core.config import settings
+from app.core.question_search import SubjectIndexCache, tokenize
+from app.db.models.question import Question
+from app.db.models.subject import Subject
+
+MINHASH_PERMUTATIONS = 128
+LSH_BANDS = 16
+SHINGLE_SIZE = 3
+_PRIME = (1 << 31) - 1
+# fixed so signatures are comparable across workers and restarts
+_rng = random.Random(0x5EED)
+_COEFFICIENTS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(MINHASH_PERMUTATIONS)]
+
+
+def shingles(question) -> frozenset[int]:
+    """Hashed shingles of a question row, dict or model"""
+    get = question.get if isinstance(question, dict) else lambda column: getattr(question, column)
+    words = tokenize(get("question_text"))
+    grams = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(max(len(words) - SHINGLE_SIZE + 1, 1))}
+    grams.update("option:" + " ".join(tokenize(get(column))) for column in ("option_a", "option_b", "option_c", "option_d"))
+    return frozenset(zlib.crc32(gram.encode()) & _PRIME for gram in grams)
+
+
+@lru_cache(maxsize=1)
+def _permutations():
+    np = numeric.load("numpy")
+
+    a, b = (np.array(values, dtype=np.uint64)[:, None] for values in zip(*_COEFFICIENTS))
+    return np, a, b
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+class DuplicateIndex:
+    """LSH buckets and shingle sets for one subject's questions"""
+
+    def __init__(self):
+        self.shingles: dict[int, frozenset[int]] = {}
+        self.keys: dict[int, list[bytes]] = {}
+        self.buckets: list[dict[bytes, list[int]]] = [{} for _ in range(LSH_BANDS)]
+
+    @staticmethod
+    def band_keys(shingle_set: frozenset[int]) -> list[bytes]:
+        np, a, b = _permutations()
+        values = np.fromiter(shingle_set, dtype=np.uint64, count=len(shingle_set))
+        # a, b and values are below 2**31, so a * values + b stays inside uint64
+        signature = ((a * values + b) % _PRIME).min(axis=1)
+        return [band.tobytes() for band in np.split(signature, LSH_BANDS)]
+
+    def add(self, question_id: int, shingle_set: frozenset[int]) -> None:
+        keys = self.band_keys(shingle_set)
+        self.shingles[question_id] = shingle_set
+        self.keys[question_id] = keys
+        for bucket, key in zip(self.buckets, keys):
+            bucket.setdefault(key, []).append(question_id)
+
+    def similar(self, shingle_set: frozenset[int], threshold: float, question_id: int | None = None) -> list[tuple[int, float]]:
+        """(question id, similarity) of indexed questions at or above `threshold`, most similar first.
+
+        Pass `question_id` when the shingles are an indexed question's own, to skip it and reuse its band keys.
+        """
+        keys = self.keys.get(question_id) or self.band_keys(shingle_set)
+        candidates = set()
+        for bucket, key in zip(self.buckets, keys):
+            candidates.update(bucket.get(key, ()))
+        candidates.discard(question_id)
+        matches = [(question_id, jaccard(shingle_set, self.shingles[question_id])) for question_id in candidates]
+        return sorted(
+            ((question_id, round(score, 3)) for question_id, score in matches if score >= threshold),
+            key=lambda match: (-match[1], match[0]),
+        )
+
+
+duplicate_indexes = SubjectIndexCache(settings.QUESTION_INDEX_CACHE_SIZE)
+
+
+def duplicate_index(db: Session, subject_id: int, version: int) -> DuplicateIndex:
+    index = duplicate_indexes.get(subject_id, version)
+    if index is None:
+        index = DuplicateIndex()
+        rows = db.query(
+            Question.id, Question.question_text, Question.option_a, Question.option_b, Question.option_c, Question.option_d
+        ).filter(Question.subject_id == subject_id)
+        for row in rows:
+            index.add(row.id, shingles(row))
+        duplicate_indexes.put(subject_id, version, index)
+    return index
+
+
+def find_similar(db: Session, subject_id: int, version: int, question: dict) -> list[tuple[int, float]]:
+    """Existing questions of the subject that `question` (QuestionIn fields) likely duplicates"""
+    return duplicate_index(db, subject_id, version).similar(shingles(question), settings.DUPLICATE_THRESHOLD)
+
+
+def record_added(subject_id: int, new_version: int, question_id: int, question: dict) -> None:
+    """Add a just-committed question to a cached index instead of rebuilding it on the next check.
+
+    `new_version` is the questionsVersion the insert's own bump returned, so
+    only an index of the state right before it is carried forward.
+    """
+    index = duplicate_indexes.advance(subject_id, new_version - 1, new_version)
+    if index is not None:
+        index.add(question_id, shingles(question))
+
+
+def duplicate_pairs(db: Session, subject_id: int) -> list[tuple[int, int, float]]:
+    """Every (question id, earlier question id, similarity) pair in a subject at or above DUPLICATE_THRESHOLD"""
+    version = db.query(Subject.questionsVersion).filter(Subject.id == subject_id).scalar()
+    if version is None:
+        return []
+    index = duplicate_index(db, subject_id, version)
+    pairs = []
+    # copied: record_added may grow the shared index meanwhile
+    for question_id, shingle_set in list(index.shingles.items()):
+        for other_id, score in index.similar(shingle_set, settings.DUPLICATE_THRESHOLD, question_id):
+            if other_id < question_id:
+                pairs.append((question_id, other_id, score))
+    return sorted(pairs, key=lambda pair: (-pair[2], pair[0], pair[1]))
@@ -0,0 +1,14 @@
+"""Lazy access to numpy and the modules built on it.
+
+Only grading, result analytics and duplicate detection need numpy, and
+importing it is a large share of a worker's cold start. Nothing on
+app.main's import path imports these modules directly; they load on first
+use through `load` instead.
+"""
+import importlib
+from types import ModuleType
+
+
+def load(name: str) -> ModuleType:
+    """Import `name` ("numpy", "app.core.item_analysis", ...) on first call; later calls hit sys.modules"""
+    return importlib.import_module(name)
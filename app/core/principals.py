@@ -0,0 +1,82 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.db.models.user import User, UserRole
+
+
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated user as seen by route handlers"""
+    id: int
+    name: str
+    email: str
+    role: UserRole
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(id=user.id, name=user.name, email=user.email, role=user.role)
+
+
+class TTLCache:
+    """Small thread-safe LRU map whose entries expire at a per-entry deadline"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._items: "OrderedDict[object, tuple[float, object]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value, ttl: float) -> None:
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._items[key] = (time.monotonic() + ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def pop(self, key) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+# user id -> Principal, kept for a short TTL
+principal_cache = TTLCache(settings.PRINCIPAL_CACHE_SIZE)
+# raw token -> decoded payload, kept until the token's own expiry
+token_cache = TTLCache(settings.TOKEN_CACHE_SIZE)
+
+
+def cache_principal(user: User) -> Principal:
+    principal = Principal.from_user(user)
+    principal_cache.put(principal.id, principal, settings.PRINCIPAL_CACHE_TTL_SECONDS)
+    return principal
+
+
+def invalidate_principal(user_id: int) -> None:
+    principal_cache.pop(user_id)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_on_change(mapper, connection, target: User) -> None:
+    invalidate_principal(target.id)
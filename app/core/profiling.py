@@ -0,0 +1,133 @@
+"""Opt-in sampling profiler for single requests.
+
+An admin sends `X-Profile: 1` (or `?profile=1`); that request is sampled and
+its stacks are written to PROFILE_DIR in collapsed format, ready for
+flamegraph.pl or speedscope. Requests without the flag pass straight through.
+"""
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import parse_qs
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.deps import get_current_user, require_admin
+from app.db.session import SessionLocal
+
+APP_DIR = str(Path(__file__).resolve().parents[1])
+# app threads that idle between batches rather than serve requests
+BACKGROUND_THREADS = {"autosave-flusher", "submission-writer"}
+
+
+def profile_dir() -> Path:
+    path = Path(settings.PROFILE_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    if filename.startswith(APP_DIR):
+        filename = "app" + filename[len(APP_DIR):]
+    else:
+        filename = os.path.basename(filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples the stacks of every thread running app code at a fixed interval.
+
+    sync handlers run on threadpool threads, so sampling (rather than
+    cProfile, which only follows the thread it was enabled on) is what sees
+    the whole request. Concurrent requests on the same worker show up too.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.samples += 1
+            skip = {own} | {t.ident for t in threading.enumerate() if t.name in BACKGROUND_THREADS}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id in skip:
+                    continue
+                stack = []
+                in_app = False
+                while frame is not None:
+                    in_app = in_app or frame.f_code.co_filename.startswith(APP_DIR)
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                if in_app:
+                    self.stacks[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def _requested(scope) -> bool:
+    for name, value in scope.get("headers", ()):
+        if name == b"x-profile" and value not in (b"", b"0"):
+            return True
+    query = parse_qs(scope.get("query_string", b"").decode())
+    return query.get("profile", ["0"])[0] not in ("", "0")
+
+
+def _authorize(scope) -> None:
+    """Same check as require_admin, run outside the dependency system"""
+    authorization = dict(scope.get("headers", ())).get(b"authorization", b"").decode()
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    db = SessionLocal()
+    try:
+        require_admin(get_current_user(token, db))
+    finally:
+        db.close()
+
+
+class ProfilerMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _requested(scope):
+            await self.app(scope, receive, send)
+            return
+        try:
+            await run_in_threadpool(_authorize, scope)
+        except HTTPException as exc:
+            response = JSONResponse({"detail": exc.detail}, status_code=exc.status_code, headers=exc.headers)
+            await response(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        with StackSampler(settings.PROFILE_SAMPLE_INTERVAL_MS / 1000) as sampler:
+            await self.app(scope, receive, send)
+        elapsed = time.perf_counter() - started
+
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", scope["path"]).strip("-") or "root"
+        name = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{scope['method']}-{slug}-{int(elapsed * 1000)}ms.collapsed"
+        (profile_dir() / name).write_text(sampler.collapsed())
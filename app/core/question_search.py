@@ -0,0 +1,226 @@
+"""Full-text search over question text and options.
+
+Three backends, picked per database:
+
+    sqlite      FTS5 table questions_fts, kept in sync by triggers
+    postgresql  GIN index on a tsvector of the same columns
+    memory      per-subject inverted index built from the questions table,
+                for SQLite builds without FTS5 and any other database;
+                searches must name a subject
+
+All of them match every query word, the last one as a prefix, so results
+narrow as an admin types. The SQL objects are created by migration 5.
+"""
+import heapq
+import math
+import re
+import threading
+from bisect import bisect_left
+from collections import OrderedDict, defaultdict
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models.question import Question
+from app.db.models.subject import Subject
+
+SEARCH_COLUMNS = ("question_text", "option_a", "option_b", "option_c", "option_d")
+FTS_TABLE = "questions_fts"
+# the index expression; queries must repeat it verbatim for Postgres to use the index
+POSTGRES_DOCUMENT = (
+    "to_tsvector('english', question_text || ' ' || option_a || ' ' || option_b"
+    " || ' ' || option_c || ' ' || option_d)"
+)
+
+_WORD = re.compile(r"\w+")
+
+
+class SearchError(ValueError):
+    pass
+
+
+def tokenize(value: str) -> list[str]:
+    return _WORD.findall(value.lower())
+
+
+def create_search_index(conn: Connection) -> None:
+    """Create the dialect's full-text index over existing questions; a no-op where only the memory backend works"""
+    if conn.dialect.name == "postgresql":
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_questions_fts ON questions USING gin ({POSTGRES_DOCUMENT})"))
+    elif conn.dialect.name == "sqlite":
+        columns = ", ".join(SEARCH_COLUMNS)
+        new = ", ".join(f"new.{column}" for column in SEARCH_COLUMNS)
+        old = ", ".join(f"old.{column}" for column in SEARCH_COLUMNS)
+        try:
+            with conn.begin_nested():
+                conn.execute(text(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                    f"{columns}, content='questions', content_rowid='id', tokenize='porter unicode61')"
+                ))
+        except OperationalError:
+            # sqlite3 built without FTS5; search falls back to the memory backend
+            return
+        remove = f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old});"
+        add = f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new});"
+        for statement in (
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON questions BEGIN {add} END",
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON questions BEGIN {remove} END",
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON questions BEGIN {remove} {add} END",
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+        ):
+            conn.execute(text(statement))
+
+
+class InvertedIndex:
+    """Token -> {question id: term frequency} for one subject's questions"""
+
+    def __init__(self, rows):
+        postings: dict[str, dict[int, int]] = defaultdict(dict)
+        for row in rows:
+            for column in SEARCH_COLUMNS:
+                for token in tokenize(getattr(row, column)):
+                    posting = postings[token]
+                    posting[row.id] = posting.get(row.id, 0) + 1
+        self.postings = dict(postings)
+        self.vocabulary = sorted(self.postings)
+        self.size = len({question_id for posting in self.postings.values() for question_id in posting})
+
+    def _matching(self, token: str, prefix: bool) -> dict[int, int]:
+        if not prefix:
+            return self.postings.get(token, {})
+        merged: dict[int, int] = {}
+        for position in range(bisect_left(self.vocabulary, token), len(self.vocabulary)):
+            word = self.vocabulary[position]
+            if not word.startswith(token):
+                break
+            for question_id, count in self.postings[word].items():
+                merged[question_id] = merged.get(question_id, 0) + count
+        return merged
+
+    def search(self, tokens: list[str], limit: int) -> list[tuple[float, int]]:
+        """(score, -question id) of questions containing every token, best first; tf-idf scored, older questions win ties"""
+        scores: dict[int, float] | None = None
+        for position, token in enumerate(tokens):
+            matches = self._matching(token, prefix=position == len(tokens) - 1)
+            if not matches:
+                return []
+            idf = math.log(1 + self.size / len(matches))
+            if scores is None:
+                scores = {question_id: count * idf for question_id, count in matches.items()}
+            else:
+                scores = {
+                    question_id: score + matches[question_id] * idf
+                    for question_id, score in scores.items() if question_id in matches
+                }
+        return heapq.nlargest(limit, ((score, -question_id) for question_id, score in (scores or {}).items()))
+
+
+class SubjectIndexCache:
+    """Per-subject LRU of indexes built from a subject's questions, keyed by questionsVersion.
+
+    Every question change bumps the version, so a stale index is never served;
+    it is rebuilt on the next lookup instead.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[int, tuple[int, object]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, subject_id: int, version: int):
+        with self._lock:
+            entry = self._entries.get(subject_id)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(subject_id)
+            return entry[1]
+
+    def put(self, subject_id: int, version: int, index) -> None:
+        with self._lock:
+            self._entries[subject_id] = (version, index)
+            self._entries.move_to_end(subject_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def advance(self, subject_id: int, version: int, new_version: int):
+        """Re-key an entry after a change the caller applies to the index itself; None if not cached at `version`"""
+        with self._lock:
+            entry = self._entries.get(subject_id)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries[subject_id] = (new_version, entry[1])
+            return entry[1]
+
+
+search_indexes = SubjectIndexCache(settings.QUESTION_INDEX_CACHE_SIZE)
+# database url -> backend name
+_backends: dict[str, str] = {}
+
+
+def search_backend(db: Session) -> str:
+    bind = db.get_bind()
+    key = str(bind.url)
+    backend = _backends.get(key)
+    if backend is None:
+        if bind.dialect.name == "postgresql":
+            backend = "postgresql"
+        elif bind.dialect.name == "sqlite" and inspect(bind).has_table(FTS_TABLE):
+            backend = "sqlite"
+        else:
+            backend = "memory"
+        _backends[key] = backend
+    return backend
+
+
+def _memory_index(db: Session, subject_id: int, version: int) -> InvertedIndex:
+    index = search_indexes.get(subject_id, version)
+    if index is None:
+        rows = db.query(Question.id, *(getattr(Question, column) for column in SEARCH_COLUMNS)).filter(
+            Question.subject_id == subject_id
+        )
+        index = InvertedIndex(rows)
+        search_indexes.put(subject_id, version, index)
+    return index
+
+
+def search_question_ids(db: Session, query: str, subject_id: int | None, limit: int) -> list[int]:
+    """Ids of questions matching every word of `query`, best match first.
+
+    Raises SearchError for a search across all subjects on the memory
+    backend, which would build an index per subject on every call.
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return []
+    backend = search_backend(db)
+    params = {"limit": limit, "subject_id": subject_id}
+
+    if backend == "sqlite":
+        # quoted tokens can't smuggle FTS5 operators in
+        params["match"] = " ".join(f'"{token}"' for token in tokens) + "*"
+        subject_filter = "" if subject_id is None else " AND q.subject_id = :subject_id"
+        return list(db.scalars(text(
+            f"SELECT q.id FROM {FTS_TABLE} JOIN questions q ON q.id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH :match{subject_filter} "
+            f"ORDER BY bm25({FTS_TABLE}), q.id LIMIT :limit"
+        ), params))
+
+    if backend == "postgresql":
+        # \w+ tokens carry no tsquery syntax
+        params["tsquery"] = " & ".join(tokens) + ":*"
+        subject_filter = "" if subject_id is None else " AND subject_id = :subject_id"
+        return list(db.scalars(text(
+            f"SELECT id FROM questions "
+            f"WHERE {POSTGRES_DOCUMENT} @@ to_tsquery('english', :tsquery){subject_filter} "
+            f"ORDER BY ts_rank({POSTGRES_DOCUMENT}, to_tsquery('english', :tsquery)) DESC, id LIMIT :limit"
+        ), params))
+
+    if subject_id is None:
+        raise SearchError("This database has no full-text index; pass subject_id to search one subject")
+    version = db.query(Subject.questionsVersion).filter(Subject.id == subject_id).scalar()
+    if version is None:
+        return []
+    return [-negated_id for _, negated_id in _memory_index(db, subject_id, version).search(tokens, limit)]
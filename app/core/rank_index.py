@@ -0,0 +1,121 @@
+import threading
+import time
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models.result import Result
+from app.db.models.subject_stats import SubjectStats
+
+# percentages are bucketed to 0.01, so 0..100 maps onto 10001 buckets
+BUCKETS = 10001
+
+
+def bucket_of(percentage: float) -> int:
+    return min(max(int(round(percentage * 100)), 0), BUCKETS - 1)
+
+
+class FenwickTree:
+    """Counts per percentage bucket with O(log n) prefix sums"""
+
+    def __init__(self, size: int = BUCKETS):
+        self.size = size
+        self.tree = [0] * (size + 1)
+        self.total = 0
+
+    def add(self, bucket: int, count: int = 1) -> None:
+        self.total += count
+        i = bucket + 1
+        while i <= self.size:
+            self.tree[i] += count
+            i += i & -i
+
+    def prefix(self, bucket: int) -> int:
+        """Number of entries in buckets 0..bucket inclusive"""
+        total = 0
+        i = min(bucket + 1, self.size)
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    @classmethod
+    def from_counts(cls, counts: dict[int, int]) -> "FenwickTree":
+        # O(n) build: fill the leaves, then push each node into its parent
+        fenwick = cls()
+        for bucket, count in counts.items():
+            fenwick.tree[bucket + 1] += count
+            fenwick.total += count
+        for i in range(1, fenwick.size + 1):
+            parent = i + (i & -i)
+            if parent <= fenwick.size:
+                fenwick.tree[parent] += fenwick.tree[i]
+        return fenwick
+
+
+class RankIndex:
+    """Per-subject Fenwick trees over result percentages.
+
+    A tree is rebuilt from one GROUP BY on the (subject_id, percentage) index
+    when it is older than RANK_INDEX_TTL_SECONDS or its size no longer matches
+    subject_stats, which catches results written by other workers.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._trees: dict[int, tuple[float, FenwickTree]] = {}
+        self._lock = threading.Lock()
+
+    def _load(self, db: Session, subject_id: int) -> FenwickTree:
+        rows = (
+            db.query(Result.percentage, func.count(Result.id))
+            .filter(Result.subject_id == subject_id)
+            .group_by(Result.percentage)
+            .all()
+        )
+        counts: dict[int, int] = {}
+        for percentage, count in rows:
+            bucket = bucket_of(percentage)
+            counts[bucket] = counts.get(bucket, 0) + count
+        return FenwickTree.from_counts(counts)
+
+    def tree(self, db: Session, subject_id: int) -> FenwickTree:
+        attempts = db.query(SubjectStats.attempts).filter(SubjectStats.subject_id == subject_id).scalar() or 0
+        with self._lock:
+            entry = self._trees.get(subject_id)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl and entry[1].total == attempts:
+                return entry[1]
+        fenwick = self._load(db, subject_id)
+        with self._lock:
+            self._trees[subject_id] = (time.monotonic(), fenwick)
+        return fenwick
+
+    def add(self, subject_id: int, percentage: float) -> None:
+        """Record a newly committed result in an already loaded tree"""
+        with self._lock:
+            entry = self._trees.get(subject_id)
+            if entry is not None:
+                entry[1].add(bucket_of(percentage))
+
+    def invalidate(self, subject_id: int) -> None:
+        with self._lock:
+            self._trees.pop(subject_id, None)
+
+    def rank(self, db: Session, subject_id: int, percentage: float) -> dict:
+        fenwick = self.tree(db, subject_id)
+        bucket = bucket_of(percentage)
+        with self._lock:
+            at_or_below = fenwick.prefix(bucket)
+            below = fenwick.prefix(bucket - 1) if bucket else 0
+            above = fenwick.total - at_or_below
+        equal = at_or_below - below
+        return {
+            "rank": above + 1,
+            "out_of": fenwick.total,
+            # percentile rank: share scoring below, counting ties as half
+            "percentile": (below + equal / 2) / fenwick.total * 100 if fenwick.total else None,
+        }
+
+
+rank_index = RankIndex(settings.RANK_INDEX_TTL_SECONDS)
@@ -0,0 +1,107 @@
+from collections import Counter
+
+import numpy as np
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.core.grading import grade_from_percentage
+from app.core.item_analysis import keyed_entries, unpack_ids
+from app.core.rank_index import rank_index
+from app.core.subject_stats import rebuild_stats
+from app.db.models.question import Question
+from app.db.models.response_layout import ResponseLayout
+from app.db.models.result import Result
+
+UPDATE_BATCH_SIZE = 1000
+
+
+def grade_many(percentages: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """grade_from_percentage over an array, evaluated once per distinct percentage"""
+    unique, inverse = np.unique(percentages, return_inverse=True)
+    graded = [grade_from_percentage(float(p)) for p in unique]
+    grades = np.array([g for g, _ in graded], dtype=object)
+    statuses = np.array([s for _, s in graded], dtype=object)
+    return grades[inverse], statuses[inverse]
+
+
+def regrade_subject(db: Session, subject_id: int, question_id: int | None = None, dry_run: bool = True) -> dict:
+    """Recompute scores of a subject's results against its current answer key.
+
+    Questions no longer in the bank stop counting towards the total. With
+    `question_id`, only results where that question was presented are
+    touched. Results stored before responses were recorded cannot be
+    regraded and are reported as skipped.
+    """
+    layouts = {
+        row.id: unpack_ids(row.question_ids)
+        for row in db.query(ResponseLayout.id, ResponseLayout.question_ids).filter(ResponseLayout.subject_id == subject_id)
+    }
+    rows = (
+        db.query(Result.id, Result.layout_id, Result.responses, Result.score, Result.total, Result.grade, Result.status)
+        .filter(Result.subject_id == subject_id)
+        .all()
+    )
+    skipped = sum(1 for row in rows if row.responses is None)
+    rows = [row for row in rows if row.responses is not None]
+    answer_key = dict(
+        db.query(Question.id, Question.correct_option).filter(Question.subject_id == subject_id).all()
+    )
+
+    # one entry per question presented to each result, so this scales with the questions served
+    question_ids, entry_rows, columns, codes, key = keyed_entries(
+        layouts, [(row.layout_id, row.responses) for row in rows], answer_key
+    )
+    if question_id is None:
+        selected = np.ones(len(rows), dtype=bool)
+    else:
+        selected = np.zeros(len(rows), dtype=bool)
+        selected[entry_rows[question_ids[columns] == question_id]] = True
+
+    scores = np.bincount(entry_rows, weights=codes == key, minlength=len(rows)).astype(np.int64)
+    totals = np.bincount(entry_rows, minlength=len(rows))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        percentages = np.where(totals > 0, scores / totals * 100, 0.0)
+    grades, statuses = grade_many(percentages)
+
+    old_scores = np.fromiter((row.score for row in rows), dtype=np.int64, count=len(rows))
+    old_totals = np.fromiter((row.total for row in rows), dtype=np.int64, count=len(rows))
+    old_grades = np.array([row.grade for row in rows], dtype=object)
+    old_statuses = np.array([row.status for row in rows], dtype=object)
+    changed = selected & ((scores != old_scores) | (totals != old_totals) | (grades != old_grades))
+    changed_rows = np.flatnonzero(changed)
+
+    grade_changes = Counter(
+        f"{old_grades[i]}->{grades[i]}" for i in changed_rows if old_grades[i] != grades[i]
+    )
+    status_changes = Counter(
+        f"{old_statuses[i]}->{statuses[i]}" for i in changed_rows if old_statuses[i] != statuses[i]
+    )
+
+    if not dry_run and len(changed_rows):
+        updates = [
+            {
+                "id": rows[i].id,
+                "score": int(scores[i]),
+                "total": int(totals[i]),
+                "percentage": float(percentages[i]),
+                "grade": grades[i],
+                "status": statuses[i],
+            }
+            for i in changed_rows
+        ]
+        for start in range(0, len(updates), UPDATE_BATCH_SIZE):
+            db.execute(update(Result), updates[start:start + UPDATE_BATCH_SIZE])
+        # commits the regrade together with the recomputed aggregates
+        rebuild_stats(db, subject_id)
+        rank_index.invalidate(subject_id)
+
+    return {
+        "subject_id": subject_id,
+        "question_id": question_id,
+        "dry_run": dry_run,
+        "considered": int(selected.sum()),
+        "skipped": skipped,
+        "changed": len(changed_rows),
+        "grade_changes": dict(grade_changes),
+        "status_changes": dict(status_changes),
+    }
@@ -0,0 +1,27 @@
+from typing import Any
+
+import orjson
+from fastapi import Response
+from fastapi.responses import JSONResponse
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson; handles datetimes, int keys and numpy values natively"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=ORJSON_OPTIONS)
+
+
+def json_response(content: Any, response: Response | None = None) -> FastJSONResponse:
+    """Send already-shaped data as is, skipping response_model validation.
+
+    Only for payloads built to match the route's response_model. Headers set
+    on the injected `response` (cursors, ETags) are carried over, since FastAPI
+    drops them when an endpoint returns its own Response.
+    """
+    fast = FastJSONResponse(content)
+    if response is not None:
+        fast.headers.update(response.headers)
+    return fast
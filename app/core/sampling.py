@@ -0,0 +1,39 @@
+import hashlib
+import random
+
+from app.core.config import settings
+
+OPTIONS = ("A", "B", "C", "D")
+
+
+def exam_seed(student_id: int, subject_id: int) -> int:
+    """Per-student seed; keyed with SECRET_KEY so students can't derive each other's papers"""
+    digest = hashlib.sha256(f"{settings.SECRET_KEY}:{subject_id}:{student_id}".encode()).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+def select_questions(question_ids: tuple, count: int | None, shuffle: bool, seed: int) -> list[int]:
+    """Reproducibly pick and order the questions served to one student.
+
+    `question_ids` must be sorted; sampling is O(count), not O(bank).
+    """
+    if count is None or count >= len(question_ids):
+        selected = list(question_ids)
+        if shuffle:
+            random.Random(seed).shuffle(selected)
+        return selected
+    selected = random.Random(seed).sample(question_ids, count)
+    return selected if shuffle else sorted(selected)
+
+
+def option_order(seed: int, question_id: int) -> tuple[str, ...]:
+    """Canonical option shown under each displayed letter A..D"""
+    order = list(OPTIONS)
+    random.Random(seed ^ question_id).shuffle(order)
+    return tuple(order)
+
+
+def to_canonical(seed: int, question_id: int, displayed: str | None) -> str | None:
+    if displayed not in OPTIONS:
+        return displayed
+    return option_order(seed, question_id)[OPTIONS.index(displayed)]
@@ -1,12 +1,17 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import bcrypt
 from jose import jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 
+from app.core import metrics
 from app.core.config import settings
 from app.core.deps import get_current_user
-from app.db.models.user import User
+from app.core.principals import Principal
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
@@ -17,13 +22,103 @@ def hash_password(password: str) -> str:
 def verify_password(plain: str, hashed: str) -> bool:
     return bcrypt.checkpw(plain.encode(), hashed.encode())
 
+class HashStats:
+    """Running totals of time spent queued for vs. inside bcrypt"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+        self.hash_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.max_hash_seconds = 0.0
+
+    def record(self, wait: float, elapsed: float) -> None:
+        with self._lock:
+            self.calls += 1
+            self.wait_seconds += wait
+            self.hash_seconds += elapsed
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+            self.max_hash_seconds = max(self.max_hash_seconds, elapsed)
+        metrics.bcrypt_wait.observe(wait)
+        metrics.bcrypt_time.observe(elapsed)
+
+    def reject(self) -> None:
+        with self._lock:
+            self.rejected += 1
+        metrics.bcrypt_rejected.inc()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            calls = self.calls or 1
+            return {
+                "calls": self.calls,
+                "rejected": self.rejected,
+                "avg_wait_ms": self.wait_seconds / calls * 1000,
+                "avg_hash_ms": self.hash_seconds / calls * 1000,
+                "max_wait_ms": self.max_wait_seconds * 1000,
+                "max_hash_ms": self.max_hash_seconds * 1000,
+            }
+
+class HashPool:
+    """Dedicated bcrypt threads with a cap on queued work.
+
+    bcrypt releases the GIL, so threads give real parallelism here while
+    keeping hashing off the request threadpool.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.max_pending = max_pending
+        self.stats = HashStats()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.stats.reject()
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Server busy, please retry shortly",
+                    headers={"Retry-After": str(settings.BCRYPT_RETRY_AFTER_SECONDS)},
+                )
+            self._pending += 1
+        queued_at = time.perf_counter()
+
+        def job():
+            started = time.perf_counter()
+            result = fn(*args)
+            return result, started - queued_at, time.perf_counter() - started
+
+        try:
+            result, wait, elapsed = await asyncio.get_running_loop().run_in_executor(self._executor, job)
+        finally:
+            with self._lock:
+                self._pending -= 1
+        self.stats.record(wait, elapsed)
+        return result
+
+hash_pool = HashPool(settings.BCRYPT_POOL_SIZE, settings.BCRYPT_MAX_PENDING)
+
+async def hash_password_async(password: str) -> str:
+    return await hash_pool.run(hash_password, password)
+
+async def verify_password_async(plain: str, hashed: str) -> bool:
+    return await hash_pool.run(verify_password, plain, hashed)
+
 def create_access_token(data: dict, expires_minutes: int | None = None) -> str:
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=expires_minutes or settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
-async def require_admin(current_user: User = Depends(get_current_user)) -> User:
+async def require_admin(current_user: Principal = Depends(get_current_user)) -> Principal:
     from app.db.models.user import UserRole
     if current_user.role != UserRole.admin:
         raise HTTPException(
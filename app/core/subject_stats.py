@@ -0,0 +1,116 @@
+import math
+from collections import defaultdict
+
+from sqlalchemy import case, delete, func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.db.models.result import Result
+from app.db.models.subject_stats import SubjectStats
+
+GRADES = ("A", "B", "C", "D", "E", "F")
+
+
+def _grade_column(grade: str | None):
+    return getattr(SubjectStats, f"grade_{grade.lower()}") if grade in GRADES else None
+
+
+def _empty_delta() -> dict:
+    return {"attempts": 0, "sum_percentage": 0.0, "sum_sq_percentage": 0.0, "passed": 0, "failed": 0, "grades": defaultdict(int)}
+
+
+def _apply(db: Session, subject_id: int, delta: dict) -> None:
+    values = {
+        SubjectStats.attempts: SubjectStats.attempts + delta["attempts"],
+        SubjectStats.sum_percentage: SubjectStats.sum_percentage + delta["sum_percentage"],
+        SubjectStats.sum_sq_percentage: SubjectStats.sum_sq_percentage + delta["sum_sq_percentage"],
+        SubjectStats.passed: SubjectStats.passed + delta["passed"],
+        SubjectStats.failed: SubjectStats.failed + delta["failed"],
+    }
+    for grade, count in delta["grades"].items():
+        column = _grade_column(grade)
+        if column is not None:
+            values[column] = column + count
+    statement = update(SubjectStats).where(SubjectStats.subject_id == subject_id).values(values)
+    if db.execute(statement).rowcount:
+        return
+    # first result for this subject: create the row, or lose the race and update it
+    try:
+        with db.begin_nested():
+            db.add(SubjectStats(subject_id=subject_id))
+    except IntegrityError:
+        pass
+    db.execute(statement)
+
+
+def record_results(db: Session, results) -> None:
+    """Fold newly stored results into subject_stats within the caller's transaction.
+
+    `results` is an iterable of dicts with subject_id, percentage, grade and status.
+    """
+    deltas: dict[int, dict] = defaultdict(_empty_delta)
+    for result in results:
+        delta = deltas[result["subject_id"]]
+        delta["attempts"] += 1
+        delta["sum_percentage"] += result["percentage"]
+        delta["sum_sq_percentage"] += result["percentage"] ** 2
+        delta["passed" if result["status"] == "PASS" else "failed"] += 1
+        delta["grades"][result["grade"]] += 1
+    for subject_id in sorted(deltas):
+        _apply(db, subject_id, deltas[subject_id])
+
+
+def rebuild_stats(db: Session, subject_id: int | None = None) -> int:
+    """Recompute subject_stats from results; returns the number of subjects rebuilt"""
+    columns = [
+        Result.subject_id,
+        func.count(Result.id),
+        func.coalesce(func.sum(Result.percentage), 0.0),
+        func.coalesce(func.sum(Result.percentage * Result.percentage), 0.0),
+        func.sum(case((Result.status == "PASS", 1), else_=0)),
+        func.sum(case((Result.status == "PASS", 0), else_=1)),
+    ] + [func.sum(case((Result.grade == grade, 1), else_=0)) for grade in GRADES]
+    query = db.query(*columns).group_by(Result.subject_id)
+    clear = delete(SubjectStats)
+    if subject_id is not None:
+        query = query.filter(Result.subject_id == subject_id)
+        clear = clear.where(SubjectStats.subject_id == subject_id)
+
+    rows = query.all()
+    db.execute(clear)
+    for row in rows:
+        sid, attempts, sum_pct, sum_sq, passed, failed, *grade_counts = row
+        db.add(SubjectStats(
+            subject_id=sid,
+            attempts=attempts,
+            sum_percentage=sum_pct,
+            sum_sq_percentage=sum_sq,
+            passed=passed,
+            failed=failed,
+            **{f"grade_{grade.lower()}": count for grade, count in zip(GRADES, grade_counts)},
+        ))
+    db.commit()
+    return len(rows)
+
+
+def summarize(subject_id: int, stats: SubjectStats | None) -> dict:
+    attempts = stats.attempts if stats else 0
+    distribution = {grade: getattr(stats, f"grade_{grade.lower()}") if stats else 0 for grade in GRADES}
+    if not attempts:
+        return {
+            "subject_id": subject_id, "attempts": 0, "mean": None, "stdev": None,
+            "pass_rate": None, "passed": 0, "failed": 0, "distribution": distribution,
+        }
+    mean = stats.sum_percentage / attempts
+    # population standard deviation from the running sums
+    variance = max(stats.sum_sq_percentage / attempts - mean * mean, 0.0)
+    return {
+        "subject_id": subject_id,
+        "attempts": attempts,
+        "mean": mean,
+        "stdev": math.sqrt(variance),
+        "pass_rate": stats.passed / attempts,
+        "passed": stats.passed,
+        "failed": stats.failed,
+        "distribution": distribution,
+    }
@@ -0,0 +1,259 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from datetime import datetime
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.rank_index import rank_index
+from app.core.subject_stats import record_results
+from app.db.models.exam_session import ExamSession
+from app.db.models.result import Result
+from app.db.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class SubmissionUnavailable(Exception):
+    """The writer couldn't confirm a submission; retrying with the same Idempotency-Key is safe"""
+
+
+class SubmissionTimeout(SubmissionUnavailable):
+    """The writer hasn't acknowledged a submission within SUBMISSION_RESULT_TIMEOUT_SECONDS; it may still commit"""
+
+
+class SubmissionWriter:
+    """Background writer that group-commits graded results.
+
+    Handlers enqueue already-graded rows and wait on a Future that resolves to
+    the new result id once the batch holding it has committed, so a whole room
+    submitting at once costs a handful of transactions instead of one each.
+    A row's exam session is claimed in the same transaction as its insert, so
+    a failed batch leaves the session open for the student to retry.
+    """
+
+    def __init__(self, max_batch: int, max_delay: float):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue: "queue.Queue[tuple[tuple[dict, int | None], Future] | None]" = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.rows = 0
+        self.failures = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.flush_seconds = 0.0
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="submission-writer", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Flush whatever is queued and stop the writer thread"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def submit(self, values: dict, session_id: int | None = None) -> Future:
+        """Queue a graded row; the future resolves to its id, or None if the session was already submitted"""
+        self.start()
+        future: Future = Future()
+        self._queue.put(((values, session_id), future))
+        metrics.submission_queue_depth.inc()
+        return future
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "queue_depth": self.depth,
+                "batches": self.batches,
+                "rows": self.rows,
+                "failures": self.failures,
+                "avg_batch_size": self.rows / self.batches if self.batches else 0.0,
+                "last_flush_ms": self.last_flush_seconds * 1000,
+                "avg_flush_ms": self.flush_seconds / self.batches * 1000 if self.batches else 0.0,
+                "max_flush_ms": self.max_flush_seconds * 1000,
+            }
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=max(remaining, 0)) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            metrics.submission_queue_depth.dec(amount=len(batch))
+            self._flush(batch)
+
+    def _insert(self, rows: list[tuple[dict, int | None]]) -> list[int | None]:
+        db = SessionLocal()
+        try:
+            ids = write_results(db, rows)
+            db.commit()
+            return ids
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _flush(self, batch: list) -> None:
+        started = time.perf_counter()
+        try:
+            written = list(zip(batch, self._insert([values for values, _ in batch])))
+        except IntegrityError:
+            # a repeated (student, subject) in the batch; retry row by row so only it fails
+            written = []
+            for values, future in batch:
+                try:
+                    written.append(((values, future), self._insert([values])[0]))
+                except Exception as exc:
+                    with self._stats_lock:
+                        self.failures += 1
+                    metrics.submission_failures.inc()
+                    future.set_exception(exc)
+        except Exception as exc:
+            logger.exception("Failed to flush %d submissions", len(batch))
+            with self._stats_lock:
+                self.failures += len(batch)
+            metrics.submission_failures.inc(amount=len(batch))
+            for _, future in batch:
+                future.set_exception(exc)
+            return
+
+        elapsed = time.perf_counter() - started
+        metrics.submission_flush_time.observe(elapsed)
+        metrics.submission_batch_size.observe(len(batch))
+        with self._stats_lock:
+            self.batches += 1
+            self.rows += len(written)
+            self.last_flush_seconds = elapsed
+            self.flush_seconds += elapsed
+            self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+        for ((values, _), _), result_id in written:
+            if result_id is not None:
+                rank_index.add(values["subject_id"], values["percentage"])
+        for (_, future), result_id in written:
+            future.set_result(result_id)
+
+
+submission_writer = SubmissionWriter(settings.SUBMISSION_MAX_BATCH, settings.SUBMISSION_MAX_DELAY_MS / 1000)
+
+
+def insert_results(db: Session, rows: list[dict]) -> list[int]:
+    """Add graded rows and their subject_stats deltas to the caller's transaction; returns the new ids"""
+    results = [Result(**values) for values in rows]
+    db.add_all(results)
+    record_results(db, rows)
+    db.flush()
+    return [result.id for result in results]
+
+
+def claim_sessions(db: Session, session_ids: list[int]) -> set[int]:
+    """Mark exam sessions submitted in the caller's transaction; returns the ids that were still open"""
+    if not session_ids:
+        return set()
+    return set(db.scalars(
+        update(ExamSession)
+        .where(ExamSession.id.in_(session_ids), ExamSession.submitted_at.is_(None))
+        .values(submitted_at=datetime.utcnow())
+        .returning(ExamSession.id)
+        .execution_options(synchronize_session=False)
+    ))
+
+
+def write_results(db: Session, rows: list[tuple[dict, int | None]]) -> list[int | None]:
+    """Claim each row's exam session, if any, and insert the rows whose claim succeeded.
+
+    Returns the new ids, None where the session had already been submitted.
+    """
+    claimed = claim_sessions(db, [session_id for _, session_id in rows if session_id is not None])
+    keep = [session_id is None or session_id in claimed for _, session_id in rows]
+    ids = iter(insert_results(db, [values for (values, _), kept in zip(rows, keep) if kept]))
+    return [next(ids) if kept else None for kept in keep]
+
+
+def store_results(db: Session, rows: list[dict]) -> list[int | None]:
+    """Bulk store_result in one transaction; None for rows whose student already has a result.
+
+    Rows must reference committed response layouts, since a duplicate rolls
+    back the first attempt before the rows are retried one savepoint each.
+    """
+    try:
+        ids = insert_results(db, rows)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        ids = []
+        for values in rows:
+            try:
+                with db.begin_nested():
+                    ids.append(insert_results(db, [values])[0])
+            except IntegrityError:
+                ids.append(None)
+        db.commit()
+    for values, result_id in zip(rows, ids):
+        if result_id is not None:
+            rank_index.add(values["subject_id"], values["percentage"])
+    return ids
+
+
+def store_result(db: Session, values: dict, session_id: int | None = None) -> int | None:
+    """Persist a graded result, directly or through the write-behind writer, and return its id.
+
+    With `session_id` the exam session is claimed in the same transaction, and
+    None is returned if it had already been submitted. Anything else pending
+    on `db` is committed alongside. Raises IntegrityError when the student
+    already has a result for the subject; the caller rolls back. Raises
+    SubmissionTimeout when the writer is too slow to acknowledge, and
+    SubmissionUnavailable when its batch failed and nothing was written.
+    """
+    if settings.SUBMISSION_WRITE_BEHIND:
+        db.commit()
+        # Acknowledge once the writer's batch holding this row has committed;
+        # the writer updates the rank index itself
+        future = submission_writer.submit(values, session_id)
+        try:
+            return future.result(timeout=settings.SUBMISSION_RESULT_TIMEOUT_SECONDS)
+        except FutureTimeoutError:
+            raise SubmissionTimeout()
+        except IntegrityError:
+            raise
+        except Exception as exc:
+            # the writer already logged it; the batch rolled back, session claim included
+            raise SubmissionUnavailable() from exc
+    result_id = write_results(db, [(values, session_id)])[0]
+    if result_id is None:
+        db.rollback()
+        return None
+    db.commit()
+    rank_index.add(values["subject_id"], values["percentage"])
+    return result_id
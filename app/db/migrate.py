@@ -0,0 +1,197 @@
+"""Versioned schema migrations and seed data.
+
+    python -m app.db.migrate           # upgrade to the latest version, then seed
+    python -m app.db.migrate --check   # exit 1 if the database is behind
+
+Run once per deploy, before starting workers; workers only check the version
+(see check_schema_version) so a fleet booting together never races on DDL.
+"""
+import sys
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, delete, func, inspect, literal, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from app.core.question_search import create_search_index
+from app.core.subject_stats import rebuild_stats
+from app.db.session import Base, SessionLocal, engine
+from app.db.models import exam_session, question, response_layout, result, subject, subject_stats, user  # noqa: F401  register every table
+
+# kept out of Base.metadata so create_all never touches it
+version_metadata = MetaData()
+schema_versions = Table(
+    "schema_versions",
+    version_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False, default=datetime.utcnow),
+)
+
+# results removed by unique_results, kept for an admin to review; also outside Base.metadata
+archive_metadata = MetaData()
+result_duplicates = Table(
+    "result_duplicates",
+    archive_metadata,
+    *(Column(column.name, column.type) for column in result.Result.__table__.columns),
+    Column("archived_at", DateTime, nullable=False),
+)
+
+# arbitrary key for the Postgres advisory lock held while migrating
+MIGRATION_LOCK_KEY = 0x63626500
+
+
+def _add_column(conn: Connection, table: str, name: str, not_null_default: str | None = None, references: str | None = None) -> None:
+    """ALTER TABLE ADD COLUMN for a column the model already declares, if the table lacks it"""
+    if name in {column["name"] for column in inspect(conn).get_columns(table)}:
+        return
+    quote = conn.dialect.identifier_preparer.quote
+    column = Base.metadata.tables[table].c[name]
+    ddl = f"ALTER TABLE {quote(table)} ADD COLUMN {quote(name)} {column.type.compile(conn.dialect)}"
+    if not_null_default is not None:
+        ddl += f" NOT NULL DEFAULT {not_null_default}"
+    if references is not None:
+        ddl += f" REFERENCES {references}"
+    conn.execute(text(ddl))
+
+
+def create_tables(conn: Connection) -> None:
+    Base.metadata.create_all(bind=conn)
+
+
+def add_exam_columns(conn: Connection) -> None:
+    # databases created before these columns existed; create_all never alters tables
+    _add_column(conn, "subjects", "questionsPerExam")
+    _add_column(conn, "subjects", "shuffle", not_null_default="false")
+    _add_column(conn, "subjects", "questionsVersion", not_null_default="0")
+    _add_column(conn, "results", "layout_id", references="response_layouts (id)")
+    _add_column(conn, "results", "responses")
+    for index in result.Result.__table__.indexes:
+        if not index.unique:
+            index.create(conn, checkfirst=True)
+
+
+def backfill_subject_stats(conn: Connection) -> None:
+    with Session(bind=conn) as db:
+        rebuild_stats(db)
+
+
+def unique_results(conn: Connection) -> None:
+    """Keep each student's first result per subject, then enforce it with a unique index.
+
+    Later results for the same student and subject are copied to
+    result_duplicates, with their ids printed, before they are deleted.
+    Like every step this runs inside upgrade's transaction, so the copy and
+    the delete land together or not at all.
+    """
+    Result = result.Result
+    _add_column(conn, "results", "idempotency_key")
+    first = (
+        select(func.min(Result.id))
+        .group_by(Result.student_id, Result.subject_id)
+        .scalar_subquery()
+    )
+    duplicate = Result.id.not_in(first)
+    result_duplicates.create(conn, checkfirst=True)
+    columns = [column.name for column in Result.__table__.columns]
+    conn.execute(result_duplicates.insert().from_select(
+        [*columns, "archived_at"],
+        select(*Result.__table__.columns, literal(datetime.utcnow(), DateTime)).where(duplicate),
+    ))
+    ids = conn.scalars(select(Result.id).where(duplicate).order_by(Result.id)).all()
+    removed = conn.execute(delete(Result).where(duplicate)).rowcount
+    if removed:
+        print(f"Moved {removed} duplicate results to {result_duplicates.name}: ids {', '.join(map(str, ids))}")
+    for index in Result.__table__.indexes:
+        if index.name == "uq_results_student_subject":
+            index.create(conn, checkfirst=True)
+    if removed:
+        backfill_subject_stats(conn)
+
+
+def question_search_index(conn: Connection) -> None:
+    create_search_index(conn)
+
+
+def served_question_ids(conn: Connection) -> None:
+    # sessions started before this stay NULL and are graded by re-sampling, as before
+    _add_column(conn, "exam_sessions", "question_ids")
+
+
+# (version, description, step); append only, never edit a released step
+MIGRATIONS = [
+    (1, "create tables", create_tables),
+    (2, "add sampling, question version and packed response columns", add_exam_columns),
+    (3, "backfill subject_stats from results", backfill_subject_stats),
+    (4, "one result per student and subject, idempotency keys", unique_results),
+    (5, "full-text search index over questions", question_search_index),
+    (6, "record the questions served in each exam session", served_question_ids),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn: Connection) -> int:
+    if not inspect(conn).has_table(schema_versions.name):
+        return 0
+    return conn.scalar(select(func.max(schema_versions.c.version))) or 0
+
+
+def upgrade(bind: Engine = engine) -> list[int]:
+    """Apply pending migrations in one transaction; returns the versions applied"""
+    with bind.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            # a second concurrent run waits here, then finds nothing to do
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        version_metadata.create_all(bind=conn)
+        version = current_version(conn)
+        applied = []
+        for number, description, step in MIGRATIONS:
+            if number <= version:
+                continue
+            step(conn)
+            conn.execute(schema_versions.insert().values(version=number, description=description))
+            applied.append(number)
+    return applied
+
+
+def check_schema_version(bind: Engine = engine) -> None:
+    """Fail fast when the database hasn't been migrated to what this code expects"""
+    with bind.connect() as conn:
+        version = current_version(conn)
+    if version < SCHEMA_VERSION:
+        raise RuntimeError(
+            f"Database schema is at version {version}, this build needs {SCHEMA_VERSION}; "
+            "run `python -m app.db.migrate`"
+        )
+
+
+def seed() -> None:
+    # imported here so the version check alone doesn't load passlib/bcrypt
+    from app.db.seed import seed_admin
+
+    db = SessionLocal()
+    try:
+        seed_admin(db)
+    finally:
+        db.close()
+
+
+def main() -> None:
+    if "--check" in sys.argv[1:]:
+        try:
+            check_schema_version()
+        except RuntimeError as exc:
+            print(exc)
+            sys.exit(1)
+        print(f"Database schema is current (version {SCHEMA_VERSION})")
+        return
+    applied = upgrade()
+    seed()
+    if applied:
+        print(f"Applied migrations {', '.join(map(str, applied))}; schema is at version {SCHEMA_VERSION}")
+    else:
+        print(f"Schema already at version {SCHEMA_VERSION}")
+
+
+if __name__ == "__main__":
+    main()
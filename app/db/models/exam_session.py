@@ -0,0 +1,19 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, JSON, UniqueConstraint
+from app.db.session import Base
+
+class ExamSession(Base):
+    """A student's attempt in progress: start time, deadline and autosaved answers"""
+    __tablename__ = "exam_sessions"
+    id = Column(Integer, primary_key=True, index=True)
+    student_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    subject_id = Column(Integer, ForeignKey("subjects.id", ondelete="CASCADE"), nullable=False)
+    started_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    deadline = Column(DateTime, nullable=False, index=True)
+    answers = Column(JSON, nullable=False, default=dict)  # question id -> option as shown to the student
+    question_ids = Column(JSON, nullable=True)  # served at start, in order; graded against these
+    submitted_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("student_id", "subject_id", name="uq_exam_sessions_student_subject"),
+    )
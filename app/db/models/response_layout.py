@@ -0,0 +1,10 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, LargeBinary
+from app.db.session import Base
+
+class ResponseLayout(Base):
+    """Question order that a packed Result.responses array is laid out against"""
+    __tablename__ = "response_layouts"
+    id = Column(Integer, primary_key=True, index=True)
+    subject_id = Column(Integer, ForeignKey("subjects.id", ondelete="CASCADE"), nullable=False, index=True)
+    digest = Column(String, unique=True, nullable=False)  # sha1 of question_ids
+    question_ids = Column(LargeBinary, nullable=False)  # little-endian int32 array
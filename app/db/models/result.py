@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, Float, String, ForeignKey, DateTime, Index, LargeBinary
 from datetime import datetime
 from app.db.session import Base
 
@@ -13,3 +13,20 @@ class Result(Base):
     grade = Column(String, nullable=True)
     status = Column(String, nullable=False)  # PASS/FAIL
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # one 4-bit option code per question of the layout, see app.core.item_analysis
+    layout_id = Column(Integer, ForeignKey("response_layouts.id"), nullable=True)
+    responses = Column(LargeBinary, nullable=True)
+    # client-supplied on submit; a retry with the same key gets this result back
+    idempotency_key = Column(String(64), nullable=True)
+
+    # Keyset pagination walks (created_at, id) newest first, optionally per student/subject/status
+    __table_args__ = (
+        Index("ix_results_created_at_id", "created_at", "id"),
+        Index("ix_results_student_created_at_id", "student_id", "created_at", "id"),
+        Index("ix_results_subject_created_at_id", "subject_id", "created_at", "id"),
+        Index("ix_results_status_created_at_id", "status", "created_at", "id"),
+        # rank rebuilds and top-N per subject
+        Index("ix_results_subject_percentage", "subject_id", "percentage"),
+        # one result per student and subject; also the lookup for retried submissions
+        Index("uq_results_student_subject", "student_id", "subject_id", unique=True),
+    )
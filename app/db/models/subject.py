@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, Float
+from sqlalchemy import Column, Integer, String, DateTime, Float, Boolean
 from app.db.session import Base
 
 class Subject(Base):
@@ -10,5 +10,8 @@ class Subject(Base):
     duration = Column(Integer, nullable=False)  # in minutes
     totalQuestions = Column(Integer, nullable=False)
     passingScore = Column(Float, nullable=False)  # percentage
+    questionsPerExam = Column(Integer, nullable=True)  # sampled per student from the bank; None serves all
+    shuffle = Column(Boolean, nullable=False, default=False)  # per-student question and option order
     createdAt = Column(DateTime, default=datetime.utcnow)
     updatedAt = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    questionsVersion = Column(Integer, nullable=False, default=0)  # bumped on every question change
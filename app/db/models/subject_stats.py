@@ -0,0 +1,20 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, Float, ForeignKey, DateTime
+from app.db.session import Base
+
+class SubjectStats(Base):
+    """Running aggregates over a subject's results, maintained on submit"""
+    __tablename__ = "subject_stats"
+    subject_id = Column(Integer, ForeignKey("subjects.id", ondelete="CASCADE"), primary_key=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    sum_percentage = Column(Float, nullable=False, default=0.0)
+    sum_sq_percentage = Column(Float, nullable=False, default=0.0)
+    grade_a = Column(Integer, nullable=False, default=0)
+    grade_b = Column(Integer, nullable=False, default=0)
+    grade_c = Column(Integer, nullable=False, default=0)
+    grade_d = Column(Integer, nullable=False, default=0)
+    grade_e = Column(Integer, nullable=False, default=0)
+    grade_f = Column(Integer, nullable=False, default=0)
+    passed = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
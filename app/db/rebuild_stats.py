@@ -0,0 +1,20 @@
+"""Recompute subject_stats from the results table.
+
+    python -m app.db.rebuild_stats [subject_id]
+"""
+import sys
+from app.db.session import SessionLocal
+from app.core.subject_stats import rebuild_stats
+from app.db.models import subject, user  # noqa: F401  register tables referenced by foreign keys
+
+def main() -> None:
+    subject_id = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    db = SessionLocal()
+    try:
+        rebuilt = rebuild_stats(db, subject_id)
+    finally:
+        db.close()
+    print(f"Rebuilt stats for {rebuilt} subject(s)")
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,59 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.core.config import settings
+from app.core.metrics import instrument_engine
 
-connect_args = {"check_same_thread": False} if settings.DATABASE_URL.startswith("sqlite") else {}
-engine = create_engine(settings.DATABASE_URL, echo=False, future=True, connect_args=connect_args)
+def async_database_url(url: str) -> str:
+    """Map a sync DATABASE_URL onto the matching asyncio driver"""
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return url.replace(prefix, "postgresql+asyncpg://", 1)
+    return url
+
+def engine_options(url: str) -> dict:
+    """Pool settings from config; in-memory SQLite keeps its single-connection pool"""
+    options = {"echo": False, "pool_pre_ping": settings.DB_POOL_PRE_PING}
+    if url.startswith("sqlite") and (":memory:" in url or url.rstrip("/").endswith("sqlite:")):
+        return options
+    options.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+    )
+    return options
+
+def make_engine(url: str):
+    connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+    return create_engine(url, future=True, connect_args=connect_args, **engine_options(url))
+
+def make_async_engine(url: str):
+    return create_async_engine(url, **engine_options(url))
+
+engine = make_engine(settings.DATABASE_URL)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
+
+# async engine for `async def` handlers so DB waits don't block the event loop
+async_engine = make_async_engine(settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL))
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+# Listing and analytics reads go to the replica when one is configured
+if settings.READ_REPLICA_URL:
+    read_engine = make_engine(settings.READ_REPLICA_URL)
+    async_read_engine = make_async_engine(async_database_url(settings.READ_REPLICA_URL))
+else:
+    read_engine = engine
+    async_read_engine = async_engine
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+instrument_engine(engine, "sync")
+instrument_engine(async_engine.sync_engine, "async")
+if settings.READ_REPLICA_URL:
+    instrument_engine(read_engine, "read")
+    instrument_engine(async_read_engine.sync_engine, "async_read")
@@ -1,14 +1,30 @@
+import logging
+import time
 from fastapi import FastAPI, Request
+from fastapi.datastructures import Default
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.routing import APIRouter
+from app.core import metrics
 from app.core.config import settings
-from app.db.session import Base, engine, SessionLocal
-from app.db.seed import seed_admin
-from app.api.v1.routes import auth, subjects, questions, exams, results
+from app.core.admission import AdmissionMiddleware
+from app.core.profiling import ProfilerMiddleware
+from app.core.responses import FastJSONResponse
+from app.db.migrate import check_schema_version, seed, upgrade
+from app.core.exam_sessions import autosave_buffer
+from app.core.submission_queue import submission_writer
+from app.api.v1.routes import auth, subjects, questions, exams, results, profiles
 import traceback
 
-app = FastAPI(title="CBE Backend", docs_url="/docs", redoc_url="/redoc")
+# orjson for every route without a response_model; wrapped in Default so routes
+# that have one keep FastAPI's direct pydantic-to-JSON path
+app = FastAPI(
+    title="CBE Backend",
+    docs_url="/docs",
+    redoc_url="/redoc",
+    default_response_class=Default(FastJSONResponse),
+)
+logger = logging.getLogger(__name__)
 
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -20,6 +36,49 @@ async def global_exception_handler(request: Request, exc: Exception):
         content={"detail": str(exc)}
     )
 
+def route_template(request: Request) -> str:
+    """Full route template (e.g. /api/v1/results/{result_id}) so ids don't explode label cardinality"""
+    route = request.scope.get("route")
+    if route is None:
+        return "unmatched"
+    # included routers may only know their own part of the path; recover the prefix
+    path = request.scope["path"]
+    try:
+        rendered = route.path.format(**request.scope.get("path_params", {}))
+    except (KeyError, IndexError, ValueError):
+        return route.path
+    return path[:len(path) - len(rendered)] + route.path if path.endswith(rendered) else route.path
+
+@app.middleware("http")
+async def record_metrics(request: Request, call_next):
+    stats = metrics.RequestStats()
+    token = metrics.current_request.set(stats)
+    metrics.http_in_flight.inc()
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.http_in_flight.dec()
+        metrics.current_request.reset(token)
+        route = route_template(request)
+        metrics.http_requests.inc(request.method, route, status_code)
+        metrics.http_latency.observe(elapsed, request.method, route)
+        metrics.db_queries.inc(route, amount=stats.queries)
+        metrics.db_time.inc(route, amount=stats.db_seconds)
+        metrics.db_queries_per_request.observe(stats.queries, route)
+        if stats.queries > settings.QUERY_COUNT_WARNING_THRESHOLD:
+            logger.warning(
+                "%s %s ran %d queries (%.1f ms in DB)", request.method, route, stats.queries, stats.db_seconds * 1000
+            )
+
+# Sheds low-priority work first so submissions keep their latency at peak;
+# inside CORS so rejections still carry CORS headers
+app.add_middleware(AdmissionMiddleware)
+
 # Configure CORS - must be added before any routes
 origins = [
     "http://localhost:3000",
@@ -32,8 +91,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Bundle-Id", "X-Bundle-Key"],
 )
 
+# Opt-in, admin-only; requests without X-Profile / ?profile=1 pass straight through
+app.add_middleware(ProfilerMiddleware)
+
 @app.get("/")
 async def root():
     return {
@@ -42,16 +105,25 @@ async def root():
         "docs_url": "/docs"
     }
 
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.on_event("startup")
 async def on_startup():
-    # create tables
-    Base.metadata.create_all(bind=engine)
-    # seed admin
-    db = SessionLocal()
-    try:
-        seed_admin(db)
-    finally:
-        db.close()
+    # schema and admin user come from `python -m app.db.migrate`; workers only check the version
+    if settings.AUTO_MIGRATE:
+        upgrade()
+        seed()
+    check_schema_version()
+    # flushes autosaves and auto-submits sessions past their deadline
+    autosave_buffer.start()
+
+@app.on_event("shutdown")
+def on_shutdown():
+    # write out buffered autosaves, then drain queued write-behind submissions
+    autosave_buffer.stop()
+    submission_writer.stop()
 
 # Create API v1 router
 api_v1 = APIRouter(prefix="/api/v1")
@@ -62,6 +134,7 @@ api_v1.include_router(subjects.router, prefix="/subjects", tags=["subjects"])
 api_v1.include_router(questions.router, prefix="/questions", tags=["questions"])
 api_v1.include_router(exams.router, prefix="/exams", tags=["exams"])
 api_v1.include_router(results.router, prefix="/results", tags=["results"])
+api_v1.include_router(profiles.router, prefix="/profiles", tags=["profiles"])
 
 # Include v1 router in main app
 app.include_router(api_v1)
@@ -0,0 +1,85 @@
+"""Cold-start time of a worker: importing app.main plus the ASGI startup handlers.
+
+    python -m benchmarks.cold_start [--runs 5] [--target-ms 1500]
+
+Each run is a fresh interpreter, so nothing is shared between samples except
+the OS file cache. The database must already be migrated
+(`python -m app.db.migrate`). Exits 1 when the median exceeds the target.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+COLD_START_TARGET_MS = 1500
+
+
+async def _startup(app) -> None:
+    """Drive the ASGI lifespan protocol up to startup.complete"""
+    started = asyncio.Event()
+    failure: list[str] = []
+
+    async def receive():
+        if not started.is_set():
+            return {"type": "lifespan.startup"}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message["type"] == "lifespan.startup.failed":
+            failure.append(message.get("message", ""))
+        started.set()
+
+    task = asyncio.create_task(app({"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}}, receive, send))
+    await started.wait()
+    task.cancel()
+    if failure:
+        raise RuntimeError(f"startup failed: {failure[0]}")
+
+
+def child() -> None:
+    began = time.perf_counter()
+    from app.main import app
+    imported = time.perf_counter()
+    asyncio.run(_startup(app))
+    ready = time.perf_counter()
+    print(json.dumps({"import_ms": (imported - began) * 1000, "startup_ms": (ready - imported) * 1000}))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--target-ms", type=float, default=COLD_START_TARGET_MS)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child()
+        return
+
+    samples = []
+    for _ in range(args.runs):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.cold_start", "--child"],
+            check=True, stdout=subprocess.PIPE, text=True,
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+
+    totals = [s["import_ms"] + s["startup_ms"] for s in samples]
+    median = statistics.median(totals)
+    print(json.dumps({
+        "runs": args.runs,
+        "import_ms": statistics.median(s["import_ms"] for s in samples),
+        "startup_ms": statistics.median(s["startup_ms"] for s in samples),
+        "total_ms_median": median,
+        "total_ms_max": max(totals),
+        "target_ms": args.target_ms,
+    }, indent=2))
+    if median > args.target_ms:
+        print(f"cold start {median:.0f} ms is over the {args.target_ms:.0f} ms target", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+"""Exam-day load test: many candidates through login -> start -> autosave -> submit -> results.
+
+    python -m benchmarks.load_test --students 500 --concurrency 100 --arrival herd
+    python -m benchmarks.load_test --base-url http://staging:8000 --no-seed ...
+
+Seeds DATABASE_URL (SQLite or Postgres) with a fresh, uniquely named set of
+subjects, questions and students, starts `uvicorn app.main:app` on a free port
+(unless --base-url points at a running deployment), drives every candidate
+through the real HTTP API and prints a JSON report: throughput, latency
+percentiles per step, status codes, and SQL queries per request per route
+scraped from /metrics. Needs httpx. Runs are reproducible for a given
+--random-seed; compare reports between versions to catch regressions.
+
+Arrival curves:
+  uniform  candidates start spread evenly over --ramp-seconds and submit at their own pace
+  herd     everyone starts at once and, after autosaving, submits at the same instant
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+
+import bcrypt
+import httpx
+from sqlalchemy import insert
+
+from app.db.migrate import upgrade
+from app.db.models.question import Question
+from app.db.models.subject import Subject
+from app.db.models.user import User, UserRole
+from app.db.session import SessionLocal
+
+API = "/api/v1"
+PASSWORD = "load-test"
+OPTIONS = ("A", "B", "C", "D")
+METRIC_LINE = re.compile(r'^(\w+)\{(.*)\} (\S+)$')
+
+
+def seed(args, tag: str) -> dict:
+    """Insert subjects, questions and students for this run; returns what the candidates need"""
+    # one hash shared by every student; --bcrypt-rounds sets what each login costs
+    password_hash = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(args.bcrypt_rounds)).decode()
+    db = SessionLocal()
+    try:
+        subjects = [
+            Subject(
+                name=f"load-{tag}-{i}", description="load test", duration=args.duration_minutes,
+                totalQuestions=args.questions, passingScore=50,
+                questionsPerExam=args.questions_per_exam, shuffle=args.shuffle,
+            )
+            for i in range(args.subjects)
+        ]
+        db.add_all(subjects)
+        db.flush()
+        rng = random.Random(args.random_seed)
+        for subject in subjects:
+            db.execute(insert(Question), [
+                {
+                    "subject_id": subject.id, "question_text": f"Question {n} of {subject.name}",
+                    "option_a": "alpha", "option_b": "bravo", "option_c": "charlie", "option_d": "delta",
+                    "correct_option": rng.choice(OPTIONS),
+                }
+                for n in range(args.questions)
+            ])
+        db.execute(insert(User), [
+            {"name": f"Candidate {i}", "email": f"load-{tag}-{i}@loadtest.example.com", "password_hash": password_hash, "role": UserRole.student}
+            for i in range(args.students)
+        ])
+        db.commit()
+        return {"subject_ids": [subject.id for subject in subjects]}
+    finally:
+        db.close()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args) -> tuple[subprocess.Popen, str]:
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        env=os.environ.copy(),
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("uvicorn exited during startup; is the database migrated?")
+        try:
+            httpx.get(base_url + "/", timeout=1)
+            return server, base_url
+        except httpx.TransportError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("uvicorn did not come up within 60s")
+
+
+def scrape(base_url: str) -> dict:
+    """Per-route request and query counters from one worker's /metrics"""
+    counters = {"requests": Counter(), "queries": Counter()}
+    for line in httpx.get(base_url + "/metrics", timeout=10).text.splitlines():
+        match = METRIC_LINE.match(line)
+        if not match:
+            continue
+        name, labels, value = match.groups()
+        route = re.search(r'route="([^"]*)"', labels)
+        if route is None:
+            continue
+        if name == "http_requests_total":
+            counters["requests"][route.group(1)] += float(value)
+        elif name == "db_queries_total":
+            counters["queries"][route.group(1)] += float(value)
+    return counters
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    """Nearest-rank percentile"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered) + 0.5) - 1))]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.statuses: dict[str, Counter] = defaultdict(Counter)
+
+    async def call(self, client: httpx.AsyncClient, step: str, method: str, url: str, **kwargs) -> httpx.Response | None:
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError as exc:
+            self.statuses[step][type(exc).__name__] += 1
+            return None
+        self.latencies[step].append((time.perf_counter() - started) * 1000)
+        self.statuses[step][str(response.status_code)] += 1
+        return response
+
+    def report(self, elapsed: float) -> dict:
+        steps = {}
+        for step, values in self.latencies.items():
+            steps[step] = {
+                "count": sum(self.statuses[step].values()),
+                "rps": len(values) / elapsed if elapsed else None,
+                "p50_ms": percentile(values, 50),
+                "p95_ms": percentile(values, 95),
+                "p99_ms": percentile(values, 99),
+                "max_ms": max(values),
+                "mean_ms": sum(values) / len(values),
+                "status": dict(self.statuses[step]),
+            }
+        return steps
+
+
+class SubmitGate:
+    """Exam end for the herd curve: releases every submit once all live candidates are waiting"""
+
+    def __init__(self, expected: int):
+        self.expected = expected
+        self.waiting = 0
+        self._open = asyncio.Event()
+
+    @property
+    def released(self) -> bool:
+        return self._open.is_set()
+
+    def _check(self) -> None:
+        if self.waiting >= self.expected:
+            self._open.set()
+
+    async def wait(self) -> None:
+        self.waiting += 1
+        self._check()
+        await self._open.wait()
+
+    def drop_out(self) -> None:
+        self.expected -= 1
+        self._check()
+
+
+async def candidate(index: int, args, tag: str, subject_id: int, client, recorder: Recorder, start_at: float, gate: SubmitGate | None) -> bool:
+    try:
+        return await sit_exam(index, args, tag, subject_id, client, recorder, start_at, gate)
+    finally:
+        if gate is not None and not gate.released:
+            gate.drop_out()
+
+
+async def sit_exam(index: int, args, tag: str, subject_id: int, client, recorder: Recorder, start_at: float, gate: SubmitGate | None) -> bool:
+    rng = random.Random(args.random_seed * 1_000_003 + index)
+    await asyncio.sleep(max(0.0, start_at - time.monotonic()))
+
+    response = await recorder.call(client, "login", "POST", f"{API}/auth/login",
+                                   json={"email": f"load-{tag}-{index}@loadtest.example.com", "password": PASSWORD})
+    if response is None or response.status_code != 200:
+        return False
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    response = await recorder.call(client, "start_exam", "POST", f"{API}/exams/start/{subject_id}", headers=headers)
+    if response is None or response.status_code != 200:
+        return False
+    question_ids = [question["id"] for question in response.json()["questions"]]
+
+    # submitted in full, unanswered as null, so submit needn't wait for autosaves
+    answers = dict.fromkeys(question_ids)
+    per_round = max(1, len(question_ids) // max(1, args.autosaves))
+    for round_number in range(args.autosaves):
+        await asyncio.sleep(rng.uniform(0.5, 1.5) * args.think_seconds)
+        batch = question_ids[round_number * per_round:(round_number + 1) * per_round]
+        saved = [{"question_id": qid, "selected_option": rng.choice(OPTIONS)} for qid in batch]
+        answers.update({item["question_id"]: item["selected_option"] for item in saved})
+        await recorder.call(client, "autosave", "POST", f"{API}/exams/autosave",
+                            json={"subject_id": subject_id, "answers": saved}, headers=headers)
+
+    if gate is not None:
+        await gate.wait()
+    response = await recorder.call(client, "submit", "POST", f"{API}/exams/submit", headers=headers, json={
+        "subject_id": subject_id,
+        "answers": [{"question_id": qid, "selected_option": option} for qid, option in answers.items()],
+    })
+    if response is None or response.status_code != 200:
+        return False
+
+    response = await recorder.call(client, "my_results", "GET", f"{API}/results/me", headers=headers)
+    return response is not None and response.status_code == 200
+
+
+async def drive(args, tag: str, seeded: dict, base_url: str) -> dict:
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        began = time.monotonic()
+        gate = SubmitGate(args.students) if args.arrival == "herd" else None
+        subject_ids = seeded["subject_ids"]
+        tasks = []
+        for index in range(args.students):
+            offset = 0.0 if args.arrival == "herd" else args.ramp_seconds * index / max(1, args.students)
+            tasks.append(asyncio.create_task(candidate(
+                index, args, tag, subject_ids[index % len(subject_ids)], client, recorder, began + offset, gate,
+            )))
+        completed = sum(await asyncio.gather(*tasks))
+        elapsed = time.monotonic() - began
+    total_requests = sum(len(values) for values in recorder.latencies.values())
+    return {
+        "elapsed_s": elapsed,
+        "candidates_completed": completed,
+        "candidates_failed": args.students - completed,
+        "requests": total_requests,
+        "throughput_rps": total_requests / elapsed if elapsed else None,
+        "steps": recorder.report(elapsed),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0], formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subjects", type=int, default=2)
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument("--questions-per-exam", type=int, default=None)
+    parser.add_argument("--shuffle", action="store_true")
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--duration-minutes", type=int, default=60)
+    parser.add_argument("--concurrency", type=int, default=50, help="max open connections")
+    parser.add_argument("--arrival", choices=("uniform", "herd"), default="herd")
+    parser.add_argument("--ramp-seconds", type=float, default=10.0)
+    parser.add_argument("--autosaves", type=int, default=3, help="autosave calls per candidate")
+    parser.add_argument("--think-seconds", type=float, default=1.0, help="mean pause before each autosave")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12, help="cost of seeded passwords; production uses 12")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers when the harness starts the server")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--random-seed", type=int, default=1)
+    parser.add_argument("--base-url", help="drive an already running deployment instead of starting uvicorn")
+    parser.add_argument("--no-seed", action="store_true", help="reuse students seeded by an earlier run; needs --tag")
+    parser.add_argument("--tag", help="name prefix of the seeded data; defaults to a timestamp")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    tag = args.tag or time.strftime("%Y%m%d%H%M%S")
+    if args.no_seed:
+        if not args.tag:
+            parser.error("--no-seed needs the --tag of an earlier seed")
+        db = SessionLocal()
+        try:
+            subject_ids = [row.id for row in db.query(Subject.id).filter(Subject.name.like(f"load-{tag}-%")).order_by(Subject.id)]
+        finally:
+            db.close()
+        seeded = {"subject_ids": subject_ids}
+    else:
+        upgrade()
+        seeded = seed(args, tag)
+
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        server, base_url = start_server(args)
+    try:
+        before = scrape(base_url)
+        results = asyncio.run(drive(args, tag, seeded, base_url))
+        after = scrape(base_url)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    queries = {}
+    for route, count in (after["requests"] - before["requests"]).items():
+        if route == "/metrics":
+            continue
+        queries[route] = {
+            "requests": count,
+            "queries_per_request": (after["queries"][route] - before["queries"][route]) / count,
+        }
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key not in ("output",)} | {"tag": tag},
+        **results,
+        # from a single worker's registry; exact when --workers is 1
+        "server_queries": queries,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
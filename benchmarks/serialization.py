@@ -0,0 +1,133 @@
+"""CPU per request for the JSON-heavy endpoints, before and after the row-tuple/orjson path.
+
+    python -m benchmarks.serialization [--results 10000] [--questions 100] [--repeat 20]
+
+"before" reproduces the previous pipeline (ORM objects, pydantic validation of
+the response_model, JSON encoding); "after" calls the endpoint code as it
+runs now. Runs against a throwaway in-memory SQLite database; the usual
+settings (.env) still have to be present for the app to import.
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import app.main  # noqa: F401  register every table
+from app.api.v1.routes.exams import StartExamResponse
+from app.api.v1.routes.questions import QuestionOut, list_questions
+from app.api.v1.routes.results import ResultOut, get_all_results, result_rows_query, row_to_out
+from app.core.exam_cache import load_paper, paper_cache
+from app.core.responses import FastJSONResponse
+from app.db.models.question import Question
+from app.db.models.result import Result
+from app.db.models.subject import Subject
+from app.db.models.user import User, UserRole
+from app.db.session import Base
+
+
+def seed(db, n_questions: int, n_results: int) -> int:
+    subject = Subject(name="Bench", description="benchmark", duration=60, totalQuestions=n_questions, passingScore=50)
+    db.add(subject)
+    db.flush()
+    db.execute(insert(Question), [
+        {
+            "subject_id": subject.id,
+            "question_text": f"Question {i} " + "lorem ipsum " * 8,
+            "option_a": "first option", "option_b": "second option",
+            "option_c": "third option", "option_d": "fourth option",
+            "correct_option": "ABCD"[i % 4],
+        }
+        for i in range(n_questions)
+    ])
+    db.execute(insert(User), [
+        {"name": f"Student {i}", "email": f"s{i}@bench.local", "password_hash": "x", "role": UserRole.student}
+        for i in range(n_results)
+    ])
+    student_ids = [row.id for row in db.query(User.id).order_by(User.id)]
+    started = datetime(2026, 1, 1)
+    db.execute(insert(Result), [
+        {
+            "student_id": student_id, "subject_id": subject.id,
+            "score": i % (n_questions + 1), "total": n_questions,
+            "percentage": round(100 * (i % (n_questions + 1)) / n_questions, 2),
+            "grade": "B", "status": "PASS" if i % 3 else "FAIL",
+            "created_at": started + timedelta(seconds=i),
+        }
+        for i, student_id in enumerate(student_ids)
+    ])
+    db.commit()
+    return subject.id
+
+
+def cpu_ms(fn, repeat: int) -> tuple[float, bytes]:
+    body = fn()
+    started = time.process_time()
+    for _ in range(repeat):
+        fn()
+    return (time.process_time() - started) * 1000 / repeat, body
+
+
+def main(args) -> None:
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    subject_id = seed(db, args.questions, args.results)
+    request = Request({"type": "http", "method": "GET", "path": "/", "headers": []})
+
+    questions_adapter = TypeAdapter(list[QuestionOut])
+    results_adapter = TypeAdapter(list[ResultOut])
+    start_adapter = TypeAdapter(StartExamResponse)
+
+    def questions_before():
+        rows = db.query(Question).filter(Question.subject_id == subject_id).all()
+        body = questions_adapter.dump_json(questions_adapter.validate_python(rows))
+        db.expunge_all()
+        return body
+
+    def questions_after():
+        return list_questions(subject_id, request, Response(), db).body
+
+    def results_before():
+        rows = result_rows_query(db).order_by(Result.created_at.desc(), Result.id.desc()).limit(args.results).all()
+        return results_adapter.dump_json(results_adapter.validate_python([row_to_out(row) for row in rows]))
+
+    def results_after():
+        return get_all_results(Response(), limit=args.results, db=db).body
+
+    paper_cache.invalidate(subject_id)
+    paper = load_paper(db, subject_id)
+    payload = {"subject_id": subject_id, "questions": paper.for_student(1), "time_remaining": 3600, "answers": {}}
+
+    def start_before():
+        return start_adapter.dump_json(start_adapter.validate_python(payload))
+
+    def start_after():
+        return FastJSONResponse(payload).body
+
+    cases = [
+        ("start_exam", start_before, start_after),
+        ("list_questions", questions_before, questions_after),
+        ("get_all_results", results_before, results_after),
+    ]
+    print(f"{args.questions} questions, {args.results} results, {args.repeat} runs each (CPU ms per request)")
+    print(f"{'endpoint':<18}{'before':>10}{'after':>10}{'saved':>10}")
+    for name, before, after in cases:
+        before_ms, before_body = cpu_ms(before, args.repeat)
+        after_ms, after_body = cpu_ms(after, args.repeat)
+        assert json.loads(before_body) == json.loads(after_body), f"{name}: payloads differ"
+        print(f"{name:<18}{before_ms:>10.2f}{after_ms:>10.2f}{1 - after_ms / before_ms:>10.0%}")
+    db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument("--results", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    main(parser.parse_args())
@@ -0,0 +1,80 @@
+import itertools
+import os
+import tempfile
+
+# settings are read at import time, so configure before anything imports app
+_db_dir = tempfile.mkdtemp(prefix="cbe-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{_db_dir}/test.db",
+    "SECRET_KEY": "test-secret",
+    "ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "60",
+    "ADMIN_EMAIL": "admin@example.com",
+    "ADMIN_PASSWORD": "admin123",
+    "FRONTEND_URL": "http://localhost:3000",
+    "AUTO_MIGRATE": "true",
+    "ADMISSION_ENABLED": "false",
+    # partial submits wait one interval for other workers' autosaves
+    "AUTOSAVE_FLUSH_SECONDS": "0.2",
+})
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+_ids = itertools.count(1)
+
+
+@pytest.fixture(scope="session")
+def client():
+    # server errors come back as 500s so tests can assert on them
+    with TestClient(app, raise_server_exceptions=False) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def admin_headers(client):
+    response = client.post("/api/v1/auth/login", json={"email": "admin@example.com", "password": "admin123"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def make_subject(client, admin_headers):
+    """Create a subject with `questions` questions whose correct option is A; returns its id"""
+    def make(questions=4, **fields):
+        number = next(_ids)
+        response = client.post("/api/v1/subjects/", headers=admin_headers, json={
+            "name": f"Subject {number}", "description": "test", "duration": 30,
+            "totalQuestions": max(questions, 10), "passingScore": 50, **fields,
+        })
+        subject_id = response.json()["id"]
+        client.post(f"/api/v1/questions/{subject_id}/import", headers=admin_headers, json=[
+            {"question_text": f"Question {i}", "option_a": "a", "option_b": "b", "option_c": "c", "option_d": "d", "correct_option": "A"}
+            for i in range(questions)
+        ])
+        return subject_id
+    return make
+
+
+@pytest.fixture
+def subject(make_subject):
+    """A fresh subject with four questions whose correct option is A; returns its id"""
+    return make_subject()
+
+
+@pytest.fixture
+def make_student(client):
+    """Sign up a new student; returns their auth headers"""
+    def make():
+        number = next(_ids)
+        response = client.post("/api/v1/auth/signup", json={
+            "name": "Student", "email": f"student{number}@example.com", "password": "secret",
+        })
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    return make
+
+
+@pytest.fixture
+def student_headers(make_student):
+    return make_student()
@@ -0,0 +1,151 @@
+import asyncio
+
+import pytest
+
+from app.core.admission import AdmissionMiddleware, classify
+from app.core.config import settings
+from app.core.security import create_access_token
+
+
+@pytest.mark.parametrize("method, path, expected", [
+    ("POST", "/api/v1/exams/start/3", "exam"),
+    ("POST", "/api/v1/exams/submit", "exam"),
+    ("POST", "/api/v1/auth/login", "exam"),
+    ("GET", "/api/v1/exams/autosave-stats", "admin"),
+    ("GET", "/api/v1/exams/bundle/3", "admin"),
+    ("GET", "/api/v1/subjects/", "catalog"),
+    ("GET", "/api/v1/results/me", "catalog"),
+    ("GET", "/api/v1/results/rank/3/me", "catalog"),
+    ("GET", "/api/v1/results/12", "catalog"),
+    ("GET", "/api/v1/results/", "admin"),
+    ("GET", "/api/v1/results/export", "admin"),
+    ("GET", "/api/v1/results/stats/3", "admin"),
+    ("GET", "/api/v1/results/rank/3/top", "admin"),
+    ("POST", "/api/v1/results/regrade/3", "admin"),
+    ("GET", "/api/v1/questions/search", "admin"),
+    ("POST", "/api/v1/subjects/", "admin"),
+    ("GET", "/metrics", "exempt"),
+])
+def test_classify(method, path, expected):
+    assert classify(method, path) == expected
+
+
+@pytest.fixture
+def admission(monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_ENABLED", True)
+    monkeypatch.setattr(settings, "ADMISSION_MAX_IN_FLIGHT", 4)
+    monkeypatch.setattr(settings, "ADMISSION_CLASS_LIMITS", {"exam": 4, "catalog": 3, "admin": 2})
+    monkeypatch.setattr(settings, "ADMISSION_SHED_AT", {"exam": 1.0, "catalog": 0.75, "admin": 0.5})
+    monkeypatch.setattr(settings, "ADMISSION_QUEUE_TIMEOUT_SECONDS", 0.2)
+    monkeypatch.setattr(settings, "ADMISSION_RATES", {})
+
+    # holds each request until the test sets its scope's "release" event
+    async def app(scope, receive, send):
+        await scope["release"].wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    return AdmissionMiddleware(app)
+
+
+async def call(middleware, method, path, release=None, headers=()):
+    """(status, headers) of one request; the app answers once `release` is set"""
+    messages = []
+    if release is None:
+        release = asyncio.Event()
+        release.set()
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": method, "path": path, "headers": list(headers), "release": release}
+    await middleware(scope, receive, send)
+    start = messages[0]
+    return start["status"], dict(start["headers"])
+
+
+def test_lower_classes_are_shed_first(admission):
+
+    async def run():
+        held = asyncio.Event()
+        # two exam requests in flight: half of capacity
+        busy = [asyncio.create_task(call(admission, "POST", "/api/v1/exams/submit", held)) for _ in range(2)]
+        await asyncio.sleep(0)
+        admin = await call(admission, "GET", "/api/v1/results/")
+        catalog = await call(admission, "GET", "/api/v1/subjects/")
+        held.set()
+        await asyncio.gather(*busy)
+        return admin, catalog
+
+    admin, catalog = asyncio.run(run())
+    assert admin[0] == 503
+    assert admin[1][b"retry-after"] == b"1"
+    assert catalog[0] == 200
+    assert admission.in_flight == 0
+
+
+def test_exam_requests_queue_for_a_slot(admission):
+
+    async def run():
+        held = asyncio.Event()
+        busy = [asyncio.create_task(call(admission, "POST", "/api/v1/exams/submit", held)) for _ in range(4)]
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(call(admission, "POST", "/api/v1/exams/submit"))
+        await asyncio.sleep(0.05)
+        assert not waiting.done()
+        held.set()
+        await asyncio.gather(*busy)
+        return await waiting
+
+    assert asyncio.run(run())[0] == 200
+
+
+def test_exam_requests_give_up_after_the_queue_timeout(admission):
+
+    async def run():
+        held = asyncio.Event()
+        busy = [asyncio.create_task(call(admission, "POST", "/api/v1/exams/submit", held)) for _ in range(4)]
+        await asyncio.sleep(0)
+        rejected = await call(admission, "POST", "/api/v1/exams/submit")
+        held.set()
+        await asyncio.gather(*busy)
+        return rejected
+
+    assert asyncio.run(run())[0] == 503
+
+
+def test_route_limit_caps_expensive_endpoints(admission, monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_ROUTE_LIMITS", {"/api/v1/results/export": 1})
+
+    async def run():
+        held = asyncio.Event()
+        export = asyncio.create_task(call(admission, "GET", "/api/v1/results/export", held))
+        await asyncio.sleep(0)
+        second = await call(admission, "GET", "/api/v1/results/export")
+        held.set()
+        await export
+        return second, await call(admission, "GET", "/api/v1/results/export")
+
+    second, after = asyncio.run(run())
+    assert second[0] == 503
+    assert after[0] == 200
+
+
+def test_authenticated_users_are_rate_limited_per_class(admission, monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_RATES", {"catalog": (0.5, 2)})
+    headers = [(b"authorization", f"Bearer {create_access_token({'sub': '42'})}".encode())]
+
+    async def run():
+        own = [await call(admission, "GET", "/api/v1/subjects/", headers=headers) for _ in range(3)]
+        anonymous = [await call(admission, "GET", "/api/v1/subjects/") for _ in range(3)]
+        exam = await call(admission, "POST", "/api/v1/exams/submit", headers=headers)
+        return own, anonymous, exam
+
+    own, anonymous, exam = asyncio.run(run())
+    assert [status for status, _ in own] == [200, 200, 429]
+    assert own[2][1][b"retry-after"] == b"2"
+    assert [status for status, _ in anonymous] == [200, 200, 200]
+    assert exam[0] == 200
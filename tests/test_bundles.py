@@ -0,0 +1,68 @@
+import gzip
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.core.bundles import (
+    BundleError, build_bundle, check_bundle, new_bundle_id, parse_bundle_id, sign, verify_answer_set,
+)
+from app.core.exam_cache import ExamPaper
+
+QUESTIONS = tuple(
+    {"id": question_id, "question_text": f"Question {question_id}", "options": dict(zip("ABCD", "abcd"))}
+    for question_id in (1, 2, 3)
+)
+
+
+def paper(subject_id=7, question_ids=(1, 2, 3)) -> ExamPaper:
+    return ExamPaper(
+        subject_id=subject_id, version=0, duration=30, questions=QUESTIONS,
+        answer_key={question_id: "A" for question_id in question_ids}, question_ids=tuple(question_ids),
+        by_id={question["id"]: question for question in QUESTIONS},
+    )
+
+
+def test_bundle_is_signed_with_its_key():
+    body, bundle_id, key = build_bundle(paper(), "Maths", [])
+    envelope = json.loads(gzip.decompress(body))
+    assert envelope["bundle"]["bundle_id"] == bundle_id
+    assert envelope["signature"] == sign(key, envelope["bundle"])
+    assert "answer_key" not in envelope["bundle"]
+
+
+def test_answer_set_signature():
+    _, bundle_id, key = build_bundle(paper(), "Maths", [])
+    answers = {"1": "A", "2": None}
+    signature = sign(key, {"bundle_id": bundle_id, "student_id": 5, "answers": answers})
+    assert verify_answer_set(bundle_id, 5, answers, signature)
+    assert not verify_answer_set(bundle_id, 6, answers, signature)
+    assert not verify_answer_set(bundle_id, 5, {**answers, "2": "B"}, signature)
+
+
+def test_check_bundle_rejects_other_subject_changed_paper_and_expiry():
+    bundle_id = new_bundle_id(paper(), datetime.now(timezone.utc) + timedelta(hours=1))
+    assert check_bundle(bundle_id, paper()).subject_id == 7
+    with pytest.raises(BundleError):
+        check_bundle(bundle_id, paper(subject_id=8))
+    with pytest.raises(BundleError):
+        check_bundle(bundle_id, paper(question_ids=(1, 2)))
+    with pytest.raises(BundleError):
+        check_bundle(new_bundle_id(paper(), datetime.now(timezone.utc) - timedelta(hours=1)), paper())
+    with pytest.raises(BundleError):
+        parse_bundle_id("not-a-bundle")
+
+
+def test_bundle_expiry_survives_a_host_timezone_change(monkeypatch):
+    expires_at = datetime(2026, 3, 29, 1, 30, tzinfo=timezone.utc)
+    monkeypatch.setenv("TZ", "Asia/Kolkata")
+    time.tzset()
+    try:
+        bundle_id = new_bundle_id(paper(), expires_at)
+        monkeypatch.setenv("TZ", "Europe/London")
+        time.tzset()
+        assert parse_bundle_id(bundle_id).expires_at == expires_at
+    finally:
+        monkeypatch.undo()
+        time.tzset()
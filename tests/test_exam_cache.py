@@ -0,0 +1,66 @@
+from datetime import datetime
+
+from sqlalchemy import update
+
+from app.core.exam_cache import load_paper, paper_cache
+from app.db.models.question import Question
+from app.db.models.subject import Subject
+from app.db.session import SessionLocal
+
+
+def edit_elsewhere(statement):
+    """Commit an edit the way another worker would, without touching this worker's cache"""
+    db = SessionLocal()
+    try:
+        db.execute(statement)
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_cached_paper_is_reused(subject):
+    db = SessionLocal()
+    try:
+        assert load_paper(db, subject) is load_paper(db, subject)
+    finally:
+        db.close()
+
+
+def test_question_edit_on_another_worker_reloads_paper(subject):
+    db = SessionLocal()
+    try:
+        paper = load_paper(db, subject)
+        question_id = paper.question_ids[0]
+        # what update_question commits: the fix plus the subject's version bump
+        edit_elsewhere(update(Question).where(Question.id == question_id).values(correct_option="B"))
+        edit_elsewhere(
+            update(Subject).where(Subject.id == subject)
+            .values(questionsVersion=Subject.questionsVersion + 1, updatedAt=Subject.updatedAt)
+        )
+        assert load_paper(db, subject).answer_key[question_id] == "B"
+    finally:
+        db.close()
+
+
+def test_subject_edit_on_another_worker_reloads_paper(subject):
+    db = SessionLocal()
+    try:
+        assert load_paper(db, subject).duration == 30
+        edit_elsewhere(update(Subject).where(Subject.id == subject).values(duration=45, updatedAt=datetime.utcnow()))
+        assert load_paper(db, subject).duration == 45
+    finally:
+        db.close()
+
+
+def test_deleted_subject_drops_cached_paper(subject):
+    db = SessionLocal()
+    try:
+        version = paper_cache.version(subject)
+        assert load_paper(db, subject) is not None
+        edit_elsewhere(Question.__table__.delete().where(Question.subject_id == subject))
+        edit_elsewhere(Subject.__table__.delete().where(Subject.id == subject))
+        assert load_paper(db, subject) is None
+        assert paper_cache.get(subject) is None
+        assert paper_cache.version(subject) == version + 1
+    finally:
+        db.close()
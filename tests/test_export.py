@@ -0,0 +1,27 @@
+import json
+
+from app.api.v1.routes.results import export_rows
+
+
+def sit(client, subject, headers):
+    client.post(f"/api/v1/exams/start/{subject}", headers=headers)
+    client.post("/api/v1/exams/submit", headers=headers, json={"subject_id": subject, "answers": []})
+
+
+def test_ndjson_export_sends_the_first_row_on_its_own(client, subject, student_headers, make_student):
+    sit(client, subject, student_headers)
+    sit(client, subject, make_student())
+    chunks = export_rows("ndjson", subject, None, None)
+    first = next(chunks)
+    assert first.count("\n") == 1
+    assert json.loads(first)["subject_id"] == subject
+    assert len("".join(chunks).splitlines()) == 1
+
+
+def test_csv_export_streams_header_and_rows(client, admin_headers, subject, student_headers):
+    sit(client, subject, student_headers)
+    response = client.get(f"/api/v1/results/export?format=csv&subject_id={subject}", headers=admin_headers)
+    assert response.status_code == 200
+    header, row = response.text.splitlines()
+    assert header.startswith("id,student_id,")
+    assert row.split(",")[3] == str(subject)
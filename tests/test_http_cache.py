@@ -0,0 +1,84 @@
+from datetime import datetime
+
+from starlette.requests import Request
+
+from app.core.http_cache import is_fresh
+
+ETAG = '"abc"'
+LAST_MODIFIED = datetime(2026, 10, 18, 12, 0, 0, 500000)
+
+
+def request(**headers) -> Request:
+    raw = [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "headers": raw})
+
+
+def test_matching_etag_is_fresh():
+    assert is_fresh(request(if_none_match=f'"other", {ETAG}'), ETAG)
+    assert is_fresh(request(if_none_match="*"), ETAG)
+    assert not is_fresh(request(if_none_match='"other"'), ETAG)
+
+
+def test_if_none_match_wins_over_if_modified_since():
+    headers = {"if_none_match": '"other"', "if_modified_since": "Sun, 18 Oct 2026 13:00:00 GMT"}
+    assert not is_fresh(request(**headers), ETAG, LAST_MODIFIED)
+
+
+def test_if_modified_since_compares_to_the_second():
+    assert is_fresh(request(if_modified_since="Sun, 18 Oct 2026 12:00:00 GMT"), ETAG, LAST_MODIFIED)
+    assert not is_fresh(request(if_modified_since="Sun, 18 Oct 2026 11:59:59 GMT"), ETAG, LAST_MODIFIED)
+
+
+def test_if_modified_since_with_unknown_zone_is_utc():
+    # "-0000" parses to a naive datetime
+    assert is_fresh(request(if_modified_since="Sun, 18 Oct 2026 12:00:00 -0000"), ETAG, LAST_MODIFIED)
+    assert not is_fresh(request(if_modified_since="Sun, 18 Oct 2026 11:00:00 -0000"), ETAG, LAST_MODIFIED)
+
+
+def test_unusable_if_modified_since_is_stale():
+    assert not is_fresh(request(if_modified_since="yesterday"), ETAG, LAST_MODIFIED)
+    assert not is_fresh(request(if_modified_since="Sun, 18 Oct 2026 12:00:00 GMT"), ETAG)
+    assert not is_fresh(request(), ETAG, LAST_MODIFIED)
+
+
+def test_subject_list_revalidates_until_a_subject_changes(client, make_subject):
+    first = client.get("/api/v1/subjects/")
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"]
+    assert client.get("/api/v1/subjects/", headers={"If-None-Match": etag}).status_code == 304
+
+    make_subject(questions=0)
+    changed = client.get("/api/v1/subjects/", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+
+def test_subject_honours_if_modified_since(client, subject):
+    first = client.get(f"/api/v1/subjects/{subject}")
+    assert first.status_code == 200
+    not_modified = client.get(f"/api/v1/subjects/{subject}", headers={"If-Modified-Since": first.headers["last-modified"]})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == first.headers["etag"]
+    assert not_modified.content == b""
+
+
+def test_question_list_etag_changes_on_edit(client, admin_headers, subject):
+    first = client.get(f"/api/v1/questions/{subject}")
+    etag = first.headers["etag"]
+    assert client.get(f"/api/v1/questions/{subject}", headers={"If-None-Match": etag}).status_code == 304
+
+    question = first.json()[0]
+    client.put(f"/api/v1/questions/{question['id']}", headers=admin_headers, json={
+        **{field: question[field] for field in ("option_a", "option_b", "option_c", "option_d", "correct_option")},
+        "question_text": "Edited",
+    })
+    changed = client.get(f"/api/v1/questions/{subject}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert "Edited" in {row["question_text"] for row in changed.json()}
+
+
+def test_missing_subject_has_no_validators(client):
+    response = client.get("/api/v1/subjects/999999", headers={"If-None-Match": "*"})
+    assert response.status_code == 404
+    assert "etag" not in response.headers
@@ -0,0 +1,76 @@
+from app.db.models.question import Question
+from app.db.session import SessionLocal
+
+HEADER = "question_text,option_a,option_b,option_c,option_d,correct_option"
+
+
+def question_count(subject_id) -> int:
+    db = SessionLocal()
+    try:
+        return db.query(Question).filter(Question.subject_id == subject_id).count()
+    finally:
+        db.close()
+
+
+def test_json_import_reports_invalid_rows(client, admin_headers, make_subject):
+    subject = make_subject(questions=0)
+    response = client.post(f"/api/v1/questions/{subject}/import", headers=admin_headers, json=[
+        {"question_text": "Q1", "option_a": "a", "option_b": "b", "option_c": "c", "option_d": "d", "correct_option": "B"},
+        {"question_text": "Q2", "option_a": "a", "option_b": "b", "option_c": "c", "option_d": "d", "correct_option": "E"},
+        {"question_text": "Q3", "option_a": "a"},
+    ])
+    assert response.status_code == 200
+    body = response.json()
+    assert body["inserted"] == 1
+    assert [error["row"] for error in body["errors"]] == [2, 3]
+    assert any(message.startswith("correct_option") for message in body["errors"][0]["errors"])
+    assert question_count(subject) == 1
+
+
+def test_csv_import_numbers_rows_after_the_header(client, admin_headers, make_subject):
+    subject = make_subject(questions=0)
+    body = "\n".join([HEADER, "Q1,a,b,c,d,A", "Q2,a,b,c,d,Z", "Q3,a,b,c,d,D"])
+    response = client.post(
+        f"/api/v1/questions/{subject}/import", headers={**admin_headers, "Content-Type": "text/csv"}, content=body,
+    )
+    assert response.json()["inserted"] == 2
+    assert [error["row"] for error in response.json()["errors"]] == [3]
+
+
+def test_multipart_upload(client, admin_headers, make_subject):
+    subject = make_subject(questions=0)
+    files = {"file": ("questions.csv", f"{HEADER}\nQ1,a,b,c,d,C\n".encode(), "text/csv")}
+    response = client.post(f"/api/v1/questions/{subject}/import", headers=admin_headers, files=files)
+    assert response.json() == {"inserted": 1, "errors": []}
+
+
+def test_import_stops_at_subject_capacity(client, admin_headers, make_subject):
+    subject = make_subject(questions=8)  # totalQuestions is 10
+    rows = [
+        {"question_text": f"Extra {i}", "option_a": "a", "option_b": "b", "option_c": "c", "option_d": "d", "correct_option": "A"}
+        for i in range(4)
+    ]
+    response = client.post(f"/api/v1/questions/{subject}/import", headers=admin_headers, json=rows)
+    assert response.json()["inserted"] == 2
+    assert [error["row"] for error in response.json()["errors"]] == [3, 4]
+    assert question_count(subject) == 10
+
+
+def test_unparseable_body_is_400(client, admin_headers, make_subject):
+    subject = make_subject(questions=0)
+    response = client.post(
+        f"/api/v1/questions/{subject}/import",
+        headers={**admin_headers, "Content-Type": "application/json"}, content=b"{not json",
+    )
+    assert response.status_code == 400
+    response = client.post(f"/api/v1/questions/{subject}/import", headers=admin_headers, json={"question_text": "Q"})
+    assert response.status_code == 400
+
+
+def test_import_invalidates_the_cached_paper(client, admin_headers, make_subject, make_student):
+    subject = make_subject(questions=2)
+    assert len(client.post(f"/api/v1/exams/start/{subject}", headers=make_student()).json()["questions"]) == 2
+    client.post(f"/api/v1/questions/{subject}/import", headers=admin_headers, json=[
+        {"question_text": "Q", "option_a": "a", "option_b": "b", "option_c": "c", "option_d": "d", "correct_option": "A"},
+    ])
+    assert len(client.post(f"/api/v1/exams/start/{subject}", headers=make_student()).json()["questions"]) == 3
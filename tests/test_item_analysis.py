@@ -0,0 +1,95 @@
+import numpy as np
+
+from app.core.item_analysis import (
+    NOT_PRESENTED, OPTION_CODES, analyse, keyed_entries, pack_responses, unpack_matrix,
+)
+
+KEY = {1: "A", 2: "B", 3: "C", 4: "D"}
+
+
+def legacy_pack(bank, answers, presented) -> bytes:
+    """Responses as stored before layouts followed the selection: the whole bank, unserved questions 0"""
+    codes = np.zeros(len(bank) + len(bank) % 2, dtype=np.uint8)
+    for position, question_id in enumerate(bank):
+        if question_id in presented:
+            codes[position] = OPTION_CODES.get(answers.get(question_id), 1)
+    return ((codes[0::2] << 4) | codes[1::2]).tobytes()
+
+
+def test_pack_round_trip():
+    blob = pack_responses([1, 2, 3], {1: "A", 3: "D"})
+    assert len(blob) == 2
+    assert unpack_matrix([blob], 3).tolist() == [[2, 1, 5]]
+
+
+def test_entries_cover_only_served_questions_still_in_the_key():
+    layouts = {10: np.array([1, 2, 3, 4, 5]), 11: np.array([2, 4]), 12: np.array([1, 3, 4])}
+    results = [
+        (10, legacy_pack([1, 2, 3, 4, 5], {1: "A", 2: "A"}, {1, 2})),
+        (11, pack_responses([2, 4], {2: "B", 4: "D"})),
+        (12, pack_responses([1, 3, 4], {3: "C"})),
+    ]
+    question_ids, rows, columns, codes, key = keyed_entries(layouts, results, KEY)
+    assert question_ids.tolist() == [1, 2, 3, 4]  # 5 was deleted
+    assert NOT_PRESENTED not in codes
+    scores = np.bincount(rows, weights=codes == key, minlength=3)
+    totals = np.bincount(rows, minlength=3)
+    assert scores.tolist() == [1, 2, 1]
+    assert totals.tolist() == [2, 2, 3]
+
+
+def test_analyse_matches_dense_statistics():
+    rng = np.random.default_rng(0)
+    n_results, n_items = 200, 6
+    dense = rng.integers(1, 6, size=(n_results, n_items)).astype(np.uint8)
+    dense[rng.random((n_results, n_items)) < 0.2] = NOT_PRESENTED
+    key_codes = np.array([2, 3, 4, 5, 2, 3], dtype=np.uint8)
+    rows, columns = np.nonzero(dense != NOT_PRESENTED)
+    stats = analyse(n_results, n_items, rows, columns, dense[rows, columns], key_codes[columns])
+
+    presented = dense != NOT_PRESENTED
+    x = ((dense == key_codes) & presented).astype(float)
+    assert stats["n_presented"].tolist() == presented.sum(axis=0).tolist()
+    assert np.allclose(stats["difficulty"], x.sum(axis=0) / presented.sum(axis=0))
+    for item in range(n_items):
+        served = presented[:, item]
+        rest = x[served].sum(axis=1) - x[served, item]
+        assert np.isclose(stats["discrimination"][item], np.corrcoef(x[served, item], rest)[0, 1])
+    complete = presented.all(axis=1)
+    assert stats["n_complete"] == complete.sum()
+    items = x[complete]
+    alpha = n_items / (n_items - 1) * (1 - items.var(axis=0, ddof=1).sum() / items.sum(axis=1).var(ddof=1))
+    assert np.isclose(stats["alpha"], alpha)
+    assert stats["frequencies"]["blank"].tolist() == (dense == 1).sum(axis=0).tolist()
+
+
+def sit(client, subject, headers, options):
+    questions = client.post(f"/api/v1/exams/start/{subject}", headers=headers).json()["questions"]
+    answers = [{"question_id": question["id"], "selected_option": option} for question, option in zip(questions, options)]
+    client.post("/api/v1/exams/submit", headers=headers, json={"subject_id": subject, "answers": answers})
+    return [question["id"] for question in questions]
+
+
+def test_item_analysis_endpoint(client, admin_headers, subject, make_student):
+    question_ids = sit(client, subject, make_student(), ["A", "A", "A", "A"])
+    sit(client, subject, make_student(), ["A", "A", "B", None])
+    sit(client, subject, make_student(), ["A", "C", "B", None])
+
+    response = client.get(f"/api/v1/results/item-analysis/{subject}", headers=admin_headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["submissions"], body["complete_submissions"]) == (3, 3)
+    items = {item["question_id"]: item for item in body["items"]}
+    assert list(items) == sorted(question_ids)
+    first, second, third, fourth = (items[question_id] for question_id in question_ids)
+    assert first["difficulty"] == 1.0
+    # nobody missed it, so it can't discriminate
+    assert first["discrimination"] is None
+    assert second["difficulty"] == 2 / 3
+    assert third["frequencies"] == {"A": 1, "B": 2, "C": 0, "D": 0, "blank": 0}
+    assert fourth["frequencies"]["blank"] == 2
+    assert body["cronbach_alpha"] is not None
+
+
+def test_item_analysis_of_unknown_subject_is_404(client, admin_headers):
+    assert client.get("/api/v1/results/item-analysis/999999", headers=admin_headers).status_code == 404
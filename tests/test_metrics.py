@@ -0,0 +1,33 @@
+from sqlalchemy import create_engine, text
+
+from app.core import metrics
+
+
+def checkouts(name: str) -> int:
+    state = metrics.db_pool_wait._values.get((name,))
+    return state[1] if state else 0
+
+
+def test_pool_wait_is_timed_after_dispose():
+    engine = create_engine("sqlite://")
+    metrics.instrument_engine(engine, "test")
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert checkouts("test") == 1
+
+    engine.dispose()
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert checkouts("test") == 2
+
+
+def test_render_exposition_format():
+    counter = metrics.Counter("test_events_total", "Test events", ("kind",))
+    try:
+        counter.inc("a")
+        counter.inc("a", amount=2)
+        text = metrics.render()
+    finally:
+        metrics.registry.remove(counter)
+    assert "# TYPE test_events_total counter" in text
+    assert 'test_events_total{kind="a"} 3' in text
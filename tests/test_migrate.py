@@ -0,0 +1,89 @@
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, MetaData, String, Table, create_engine, inspect, select, text
+from sqlalchemy.orm import Session
+
+from app.db.migrate import (
+    SCHEMA_VERSION, check_schema_version, create_tables, current_version, result_duplicates, unique_results, upgrade,
+)
+from app.db.models.result import Result
+from app.db.models.subject import Subject
+from app.db.models.subject_stats import SubjectStats
+
+
+def baseline_tables(metadata: MetaData) -> None:
+    """The schema startup's create_all made before any migration existed"""
+    Table("users", metadata,
+          Column("id", Integer, primary_key=True), Column("name", String, nullable=False),
+          Column("email", String, unique=True, nullable=False), Column("password_hash", String, nullable=False),
+          Column("role", String(7), nullable=False))
+    Table("subjects", metadata,
+          Column("id", Integer, primary_key=True), Column("name", String, unique=True, nullable=False),
+          Column("description", String, nullable=False), Column("duration", Integer, nullable=False),
+          Column("totalQuestions", Integer, nullable=False), Column("passingScore", Float, nullable=False),
+          Column("createdAt", DateTime), Column("updatedAt", DateTime))
+    Table("questions", metadata,
+          Column("id", Integer, primary_key=True),
+          Column("subject_id", Integer, ForeignKey("subjects.id", ondelete="CASCADE"), nullable=False),
+          *(Column(name, String, nullable=False) for name in (
+              "question_text", "option_a", "option_b", "option_c", "option_d", "correct_option",
+          )))
+    Table("results", metadata,
+          Column("id", Integer, primary_key=True),
+          Column("student_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+          Column("subject_id", Integer, ForeignKey("subjects.id", ondelete="CASCADE"), nullable=False),
+          Column("score", Integer, nullable=False), Column("total", Integer, nullable=False),
+          Column("percentage", Float, nullable=False), Column("grade", String), Column("status", String, nullable=False),
+          Column("created_at", DateTime, nullable=False))
+
+
+def test_upgrade_adds_columns_to_tables_created_before_them():
+    engine = create_engine("sqlite://")
+    metadata = MetaData()
+    baseline_tables(metadata)
+    with engine.begin() as conn:
+        metadata.create_all(conn)
+        conn.execute(text(
+            "INSERT INTO subjects (id, name, description, duration, \"totalQuestions\", \"passingScore\") "
+            "VALUES (1, 'Maths', 'd', 30, 10, 50)"
+        ))
+        conn.execute(text(
+            "INSERT INTO results (student_id, subject_id, score, total, percentage, grade, status, created_at) "
+            "VALUES (1, 1, 3, 4, 75.0, 'A', 'PASS', '2026-01-01 00:00:00')"
+        ))
+
+    assert upgrade(engine) == [number for number in range(1, SCHEMA_VERSION + 1)]
+    check_schema_version(engine)
+    with Session(engine) as db:
+        result = db.query(Result).one()
+        assert (result.score, result.layout_id, result.responses, result.idempotency_key) == (3, None, None, None)
+        subject = db.get(Subject, 1)
+        assert (subject.questionsPerExam, subject.shuffle, subject.questionsVersion) == (None, False, 0)
+        assert db.get(SubjectStats, 1).attempts == 1
+    with engine.connect() as conn:
+        assert "question_ids" in {column["name"] for column in inspect(conn).get_columns("exam_sessions")}
+        assert current_version(conn) == SCHEMA_VERSION
+    # a second run finds nothing to do
+    assert upgrade(engine) == []
+
+
+def test_unique_results_keeps_first_result_per_student_and_subject(capsys):
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        create_tables(conn)
+        # a database from before the index, with a double submission
+        conn.execute(text("DROP INDEX uq_results_student_subject"))
+        row = {"subject_id": 1, "total": 4, "grade": "A", "status": "PASS"}
+        conn.execute(Result.__table__.insert(), [
+            {**row, "student_id": 1, "score": 4, "percentage": 100.0},
+            {**row, "student_id": 1, "score": 2, "percentage": 50.0},
+            {**row, "student_id": 2, "score": 3, "percentage": 75.0},
+        ])
+        unique_results(conn)
+
+        kept = conn.execute(select(Result.student_id, Result.score).order_by(Result.id)).all()
+        assert [tuple(row) for row in kept] == [(1, 4), (2, 3)]
+        archived = conn.execute(select(result_duplicates.c.id, result_duplicates.c.student_id, result_duplicates.c.score)).all()
+        assert [tuple(row) for row in archived] == [(2, 1, 2)]
+        assert "ids 2" in capsys.readouterr().out
+        assert conn.scalar(select(SubjectStats.attempts).where(SubjectStats.subject_id == 1)) == 2
+        indexes = {index["name"]: index for index in conn.dialect.get_indexes(conn, "results")}
+        assert indexes["uq_results_student_subject"]["unique"]
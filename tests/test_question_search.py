@@ -0,0 +1,137 @@
+from app.core import question_search
+from app.core.near_duplicates import duplicate_indexes, jaccard, shingles
+from app.core.question_search import InvertedIndex
+from app.db.models.subject import Subject
+from app.db.session import SessionLocal
+
+
+def question(text, options=("Paris", "London", "Rome", "Madrid"), correct="A"):
+    return {
+        "question_text": text, "option_a": options[0], "option_b": options[1],
+        "option_c": options[2], "option_d": options[3], "correct_option": correct,
+    }
+
+
+def questions_version(subject_id) -> int:
+    db = SessionLocal()
+    try:
+        return db.query(Subject.questionsVersion).filter(Subject.id == subject_id).scalar()
+    finally:
+        db.close()
+
+
+def add(client, admin_headers, subject_id, body):
+    response = client.post(f"/api/v1/questions/{subject_id}", headers=admin_headers, json=body)
+    assert response.status_code == 200
+    return response.json()
+
+
+def search(client, admin_headers, **params):
+    response = client.get("/api/v1/questions/search", headers=admin_headers, params=params)
+    assert response.status_code == 200
+    return [row["id"] for row in response.json()]
+
+
+def test_search_matches_every_word_and_the_last_as_a_prefix(client, admin_headers, make_subject):
+    subject_id = make_subject(questions=0)
+    capital = add(client, admin_headers, subject_id, question("Which city is the capital of France?"))["id"]
+    river = add(client, admin_headers, subject_id, question("Which river flows through the capital of England?", ("Seine", "Thames", "Tiber", "Tagus")))["id"]
+
+    assert set(search(client, admin_headers, q="capital", subject_id=subject_id)) == {capital, river}
+    assert search(client, admin_headers, q="capital fra", subject_id=subject_id) == [capital]
+    assert search(client, admin_headers, q="thames", subject_id=subject_id) == [river]
+    assert search(client, admin_headers, q="capital zebra", subject_id=subject_id) == []
+    assert len(search(client, admin_headers, q="capital", subject_id=subject_id, limit=1)) == 1
+
+
+def test_search_filters_by_subject(client, admin_headers, make_subject):
+    first, second = make_subject(questions=0), make_subject(questions=0)
+    mine = add(client, admin_headers, first, question("Name the largest quokkapopulation island"))["id"]
+    theirs = add(client, admin_headers, second, question("Name the largest quokkapopulation island"))["id"]
+
+    assert search(client, admin_headers, q="quokkapop", subject_id=first) == [mine]
+    assert set(search(client, admin_headers, q="quokkapop")) == {mine, theirs}
+
+
+def test_search_edits_and_deletes_are_reflected(client, admin_headers, make_subject):
+    subject_id = make_subject(questions=0)
+    created = add(client, admin_headers, subject_id, question("What colour is a wombatish sky?"))
+    client.put(f"/api/v1/questions/{created['id']}", headers=admin_headers, json=question("What colour is a numbatish sky?"))
+    assert search(client, admin_headers, q="wombatish", subject_id=subject_id) == []
+    assert search(client, admin_headers, q="numbatish", subject_id=subject_id) == [created["id"]]
+
+    client.delete(f"/api/v1/questions/{created['id']}", headers=admin_headers)
+    assert search(client, admin_headers, q="numbatish", subject_id=subject_id) == []
+
+
+def test_memory_backend_searches_one_subject(client, admin_headers, make_subject, monkeypatch):
+    subject_id = make_subject(questions=0)
+    found = add(client, admin_headers, subject_id, question("Which planet has the platypusian rings?"))["id"]
+    monkeypatch.setattr(question_search, "search_backend", lambda db: "memory")
+
+    assert search(client, admin_headers, q="platypus", subject_id=subject_id) == [found]
+    response = client.get("/api/v1/questions/search", headers=admin_headers, params={"q": "platypus"})
+    assert response.status_code == 400
+    assert "subject_id" in response.json()["detail"]
+
+
+def test_inverted_index_ranks_by_tf_idf_and_breaks_ties_by_age():
+    class Row:
+        def __init__(self, id, text):
+            self.id, self.question_text = id, text
+            self.option_a = self.option_b = self.option_c = self.option_d = ""
+
+    index = InvertedIndex([Row(1, "apple pie"), Row(2, "apple apple tart"), Row(3, "apple crumble")])
+    assert [-negated for _, negated in index.search(["apple"], 10)] == [2, 1, 3]
+    assert [-negated for _, negated in index.search(["apple", "cr"], 10)] == [3]
+    assert index.search(["pear"], 10) == []
+
+
+def test_shingles_ignore_option_order_and_case():
+    original = question("What is the capital of France?")
+    reordered = question("what is the CAPITAL of France", ("Rome", "Madrid", "Paris", "London"), "C")
+    assert shingles(original) == shingles(reordered)
+    assert jaccard(shingles(original), shingles(reordered)) == 1.0
+
+    other = question("Which ocean is the largest?", ("Pacific", "Atlantic", "Indian", "Arctic"))
+    assert jaccard(shingles(original), shingles(other)) < 0.2
+    assert jaccard(frozenset(), frozenset()) == 0.0
+
+
+def test_add_question_lists_possible_duplicates(client, admin_headers, make_subject):
+    subject_id = make_subject(questions=0)
+    first = add(client, admin_headers, subject_id, question("What is the capital city of France today?"))
+    assert first["possible_duplicates"] == []
+
+    reordered = add(client, admin_headers, subject_id, question(
+        "What is the capital city of France today?", ("Rome", "Madrid", "Paris", "London"), "C",
+    ))
+    assert reordered["possible_duplicates"] == [{"id": first["id"], "similarity": 1.0}]
+
+    unrelated = add(client, admin_headers, subject_id, question(
+        "Which ocean is the largest by area?", ("Pacific", "Atlantic", "Indian", "Arctic"),
+    ))
+    assert unrelated["possible_duplicates"] == []
+
+    # each add carries the cached index forward rather than dropping it for a rebuild
+    version = questions_version(subject_id)
+    cached = duplicate_indexes.get(subject_id, version)
+    assert set(cached.shingles) == {first["id"], reordered["id"], unrelated["id"]}
+    again = add(client, admin_headers, subject_id, question("What is the capital city of France today?"))
+    assert {match["id"] for match in again["possible_duplicates"]} == {first["id"], reordered["id"]}
+    assert duplicate_indexes.get(subject_id, version + 1) is cached
+
+
+def test_duplicates_endpoint_pairs_each_question_with_earlier_ones(client, admin_headers, make_subject):
+    subject_id = make_subject(questions=0)
+    first = add(client, admin_headers, subject_id, question("Who wrote the play Hamlet in the year 1600?"))["id"]
+    add(client, admin_headers, subject_id, question("Which gas do plants absorb from the air?", ("CO2", "O2", "N2", "H2")))
+    copy = add(client, admin_headers, subject_id, question(
+        "Who wrote the play Hamlet in the year 1600?", ("London", "Paris", "Madrid", "Rome"),
+    ))["id"]
+
+    body = client.get(f"/api/v1/questions/{subject_id}/duplicates", headers=admin_headers).json()
+    assert body["subject_id"] == subject_id
+    assert body["pairs"] == [{"question_id": copy, "duplicate_of": first, "similarity": 1.0}]
+
+    assert client.get("/api/v1/questions/999999/duplicates", headers=admin_headers).status_code == 404
@@ -0,0 +1,57 @@
+import random
+
+from app.core.rank_index import FenwickTree, RankIndex, bucket_of
+from app.db.session import SessionLocal
+
+
+def test_fenwick_prefix_matches_a_plain_count():
+    rng = random.Random(3)
+    values = [bucket_of(rng.choice([0.0, 12.5, 50.0, 66.67, 100.0, rng.uniform(0, 100)])) for _ in range(300)]
+    fenwick = FenwickTree()
+    for value in values:
+        fenwick.add(value)
+    counts = {}
+    for value in values:
+        counts[value] = counts.get(value, 0) + 1
+    built = FenwickTree.from_counts(counts)
+    for bucket in (0, 1, 1250, 5000, 6667, 9999, 10000):
+        expected = sum(value <= bucket for value in values)
+        assert fenwick.prefix(bucket) == built.prefix(bucket) == expected
+    assert fenwick.total == built.total == len(values)
+
+
+def test_buckets_are_clamped_to_hundredths():
+    assert (bucket_of(-5), bucket_of(0.004), bucket_of(66.666), bucket_of(120)) == (0, 0, 6667, 10000)
+
+
+def test_rank_counts_ties_as_half(client, admin_headers, subject, make_student):
+    students = [make_student() for _ in range(4)]
+    for headers, correct in zip(students, (4, 2, 2, 1)):
+        questions = client.post(f"/api/v1/exams/start/{subject}", headers=headers).json()["questions"]
+        answers = [{"question_id": q["id"], "selected_option": "A" if i < correct else "B"} for i, q in enumerate(questions)]
+        client.post("/api/v1/exams/submit", headers=headers, json={"subject_id": subject, "answers": answers})
+
+    ranks = [client.get(f"/api/v1/results/rank/{subject}/me", headers=headers).json() for headers in students]
+    assert [(rank["rank"], rank["out_of"]) for rank in ranks] == [(1, 4), (2, 4), (2, 4), (4, 4)]
+    assert [rank["percentile"] for rank in ranks] == [87.5, 50.0, 50.0, 12.5]
+
+    top = client.get(f"/api/v1/results/rank/{subject}/top", headers=admin_headers, params={"n": 2}).json()
+    assert [row["percentage"] for row in top] == [100.0, 50.0]
+
+
+def test_rank_of_a_student_without_a_result_is_404(client, subject, student_headers):
+    assert client.get(f"/api/v1/results/rank/{subject}/me", headers=student_headers).status_code == 404
+
+
+def test_tree_is_reloaded_when_another_worker_adds_results(client, subject, make_student):
+    index = RankIndex(ttl=3600)  # this worker's; the app's own index plays the other worker
+    db = SessionLocal()
+    try:
+        assert index.rank(db, subject, 50.0)["out_of"] == 0
+        headers = make_student()
+        client.post(f"/api/v1/exams/start/{subject}", headers=headers)
+        client.post("/api/v1/exams/submit", headers=headers, json={"subject_id": subject, "answers": []})
+        db.rollback()
+        assert index.rank(db, subject, 50.0)["out_of"] == 1
+    finally:
+        db.close()
@@ -0,0 +1,80 @@
+from app.db.models.result import Result
+from app.db.session import SessionLocal
+
+
+def sit(client, subject, headers, options):
+    questions = client.post(f"/api/v1/exams/start/{subject}", headers=headers).json()["questions"]
+    answers = [{"question_id": question["id"], "selected_option": option} for question, option in zip(questions, options)]
+    client.post("/api/v1/exams/submit", headers=headers, json={"subject_id": subject, "answers": answers})
+    return [question["id"] for question in questions]
+
+
+def scores(subject_id) -> list[tuple]:
+    db = SessionLocal()
+    try:
+        rows = db.query(Result.score, Result.total, Result.grade).filter(Result.subject_id == subject_id).order_by(Result.id)
+        return [tuple(row) for row in rows]
+    finally:
+        db.close()
+
+
+def rekey(client, admin_headers, question_id, option):
+    client.put(f"/api/v1/questions/{question_id}", headers=admin_headers, json={
+        "question_text": "fixed", "option_a": "a", "option_b": "b", "option_c": "c", "option_d": "d",
+        "correct_option": option,
+    })
+
+
+def regrade(client, admin_headers, subject, **params):
+    response = client.post(f"/api/v1/results/regrade/{subject}", headers=admin_headers, params=params)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_regrade_applies_a_corrected_key(client, admin_headers, subject, make_student):
+    question_ids = sit(client, subject, make_student(), ["A", "A", "A", "A"])
+    sit(client, subject, make_student(), ["B", "A", "A", None])
+    assert scores(subject) == [(4, 4, "A"), (2, 4, "C")]
+    rekey(client, admin_headers, question_ids[0], "B")
+
+    report = regrade(client, admin_headers, subject)
+    assert (report["dry_run"], report["considered"], report["changed"]) == (True, 2, 2)
+    assert report["grade_changes"] == {"C->A": 1}
+    assert scores(subject) == [(4, 4, "A"), (2, 4, "C")]
+
+    report = regrade(client, admin_headers, subject, dry_run="false")
+    assert report["changed"] == 2
+    assert scores(subject) == [(3, 4, "A"), (3, 4, "A")]
+    stats = client.get(f"/api/v1/results/stats/{subject}", headers=admin_headers).json()
+    assert stats["mean"] == 75.0
+    assert stats["distribution"]["A"] == 2
+    # nothing left to change
+    assert regrade(client, admin_headers, subject, dry_run="false")["changed"] == 0
+
+
+def test_regrade_drops_deleted_questions_and_reports_grade_changes(client, admin_headers, subject, make_student):
+    question_ids = sit(client, subject, make_student(), ["A", "B", "B", "B"])
+    client.delete(f"/api/v1/questions/{question_ids[3]}", headers=admin_headers)
+    # 1/4 becomes 1/3: still an F, but the total changed
+    report = regrade(client, admin_headers, subject, dry_run="false")
+    assert (report["changed"], report["grade_changes"]) == (1, {})
+    assert scores(subject) == [(1, 3, "F")]
+    rekey(client, admin_headers, question_ids[1], "B")
+    report = regrade(client, admin_headers, subject, dry_run="false")
+    assert report["grade_changes"] == {"F->B": 1}
+    assert report["status_changes"] == {"FAIL->PASS": 1}
+
+
+def test_regrade_one_question_only_touches_results_it_was_presented_in(client, admin_headers, make_subject, make_student):
+    subject = make_subject(questions=6, questionsPerExam=2)
+    served = [sit(client, subject, make_student(), ["A", "A"]) for _ in range(6)]
+    question_id = served[0][0]
+    rekey(client, admin_headers, question_id, "C")
+    report = regrade(client, admin_headers, subject, question_id=question_id)
+    presented = sum(question_id in ids for ids in served)
+    assert (report["considered"], report["changed"]) == (presented, presented)
+
+
+def test_regrade_unknown_question_is_404(client, admin_headers, subject):
+    response = client.post(f"/api/v1/results/regrade/{subject}", headers=admin_headers, params={"question_id": 999999})
+    assert response.status_code == 404
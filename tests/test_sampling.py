@@ -0,0 +1,59 @@
+from app.core.item_analysis import unpack_ids
+from app.core.sampling import option_order, select_questions, to_canonical
+from app.db.models.response_layout import ResponseLayout
+from app.db.models.result import Result
+from app.db.session import SessionLocal
+
+
+def correct_answers(questions) -> list[dict]:
+    # every question's correct option is the one reading "a", wherever it is shown
+    return [
+        {"question_id": question["id"], "selected_option": next(shown for shown, text in question["options"].items() if text == "a")}
+        for question in questions
+    ]
+
+
+def test_selection_is_reproducible_and_sized():
+    bank = tuple(range(1, 101))
+    selected = select_questions(bank, 10, False, seed=7)
+    assert selected == select_questions(bank, 10, False, seed=7)
+    assert len(selected) == 10 and selected == sorted(selected)
+    shuffled = select_questions(bank, None, True, seed=7)
+    assert sorted(shuffled) == list(bank) and shuffled != list(bank)
+
+
+def test_shown_options_map_back_to_canonical():
+    order = option_order(seed=7, question_id=3)
+    assert sorted(order) == ["A", "B", "C", "D"]
+    assert [to_canonical(7, 3, shown) for shown in "ABCD"] == list(order)
+    assert to_canonical(7, 3, None) is None
+
+
+def test_sampled_shuffled_paper_is_graded_as_served(client, make_subject, student_headers):
+    subject = make_subject(questions=40, questionsPerExam=5, shuffle=True)
+    response = client.post(f"/api/v1/exams/start/{subject}", headers=student_headers)
+    questions = response.json()["questions"]
+    assert len(questions) == 5
+    # resuming serves the same questions in the same order
+    assert client.post(f"/api/v1/exams/start/{subject}", headers=student_headers).json()["questions"] == questions
+
+    response = client.post("/api/v1/exams/submit", headers=student_headers, json={
+        "subject_id": subject, "answers": correct_answers(questions),
+    })
+    assert response.status_code == 200
+    assert (response.json()["score"], response.json()["total"]) == (5, 5)
+
+
+def test_responses_are_packed_against_the_questions_served(client, make_subject, student_headers):
+    subject = make_subject(questions=200, questionsPerExam=3)
+    questions = client.post(f"/api/v1/exams/start/{subject}", headers=student_headers).json()["questions"]
+    client.post("/api/v1/exams/submit", headers=student_headers, json={"subject_id": subject, "answers": []})
+    db = SessionLocal()
+    try:
+        result = db.query(Result).filter(Result.subject_id == subject).one()
+        layout = db.get(ResponseLayout, result.layout_id)
+    finally:
+        db.close()
+    # two 4-bit codes per byte, whatever the size of the bank
+    assert len(result.responses) == 2
+    assert unpack_ids(layout.question_ids).tolist() == sorted(question["id"] for question in questions)
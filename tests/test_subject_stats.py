@@ -0,0 +1,64 @@
+import math
+
+import pytest
+
+from app.core.subject_stats import rebuild_stats, record_results, summarize
+from app.db.models.subject_stats import SubjectStats
+from app.db.session import SessionLocal
+
+
+def sit(client, subject, headers, correct):
+    questions = client.post(f"/api/v1/exams/start/{subject}", headers=headers).json()["questions"]
+    answers = [{"question_id": question["id"], "selected_option": "A" if i < correct else "B"} for i, question in enumerate(questions)]
+    client.post("/api/v1/exams/submit", headers=headers, json={"subject_id": subject, "answers": answers})
+
+
+def test_stats_follow_each_submission(client, admin_headers, subject, make_student):
+    for correct in (4, 2, 1):
+        sit(client, subject, make_student(), correct)
+    stats = client.get(f"/api/v1/results/stats/{subject}", headers=admin_headers).json()
+    percentages = [100.0, 50.0, 25.0]
+    mean = sum(percentages) / 3
+    assert stats["attempts"] == 3
+    assert stats["mean"] == pytest.approx(mean)
+    assert stats["stdev"] == pytest.approx(math.sqrt(sum((p - mean) ** 2 for p in percentages) / 3))
+    assert (stats["passed"], stats["failed"]) == (2, 1)
+    assert stats["distribution"] == {"A": 1, "B": 0, "C": 1, "D": 0, "E": 0, "F": 1}
+    assert stats["pass_rate"] == pytest.approx(2 / 3)
+
+
+def test_incremental_stats_match_a_rebuild(client, subject, make_student):
+    for correct in (3, 0):
+        sit(client, subject, make_student(), correct)
+    db = SessionLocal()
+    try:
+        incremental = summarize(subject, db.get(SubjectStats, subject))
+        rebuild_stats(db, subject)
+        db.expire_all()
+        rebuilt = summarize(subject, db.get(SubjectStats, subject))
+        assert rebuilt.pop("distribution") == incremental.pop("distribution")
+        assert rebuilt == pytest.approx(incremental)
+    finally:
+        db.close()
+
+
+def test_record_results_creates_the_row_then_adds_to_it(subject):
+    db = SessionLocal()
+    try:
+        rows = [
+            {"subject_id": subject, "percentage": 80.0, "grade": "A", "status": "PASS"},
+            {"subject_id": subject, "percentage": 30.0, "grade": "F", "status": "FAIL"},
+        ]
+        record_results(db, rows[:1])
+        record_results(db, rows[1:])
+        db.flush()
+        stats = db.get(SubjectStats, subject)
+        assert (stats.attempts, stats.sum_percentage, stats.grade_a, stats.grade_f, stats.failed) == (2, 110.0, 1, 1, 1)
+    finally:
+        db.rollback()
+        db.close()
+
+
+def test_subject_without_results(client, admin_headers, subject):
+    stats = client.get(f"/api/v1/results/stats/{subject}", headers=admin_headers).json()
+    assert (stats["attempts"], stats["mean"], stats["pass_rate"]) == (0, None, None)
@@ -0,0 +1,285 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from jose import jwt
+from sqlalchemy.exc import IntegrityError
+
+from app.api.v1.routes import exams
+from app.core import metrics
+from app.core.config import settings
+from app.core.exam_sessions import AutosaveBuffer, autosave_buffer
+from app.core.submission_queue import store_result, store_results, submission_writer
+from app.db.models.exam_session import ExamSession
+from app.db.models.question import Question
+from app.db.models.result import Result
+from app.db.models.subject import Subject
+from app.db.session import SessionLocal
+
+
+def student_id(headers) -> int:
+    return int(jwt.get_unverified_claims(headers["Authorization"].split()[1])["sub"])
+
+
+def submit(client, headers, subject_id, key=None, answers=None):
+    if key is not None:
+        headers = {**headers, "Idempotency-Key": key}
+    return client.post("/api/v1/exams/submit", headers=headers, json={
+        "subject_id": subject_id,
+        "answers": answers or [],
+    })
+
+
+def start(client, headers, subject_id) -> list[dict]:
+    response = client.post(f"/api/v1/exams/start/{subject_id}", headers=headers)
+    assert response.status_code == 200
+    return response.json()["questions"]
+
+
+def session_row(subject_id, headers):
+    db = SessionLocal()
+    try:
+        return db.query(ExamSession).filter(
+            ExamSession.subject_id == subject_id, ExamSession.student_id == student_id(headers)
+        ).one()
+    finally:
+        db.close()
+
+
+def expire(session_id, **values):
+    db = SessionLocal()
+    try:
+        db.query(ExamSession).filter(ExamSession.id == session_id).update(
+            {"deadline": datetime.utcnow() - timedelta(hours=1), **values}
+        )
+        db.commit()
+    finally:
+        db.close()
+    autosave_buffer._sessions.clear()
+
+
+def result_count(subject_id) -> int:
+    db = SessionLocal()
+    try:
+        return db.query(Result).filter(Result.subject_id == subject_id).count()
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def write_behind(monkeypatch):
+    monkeypatch.setattr(settings, "SUBMISSION_WRITE_BEHIND", True)
+    yield
+    submission_writer.stop()
+
+
+# -- idempotency -------------------------------------------------------------
+
+def test_retry_with_same_key_replays_result(client, subject, student_headers):
+    questions = start(client, student_headers, subject)
+    answers = [{"question_id": question["id"], "selected_option": "A"} for question in questions]
+    first = submit(client, student_headers, subject, key="k1", answers=answers)
+    retry = submit(client, student_headers, subject, key="k1")
+    assert first.status_code == retry.status_code == 200
+    assert first.json() == retry.json()
+    assert first.json()["score"] == 4
+    assert result_count(subject) == 1
+
+
+def test_replay_does_not_load_the_paper_or_grade(client, subject, student_headers, monkeypatch):
+    questions = start(client, student_headers, subject)
+    answers = [{"question_id": question["id"], "selected_option": "A"} for question in questions]
+    first = submit(client, student_headers, subject, key="k1", answers=answers)
+
+    def unexpected(*args, **kwargs):
+        raise AssertionError("a replay must come from the stored result alone")
+    monkeypatch.setattr(exams, "load_paper", unexpected)
+    monkeypatch.setattr(exams, "grade_submission", unexpected)
+    retry = submit(client, student_headers, subject, key="k1", answers=answers)
+    assert retry.status_code == 200
+    assert retry.json() == first.json()
+
+
+def test_second_attempt_without_matching_key_is_rejected(client, subject, student_headers):
+    start(client, student_headers, subject)
+    assert submit(client, student_headers, subject, key="k1").status_code == 200
+    assert submit(client, student_headers, subject, key="k2").status_code == 400
+    assert submit(client, student_headers, subject).status_code == 400
+    assert client.post(f"/api/v1/exams/start/{subject}", headers=student_headers).status_code == 400
+
+
+def test_concurrent_double_submit_stores_one_result(client, subject, student_headers):
+    start(client, student_headers, subject)
+    responses = []
+    threads = [
+        threading.Thread(target=lambda: responses.append(submit(client, student_headers, subject, key="double")))
+        for _ in range(6)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(response.status_code in (200, 409) for response in responses)
+    assert len({response.json()["id"] for response in responses if response.status_code == 200}) == 1
+    assert result_count(subject) == 1
+
+
+# -- conflicts ---------------------------------------------------------------
+
+def test_session_claimed_without_result_is_409(client, subject, student_headers):
+    start(client, student_headers, subject)
+    db = SessionLocal()
+    try:
+        # as if another submission had claimed the session and not yet stored its result
+        db.query(ExamSession).filter(ExamSession.id == session_row(subject, student_headers).id).update(
+            {"submitted_at": ExamSession.started_at}
+        )
+        db.commit()
+    finally:
+        db.close()
+    response = submit(client, student_headers, subject, key="k1")
+    assert response.status_code == 409
+    assert response.headers["Retry-After"]
+
+
+def test_unique_index_rejects_second_result(client, subject, student_headers):
+    start(client, student_headers, subject)
+    assert submit(client, student_headers, subject).status_code == 200
+    db = SessionLocal()
+    try:
+        stored = db.query(Result).filter(Result.subject_id == subject).one()
+        values = {
+            "student_id": stored.student_id, "subject_id": subject, "score": 0, "total": 4, "percentage": 0.0,
+            "grade": "F", "status": "FAIL", "layout_id": stored.layout_id, "responses": stored.responses,
+        }
+        with pytest.raises(IntegrityError):
+            store_result(db, dict(values))
+        db.rollback()
+        assert store_results(db, [dict(values)]) == [None]
+    finally:
+        db.close()
+    assert result_count(subject) == 1
+
+
+# -- exam sessions -----------------------------------------------------------
+
+def test_submit_without_session_is_rejected(client, subject, student_headers):
+    response = submit(client, student_headers, subject, key="k1")
+    assert response.status_code == 400
+    assert result_count(subject) == 0
+
+
+def test_partial_submit_waits_for_other_workers_autosaves(client, subject, student_headers):
+    questions = start(client, student_headers, subject)
+    other_worker = AutosaveBuffer(0.05)
+    try:
+        other_worker.add(session_row(subject, student_headers).id, {question["id"]: "A" for question in questions})
+        response = submit(client, student_headers, subject, key="k1")
+    finally:
+        other_worker.stop()
+    assert response.status_code == 200
+    assert response.json()["score"] == 4
+
+
+def test_complete_submit_does_not_wait(client, subject, student_headers, monkeypatch):
+    questions = start(client, student_headers, subject)
+
+    def settle(db):
+        raise AssertionError("waited although every question was answered")
+
+    monkeypatch.setattr(autosave_buffer, "settle", settle)
+    answers = [{"question_id": question["id"], "selected_option": None} for question in questions]
+    assert submit(client, student_headers, subject, key="k1", answers=answers).status_code == 200
+
+
+def test_sweep_grades_expired_sessions(client, subject, student_headers):
+    questions = start(client, student_headers, subject)
+    session_id = session_row(subject, student_headers).id
+    expire(session_id, answers={str(questions[0]["id"]): "A"})
+    autosave_buffer.sweep_expired()
+    assert session_row(subject, student_headers).submitted_at is not None
+    db = SessionLocal()
+    try:
+        assert db.query(Result.score).filter(Result.subject_id == subject).scalar() == 1
+    finally:
+        db.close()
+
+
+def test_sweep_closes_sessions_without_a_paper(client, subject, student_headers):
+    start(client, student_headers, subject)
+    expire(session_row(subject, student_headers).id)
+    db = SessionLocal()
+    try:
+        # as deleting every question does
+        db.query(Question).filter(Question.subject_id == subject).delete()
+        db.query(Subject).filter(Subject.id == subject).update({"questionsVersion": Subject.questionsVersion + 1})
+        db.commit()
+    finally:
+        db.close()
+    autosave_buffer.sweep_expired()
+    assert session_row(subject, student_headers).submitted_at is not None
+    assert result_count(subject) == 0
+
+
+def test_session_submit_claims_session(client, subject, student_headers):
+    start(client, student_headers, subject)
+    response = submit(client, student_headers, subject, key="k1")
+    assert response.status_code == 200
+    assert session_row(subject, student_headers).submitted_at is not None
+    assert submit(client, student_headers, subject, key="k1").json() == response.json()
+
+
+def test_write_behind_submit_stores_result(client, subject, student_headers, write_behind):
+    start(client, student_headers, subject)
+    batches = metrics.submission_flush_time._values.get((), [None, 0])[1]
+    response = submit(client, student_headers, subject, key="k1")
+    assert response.status_code == 200
+    assert session_row(subject, student_headers).submitted_at is not None
+    assert result_count(subject) == 1
+    # exported alongside the JSON stats endpoint
+    assert metrics.submission_flush_time._values[()][1] == batches + 1
+    assert "submission_queue_depth 0" in client.get("/metrics").text
+
+
+def test_write_behind_failure_leaves_session_open(client, subject, student_headers, write_behind, monkeypatch):
+    start(client, student_headers, subject)
+
+    def failing_insert(rows):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(submission_writer, "_insert", failing_insert)
+    response = submit(client, student_headers, subject, key="k1")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"]
+    # neither the claim nor the result was written, so the student can retry
+    assert session_row(subject, student_headers).submitted_at is None
+    assert result_count(subject) == 0
+
+    monkeypatch.undo()
+    monkeypatch.setattr(settings, "SUBMISSION_WRITE_BEHIND", True)
+    assert submit(client, student_headers, subject, key="k1").status_code == 200
+    assert result_count(subject) == 1
+
+
+def test_write_behind_timeout_is_503_then_replays(client, subject, student_headers, write_behind, monkeypatch):
+    start(client, student_headers, subject)
+    insert = submission_writer._insert
+
+    def slow_insert(rows):
+        time.sleep(0.5)
+        return insert(rows)
+
+    monkeypatch.setattr(submission_writer, "_insert", slow_insert)
+    monkeypatch.setattr(settings, "SUBMISSION_RESULT_TIMEOUT_SECONDS", 0.05)
+    response = submit(client, student_headers, subject, key="k1")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"]
+
+    # the queued row still commits; retrying with the same key replays it
+    deadline = time.monotonic() + 5
+    while result_count(subject) == 0 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    retry = submit(client, student_headers, subject, key="k1")
+    assert retry.status_code == 200
+    assert result_count(subject) == 1